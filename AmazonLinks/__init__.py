@@ -0,0 +1,65 @@
+# AmazonLinks
+import logging
+import time
+
+from ..ScraperAmazon import WebScraperImproved, activity_config
+
+
+async def main(input: dict) -> dict:
+    """Crawl the search pagination and return the discovered product links"""
+    start_time = time.time()
+
+    try:
+        # Validate input data
+        required_fields = ['start_url', 'region', 'max_pages']
+        if not all(field in input for field in required_fields):
+            raise ValueError(
+                f"Missing required input fields. Required: {required_fields}"
+            )
+
+        start_url = input['start_url']
+        region = input['region']
+        max_pages = int(input['max_pages']) if isinstance(
+            input['max_pages'], str
+        ) else input['max_pages']
+
+        async with WebScraperImproved(
+            activity_config(input.get('config')), input.get('checkpoint')
+        ) as scraper:
+            product_links = await scraper.collect_product_links(
+                start_url, region, max_pages
+            )
+            if scraper.checkpoint:
+                await scraper.checkpoint.clear()
+
+        execution_time = time.time() - start_time
+        logging.info(
+            f"Link collection completed in {execution_time:.2f} seconds. "
+            f"Found {len(product_links)} product links."
+        )
+
+        return {
+            "status": "success",
+            "region": region,
+            "total_links": len(product_links),
+            "execution_time": f"{execution_time:.2f} seconds",
+            "connection_stats": scraper.get_connection_stats(),
+            "link_stats": scraper.link_stats,
+            # Whether the link list is complete enough to report removals from
+            "pagination_complete": scraper.pagination_complete,
+            **scraper.metrics_result(),
+            "product_links": product_links
+        }
+    except ValueError as e:
+        # Invalid input fails the same way on every attempt, so it is not retried
+        logging.error(f"An error occurred while collecting links: {str(e)}")
+        return {
+            "status": "error",
+            "error": str(e),
+            "execution_time": f"{time.time() - start_time:.2f} seconds",
+            "product_links": []
+        }
+    except Exception as e:
+        logging.error(f"An error occurred while collecting links: {str(e)}")
+        # Raised so a durable retry resumes from the checkpoint
+        raise
@@ -0,0 +1,92 @@
+# AmazonProducts
+import logging
+import time
+
+from ..ScraperAmazon import WebScraperImproved, activity_config
+from ..ScraperAmazon.records import ProductTable
+from ..ScraperAmazon.sinks import create_sink, with_part_suffix
+
+
+async def main(input: dict) -> dict:
+    """Scrape one batch of product URLs and return the product data"""
+    start_time = time.time()
+
+    try:
+        # Validate input data
+        required_fields = ['product_urls', 'region']
+        if not all(field in input for field in required_fields):
+            raise ValueError(
+                f"Missing required input fields. Required: {required_fields}"
+            )
+
+        product_urls = input['product_urls']
+        region = input['region']
+
+        checkpoint = {
+            **input['checkpoint'], 'keep_products': not input.get('output')
+        } if input.get('checkpoint') else None
+
+        async with WebScraperImproved(activity_config(input.get('config')), checkpoint) as scraper:
+            resumed = bool(scraper.checkpoint and scraper.checkpoint.resumed)
+            if scraper.snapshot and (input.get('output') or {}).get('format', 'ndjson') != 'ndjson':
+                raise ValueError("Delta mode writes change events as NDJSON")
+            if input.get('output'):
+                output_spec = input['output']
+                if 'part' in input:
+                    output_spec = with_part_suffix(output_spec, input['part'])
+                output = await scraper.scrape_products_to_sink(
+                    product_urls, region,
+                    create_sink(output_spec, append=resumed, on_flush=scraper.output_written),
+                    input.get('start_url')
+                )
+                total_products = output['total_written']
+            else:
+                product_data = await scraper.scrape_products(
+                    product_urls, region, input.get('start_url'))
+                total_products = len(product_data)
+                if input.get('result_format') == 'columnar' and not scraper.snapshot:
+                    product_data = ProductTable(product_data).as_dict()
+
+        execution_time = time.time() - start_time
+        logging.info(
+            f"Batch of {len(product_urls)} links completed in "
+            f"{execution_time:.2f} seconds. Found {total_products} products."
+        )
+
+        result = {
+            "status": "success",
+            "region": region,
+            "total_products": total_products,
+            "execution_time": f"{execution_time:.2f} seconds",
+            "connection_stats": scraper.get_connection_stats(),
+            "block_stats": scraper.block_monitor.get_stats(),
+            "retry_stats": scraper.retry_scheduler.get_stats(),
+            **scraper.metrics_result()
+        }
+        if scraper.http_cache:
+            result["cache_stats"] = scraper.http_cache.get_stats()
+        if scraper.crawl_state:
+            result["crawl_state_stats"] = scraper.crawl_state.get_stats()
+        if scraper.snapshot:
+            result["delta_stats"] = scraper.snapshot.get_stats()
+        if scraper.checkpoint:
+            result["resumed"] = resumed
+            await scraper.checkpoint.clear()
+        if input.get('output'):
+            result["output"] = output
+        else:
+            result["scraped_data"] = product_data
+        return result
+    except ValueError as e:
+        # Invalid input fails the same way on every attempt, so it is not retried
+        logging.error(f"An error occurred while scraping batch: {str(e)}")
+        return {
+            "status": "error",
+            "error": str(e),
+            "execution_time": f"{time.time() - start_time:.2f} seconds",
+            "scraped_data": []
+        }
+    except Exception as e:
+        logging.error(f"An error occurred while scraping batch: {str(e)}")
+        # Raised so a durable retry resumes from the checkpoint
+        raise
@@ -0,0 +1,78 @@
+# AmazonRemovals
+import logging
+import time
+
+from ..ScraperAmazon.delta import open_snapshot
+from ..ScraperAmazon.sinks import create_sink, with_name_suffix
+from ..ScraperAmazon.urls import search_scope
+
+
+async def main(input: dict) -> dict:
+    """Report the snapshot products of a fan-out crawl that are no longer listed
+
+    Each AmazonProducts batch only sees part of the links, so removals are
+    found here, from the complete link list, once every batch has finished.
+    """
+    start_time = time.time()
+
+    try:
+        # Validate input data
+        required_fields = ['start_url', 'region', 'product_links']
+        if not all(field in input for field in required_fields):
+            raise ValueError(
+                f"Missing required input fields. Required: {required_fields}"
+            )
+        delta = (input.get('config') or {}).get('delta')
+        if not delta:
+            raise ValueError("The removal pass needs the delta config option")
+        if (input.get('output') or {}).get('format', 'ndjson') != 'ndjson':
+            raise ValueError("Delta mode writes change events as NDJSON")
+
+        snapshot = open_snapshot(delta)
+        try:
+            snapshot.begin(search_scope(input['start_url']))
+            for url in input['product_links']:
+                snapshot.seen(url)
+            events = snapshot.removed()
+            if input.get('output'):
+                sink = create_sink(with_name_suffix(input['output'], '-removed'))
+                for event in events:
+                    await sink.write(event)
+                output = await sink.close()
+        except Exception:
+            # Dropped so a retry reports the same removals again
+            snapshot.close(commit=False)
+            raise
+        snapshot.close()
+
+        execution_time = time.time() - start_time
+        logging.info(
+            f"Removal pass completed in {execution_time:.2f} seconds. "
+            f"Found {len(events)} removed products."
+        )
+
+        result = {
+            "status": "success",
+            "region": input['region'],
+            "total_products": len(events),
+            "execution_time": f"{execution_time:.2f} seconds",
+            "delta_stats": snapshot.get_stats()
+        }
+        if input.get('output'):
+            result["output"] = output
+        else:
+            result["scraped_data"] = events
+        return result
+    except ValueError as e:
+        # Invalid input fails the same way on every attempt, so it is not retried
+        logging.error(f"An error occurred in the removal pass: {str(e)}")
+        return {
+            "status": "error",
+            "error": str(e),
+            "execution_time": f"{time.time() - start_time:.2f} seconds",
+            "scraped_data": []
+        }
+    except Exception as e:
+        logging.error(f"An error occurred in the removal pass: {str(e)}")
+        # Raised so a durable retry runs the pass again
+        raise
@@ -5,6 +5,21 @@ from azure.functions import HttpRequest, HttpResponse
 from azure.durable_functions import DurableOrchestrationClient
 
 
+def parse_jobs(jobs):
+    """Accept jobs as {"start_url", "region", "max_pages"} objects or [start_url, region, max_pages] lists"""
+    parsed = []
+    for job in jobs:
+        if isinstance(job, (list, tuple)):
+            job = dict(zip(("start_url", "region", "max_pages"), job))
+        if not job.get("start_url") or not job.get("region"):
+            raise ValueError("Every job needs a start_url and a region")
+        parsed.append(job)
+    regions = [job["region"] for job in parsed]
+    if len(set(regions)) != len(regions):
+        raise ValueError("Each region can only appear in one job")
+    return parsed
+
+
 async def main(req: HttpRequest, starter: str) -> HttpResponse:
     # Create a DurableOrchestrationClient
     client = DurableOrchestrationClient(starter)
@@ -16,9 +31,23 @@ async def main(req: HttpRequest, starter: str) -> HttpResponse:
     start_url = req_data.get("start_url")
     region = req_data.get("region")
     max_pages = req_data.get("max_pages")
-    if not start_url or not region:
+    fan_out = str(req_data.get("fan_out", "")).lower() in ("1", "true", "yes")
+    batch_size = req_data.get("batch_size")
+    output = req_data.get("output")
+    config = req_data.get("config")
+    checkpoint = req_data.get("checkpoint")
+    retry = req_data.get("retry")
+    result_format = req_data.get("result_format")
+    jobs = req_data.get("jobs")
+    max_concurrent_regions = req_data.get("max_concurrent_regions")
+    if jobs:
+        try:
+            jobs = parse_jobs(jobs)
+        except (ValueError, TypeError, AttributeError) as e:
+            return HttpResponse(f"Invalid jobs: {str(e)}", status_code=400)
+    elif not start_url or not region:
         return HttpResponse(
-            "Please pass both start_url and region in the request body",
+            "Please pass both start_url and region (or a jobs list) in the request body",
             status_code=400
         )
 
@@ -26,7 +55,16 @@ async def main(req: HttpRequest, starter: str) -> HttpResponse:
     instance_id = await client.start_new("Orchest", None, {
         "start_url": start_url,
         "region": region,
-        "max_pages": max_pages
+        "max_pages": max_pages,
+        "fan_out": fan_out,
+        "batch_size": batch_size,
+        "output": output,
+        "config": config,
+        "checkpoint": checkpoint,
+        "retry": retry,
+        "result_format": result_format,
+        "jobs": jobs,
+        "max_concurrent_regions": max_concurrent_regions
     })
 
     logging.info(f"Started orchestration with ID = '{instance_id}'.")
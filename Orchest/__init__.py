@@ -3,25 +3,282 @@ import logging
 from azure.durable_functions import DurableOrchestrationContext, Orchestrator
 import azure.durable_functions as df
 
+from ..ScraperAmazon.sinks import output_name_key, with_default_name, with_name_suffix
+
+# Number of product URLs handed to each AmazonProducts activity in fan-out mode
+DEFAULT_BATCH_SIZE = 25
+
+
+def call_scraper_activity(context: df.DurableOrchestrationContext, name, activity_input, retry=None):
+    """Call an activity, letting durable retries resume it from its checkpoint"""
+    if retry:
+        retry_options = df.RetryOptions(
+            first_retry_interval_in_milliseconds=int(
+                retry.get("first_retry_interval", 30) * 1000),
+            max_number_of_attempts=int(retry.get("max_attempts", 3))
+        )
+        return context.call_activity_with_retry(name, retry_options, activity_input)
+    return context.call_activity(name, activity_input)
+
+
+def with_checkpoint_id(checkpoint, checkpoint_id):
+    """Copy a checkpoint spec for one activity, or None when checkpoints are off"""
+    return {**checkpoint, "id": checkpoint_id} if checkpoint else None
+
+
+def region_output(output, region, instance_id):
+    """Copy an output spec so each region of a multi-region crawl writes its own file"""
+    if not output.get(output_name_key(output)):
+        return with_default_name(output, f"amazon-{region}-{instance_id}")
+    return with_name_suffix(output, f"-{region}")
+
+
+def activity_error(task):
+    """Result of an activity that raised (after its durable retries), or None"""
+    if isinstance(task.result, Exception):
+        return {"status": "error", "error": str(task.result)}
+    return None
+
+
+def merge_scraped_data(merged, scraped_data):
+    """Append one batch of scraped data, either a product list or columnar tables"""
+    if not scraped_data:
+        return merged
+    if isinstance(scraped_data, list):
+        return merged + scraped_data
+    if not merged:
+        return scraped_data
+    for table, columns in scraped_data.items():
+        for column, values in columns.items():
+            merged[table][column].extend(values)
+    return merged
+
+
+def fan_out_products(context: df.DurableOrchestrationContext, job):
+    """Crawl pagination in one activity, then scrape product batches in parallel"""
+    region = job["region"]
+    output = job["output"]
+    checkpoint = job["checkpoint"]
+
+    try:
+        links_result = yield call_scraper_activity(context, "AmazonLinks", {
+            "start_url": job["start_url"],
+            "region": region,
+            "max_pages": job["max_pages"],
+            "config": job["config"],
+            "checkpoint": with_checkpoint_id(checkpoint, f"{job['checkpoint_id']}-links")
+        }, job["retry"])
+    except Exception as e:
+        links_result = {"status": "error", "error": str(e)}
+    product_links = links_result.get("product_links", [])
+
+    batch_size = job["batch_size"]
+    batches = [
+        product_links[i:i + batch_size]
+        for i in range(0, len(product_links), batch_size)
+    ]
+    tasks = []
+    for part, batch in enumerate(batches):
+        activity_input = {
+            "product_urls": batch,
+            "region": region,
+            # Names the search whose delta snapshot the batch updates
+            "start_url": job["start_url"],
+            "config": job["config"],
+            "checkpoint": with_checkpoint_id(
+                checkpoint, f"{job['checkpoint_id']}-part{part:04d}"),
+            "result_format": job["result_format"]
+        }
+        if output:
+            activity_input["output"] = output
+            activity_input["part"] = part
+        tasks.append(call_scraper_activity(
+            context, "AmazonProducts", activity_input, job["retry"]))
+    # Wait for every batch; unlike task_all, one failed batch does not fail the rest
+    pending = list(tasks)
+    while pending:
+        finished = yield context.task_any(pending)
+        pending.remove(finished)
+    batch_results = [activity_error(task) or task.result for task in tasks]
+
+    if (job["config"] or {}).get("delta") and links_result.get("pagination_complete"):
+        # Batches only see part of the links, so removals are found from the full list
+        removals_input = {
+            "start_url": job["start_url"],
+            "region": region,
+            "product_links": product_links,
+            "config": job["config"]
+        }
+        if output:
+            removals_input["output"] = output
+        try:
+            removals_result = yield call_scraper_activity(
+                context, "AmazonRemovals", removals_input, job["retry"])
+        except Exception as e:
+            removals_result = {"status": "error", "error": str(e)}
+        batch_results.append(removals_result)
+
+    # Merge the batch results into the same shape ScraperAmazon returns
+    product_data = []
+    outputs = []
+    total_products = 0
+    errors = []
+    for batch_result in batch_results:
+        product_data = merge_scraped_data(product_data, batch_result.get("scraped_data", []))
+        total_products += batch_result.get("total_products", 0)
+        if batch_result.get("output"):
+            outputs.append(batch_result["output"])
+        if batch_result.get("status") == "error":
+            errors.append(batch_result.get("error"))
+    if links_result.get("status") == "error":
+        errors.insert(0, links_result.get("error"))
+
+    if not context.is_replaying:
+        logging.info(
+            f"Fan-out finished: {len(batches)} batches, "
+            f"{total_products} products, {len(errors)} errors."
+        )
+
+    result = {
+        "status": "error" if errors and not total_products else "success",
+        "region": region,
+        "total_links": len(product_links),
+        "total_batches": len(batches),
+        "total_products": total_products,
+        "errors": errors
+    }
+    if output:
+        result["outputs"] = outputs
+    else:
+        result["scraped_data"] = product_data
+    return result
+
+
+def crawl_regions(context: df.DurableOrchestrationContext, input_data):
+    """Crawl every job's region in its own sub-orchestration, at most max_concurrent_regions at a time"""
+    jobs = input_data["jobs"]
+    limit = int(input_data.get("max_concurrent_regions") or len(jobs))
+    shared = {
+        key: value for key, value in input_data.items()
+        if key not in ("jobs", "max_concurrent_regions")
+    }
+    checkpoint = input_data.get("checkpoint")
+
+    tasks = {}
+    running = []
+    for job in jobs:
+        region = job["region"]
+        region_input = {
+            **shared,
+            **job,
+            # Region-specific settings such as requests_per_second override the shared config
+            "config": {**(shared.get("config") or {}), **(job.get("config") or {})}
+        }
+        if region_input.get("output"):
+            region_input["output"] = region_output(
+                region_input["output"], region, context.instance_id)
+        if checkpoint and checkpoint.get("id"):
+            region_input["checkpoint"] = with_checkpoint_id(
+                checkpoint, f"{checkpoint['id']}-{region}")
+
+        if len(running) >= limit:
+            finished = yield context.task_any(running)
+            running.remove(finished)
+        task = context.call_sub_orchestrator(
+            "Orchest", region_input, f"{context.instance_id}-{region}")
+        tasks[region] = task
+        running.append(task)
+    while running:
+        finished = yield context.task_any(running)
+        running.remove(finished)
+
+    # Aggregate one status line per region; a failed region does not fail the others
+    regions = {}
+    scraped_data = {}
+    total_products = 0
+    for region, task in tasks.items():
+        if isinstance(task.result, Exception):
+            regions[region] = {"status": "error", "error": str(task.result)}
+            continue
+        result = task.result["AmazonData"]["scraped_data"]
+        scraped_data[region] = result
+        regions[region] = {
+            "status": result.get("status"),
+            "total_products": result.get("total_products", 0)
+        }
+        if result.get("error"):
+            regions[region]["error"] = result["error"]
+        total_products += result.get("total_products", 0)
+
+    succeeded = [r for r in regions.values() if r["status"] == "success"]
+    if not context.is_replaying:
+        logging.info(
+            f"Multi-region crawl finished: {len(succeeded)}/{len(regions)} regions, "
+            f"{total_products} products."
+        )
+    return {
+        "status": "success" if len(succeeded) == len(regions)
+        else "partial" if succeeded else "error",
+        "total_products": total_products,
+        "regions": regions,
+        "scraped_data": scraped_data
+    }
+
 
 def orchestrator_function(context: df.DurableOrchestrationContext):
     # Get Data from Http starter
     input_data = context.get_input()
-    start_url = input_data["start_url"]
-    region = input_data["region"]
-    max_pages = input_data["max_pages"]
+    if input_data.get("jobs"):
+        # One sub-orchestration per region, aggregated into a single result
+        return {"AmazonData": (yield from crawl_regions(context, input_data))}
+
+    checkpoint = input_data.get("checkpoint")
+    # Reusing the id of an earlier instance resumes that instance's crawl
+    checkpoint_id = (checkpoint or {}).get("id") or context.instance_id
+    output = input_data.get("output")
+    if output:
+        # A deterministic name lets a retried or resumed attempt append to the
+        # same output instead of starting a new dated file
+        output = with_default_name(
+            output, f"amazon-{input_data['region']}-{checkpoint_id}")
+    job = {
+        "start_url": input_data["start_url"],
+        "region": input_data["region"],
+        "max_pages": input_data["max_pages"],
+        "batch_size": int(input_data.get("batch_size") or DEFAULT_BATCH_SIZE),
+        "output": output,
+        "config": input_data.get("config"),
+        "checkpoint": checkpoint,
+        "checkpoint_id": checkpoint_id,
+        "retry": input_data.get("retry"),
+        "result_format": input_data.get("result_format")
+    }
 
     # # Initialize call counts For Activity Functions
     # ScraperAmazon = 0
 
     ###########################################################################################
-    # Process ScraperAmazon   ---> Activity
+    # Process AmazonLinks + AmazonProducts (fan-out) or ScraperAmazon   ---> Activity
 
-    scraped_data = yield context.call_activity("ScraperAmazon", {
-        "start_url": start_url,
-        "region": region,
-        "max_pages": max_pages
-    })
+    if input_data.get("fan_out", False):
+        scraped_data = yield from fan_out_products(context, job)
+    else:
+        activity_input = {
+            "start_url": job["start_url"],
+            "region": job["region"],
+            "max_pages": job["max_pages"],
+            "config": job["config"],
+            "checkpoint": with_checkpoint_id(checkpoint, job["checkpoint_id"]),
+            "result_format": job["result_format"]
+        }
+        if job["output"]:
+            activity_input["output"] = job["output"]
+        try:
+            scraped_data = yield call_scraper_activity(
+                context, "ScraperAmazon", activity_input, job["retry"])
+        except Exception as e:
+            # Raised once the durable retries are used up
+            scraped_data = {"status": "error", "error": str(e)}
 
     #############################################################################################
     # Log activity call counts
@@ -1,116 +1,513 @@
 # ScraperAmazon
 from urllib.parse import urljoin, urlparse
-from bs4 import BeautifulSoup, SoupStrainer
+from contextlib import aclosing
 from datetime import datetime
+import importlib.util
 import logging
-import aiohttp
 import asyncio
+import os
 import random
-import re
-import chardet
 import time
 
+from .blocking import BlockMonitor, classify_block
+from .checkpoint import open_checkpoint
+from .crawl_state import create_crawl_state
+from .delta import open_snapshot
+from .http_cache import HttpCache
+from .metrics import ScraperMetrics
+from .parsing import clean_text, extract_listing_html, extract_product_html, get_extractor
+from .rate_limit import AdaptiveConcurrencyLimiter, DomainRateLimiter
+from .records import ProductTable
+from .scheduler import LISTING_PRIORITY, PRODUCT_PRIORITY, RetryScheduler
+from .sinks import create_sink
+from .streaming import SectionScanner, detect_encoding
+from .urls import canonicalize_product_links, get_base_url, predict_page_urls, search_scope
+from .warm import WARM_SESSION
+
+
+DEFAULT_CONFIG = {
+    'max_retries': 3,
+    'retry_delay': 2,
+    'session_timeout': 30,
+    'max_concurrent_requests': 10,
+    'max_pages_before_pause': 10,
+    'pause_duration': (5, 9),
+    'request_delay': (2, 5),
+    'required_fields': ['Title', 'Price'],
+    # Scrape products while pagination is still running
+    'pipeline': True,
+    # Maximum number of pending product links / results between stages
+    'queue_size': 100,
+    # HTML parser backend: 'lxml', 'selectolax', 'bs4' or None for the fastest installed
+    'parser_backend': None,
+    # Parse pages in a process pool instead of on the event loop
+    'parse_in_process_pool': False,
+    # Worker processes for parsing; None uses one per CPU core
+    'parse_pool_size': None,
+    # Keep connections alive and reuse them instead of a new handshake per request
+    'connection_pooling': True,
+    # Maximum simultaneous connections to one Amazon host (0 means no per-host limit)
+    'limit_per_host': 10,
+    # Seconds resolved host names stay cached
+    'dns_cache_ttl': 300,
+    # Seconds an idle pooled connection is kept open
+    'keepalive_timeout': 30,
+    # Ask for gzip/deflate (and brotli when installed) compressed responses
+    'compression': True,
+    # Keep the client session (pooled connections, DNS cache) open across
+    # invocations on a warm worker; it is re-created once closed, older than
+    # warm_session_max_age seconds, opened with other connection settings or
+    # after a failed invocation
+    'warm_session': False,
+    'warm_session_max_age': 900,
+    # Token bucket per domain, shared by every scraper of the worker process:
+    # sustained requests per second and burst size. The default keeps about
+    # the pace of ten concurrent requests with the old one-second spacing;
+    # throttling lowers it from there
+    'requests_per_second': 8.0,
+    'burst': 10,
+    # On 403/503 the domain rate is multiplied by throttle_backoff (down to
+    # min_requests_per_second) and paused for a random throttle_cooldown;
+    # every success adds rate_recovery_step back
+    'min_requests_per_second': 0.1,
+    'throttle_backoff': 0.5,
+    'throttle_cooldown': (5, 15),
+    'rate_recovery_step': 0.05,
+    # Directory of the product page cache (None disables caching)
+    'http_cache_dir': None,
+    # Seconds a cached page is served without revalidation
+    'http_cache_ttl': 12 * 60 * 60,
+    # Size cap of the compressed cache; least recently used pages go first
+    'http_cache_max_bytes': 512 * 1024 * 1024,
+    # Persistent crawl state, e.g. {"type": "sqlite", "path": "state.sqlite"} or
+    # {"type": "blob", "container": "...", "blob_name": "..."}; None disables it
+    'crawl_state': None,
+    # Seconds after which a product recorded in the crawl state is scraped again
+    'recrawl_after': 24 * 60 * 60,
+    # Predict page URLs from the first search page and fetch them concurrently,
+    # falling back to following next links when no page= pattern is found
+    'parallel_pagination': True,
+    # Seconds between checkpoint saves while a checkpointed crawl runs
+    'checkpoint_interval': 15,
+    # Also export run metrics as 'prometheus' text or 'otel' (OpenTelemetry) spans
+    'metrics_export': None,
+    # Override the site URL per region, e.g. {"us": "http://127.0.0.1:8080"} to
+    # crawl a local mock server in benchmarks
+    'base_urls': {},
+    # CAPTCHA, robot check and error pages served with 200 OK are detected before
+    # parsing; above block_rate_threshold over the last block_window pages the
+    # number of concurrent requests is halved (down to min_concurrent_requests)
+    'block_window': 50,
+    'block_rate_threshold': 0.1,
+    'min_concurrent_requests': 1,
+    # Blocked product pages are retried after the rest of the crawl, this many
+    # times, each round after a random block_retry_delay seconds
+    'block_retry_rounds': 1,
+    'block_retry_delay': (30, 60),
+    # Failed requests wait retry_delay * 2^(n-1) seconds (at most max_retry_delay,
+    # randomized by +/- retry_jitter) without holding a connection slot
+    'max_retry_delay': 60,
+    'retry_jitter': 0.3,
+    # Requests allowed per URL over the whole run, across all kinds of retries
+    'max_attempts_per_url': 8,
+    # Stream product pages and stop downloading once the stream_fields sections
+    # (default: required_fields) have arrived; supported fields are Title, Price,
+    # Discount, Image URL, Description and specs
+    'stream_product_pages': False,
+    'stream_fields': None,
+    'stream_chunk_size': 16 * 1024,
+    # Delta mode, e.g. {"path": "snapshots.sqlite", "scope": "phones-us"}: emit
+    # only new, changed (Price/Discount/Title or "fields") and removed products
+    # compared with the previous run of the same scope; None returns full products
+    'delta': None
+}
+
+
+USER_AGENTS = (
+    'Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:91.0) Gecko/20100101 Firefox/91.0',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/93.0.4577.63 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/93.0.4577.63 Safari/537.36 Edg/93.0.961.47',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/93.0.4577.63 Safari/537.36 OPR/79.0.4143.50',
+    'Mozilla/5.0 (Windows NT 10.0; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/93.0.4577.63 Safari/537.36 Vivaldi/4.1'
+)
+
+
+def activity_config(config):
+    """Scraper config of an activity invocation, reusing the warm session by default"""
+    return {'warm_session': True, **(config or {})}
+
 
 class WebScraperImproved:
-    def __init__(self, config=None):
+    def __init__(self, config=None, checkpoint=None):
         """
         Initialize the web scraper with enhanced configuration and error handling
         """
-        # Load configuration
-        self.config = config or {
-            'max_retries': 3,
-            'retry_delay': 2,
-            'session_timeout': 30,
-            'max_concurrent_requests': 10,
-            'max_pages_before_pause': 10,
-            'pause_duration': (5, 9),
-            'request_delay': (2, 5),
-            'required_fields': ['Title', 'Price']
-        }
+        # Load configuration, letting callers override individual settings
+        self.config = {**DEFAULT_CONFIG, **(config or {})}
 
         # Initialize user agents
-        self.user_agents = [
-            'Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:91.0) Gecko/20100101 Firefox/91.0',
-            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/93.0.4577.63 Safari/537.36',
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/93.0.4577.63 Safari/537.36 Edg/93.0.961.47',
-            'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/93.0.4577.63 Safari/537.36 OPR/79.0.4143.50',
-            'Mozilla/5.0 (Windows NT 10.0; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/93.0.4577.63 Safari/537.36 Vivaldi/4.1'
-        ]
+        self.user_agents = USER_AGENTS
         self.current_user_agent_index = 0
 
-        # Initialize connections and rate limiting
-        self.connector = aiohttp.TCPConnector(
-            limit=self.config['max_concurrent_requests'],
-            force_close=True
+        # Initialize connections (opened in __aenter__) and rate limiting
+        self.session = None
+        self.accept_encoding = self._get_accept_encoding()
+        self.metrics = ScraperMetrics(self.config['metrics_export'])
+        self.connection_stats = {
+            'requests': 0,
+            'new_connections': 0,
+            'reused_connections': 0,
+            'dns_cache_hits': 0,
+            'dns_cache_misses': 0
+        }
+        # Handed to the session's trace callbacks, which may outlive this scraper
+        self.trace_context = {
+            'connection_stats': self.connection_stats, 'metrics': self.metrics
+        }
+        self.rate_limiter = AdaptiveConcurrencyLimiter(
+            self.config['max_concurrent_requests'],
+            self.config['min_concurrent_requests']
         )
-        self.rate_limiter = asyncio.Semaphore(
-            self.config['max_concurrent_requests'])
-        self.last_request_time = {}
-
-        # Initialize parsers
-        self.product_strainer = SoupStrainer(
-            ['a'], class_='a-link-normal s-underline-text s-underline-link-text s-link-style a-text-normal'
+        self.retry_scheduler = RetryScheduler(
+            self.config['retry_delay'],
+            self.config['max_retry_delay'],
+            self.config['retry_jitter'],
+            self.config['max_attempts_per_url']
+        )
+        self.block_monitor = BlockMonitor(
+            self.rate_limiter,
+            self.config['block_window'],
+            self.config['block_rate_threshold']
+        )
+        self.domain_limiter = DomainRateLimiter(
+            rate=self.config['requests_per_second'],
+            burst=self.config['burst'],
+            min_rate=self.config['min_requests_per_second'],
+            backoff_factor=self.config['throttle_backoff'],
+            recovery_step=self.config['rate_recovery_step'],
+            cooldown=self.config['throttle_cooldown']
         )
 
+        # Initialize the on-disk HTTP cache for product pages
+        self.http_cache = HttpCache(
+            self.config['http_cache_dir'],
+            self.config['http_cache_max_bytes'],
+            self.config['http_cache_ttl']
+        ) if self.config['http_cache_dir'] else None
+
+        # Product page sections to wait for when streaming, None reads whole pages
+        self.stream_fields = (
+            self.config['stream_fields'] or self.config['required_fields']
+        ) if self.config['stream_product_pages'] else None
+
+        # Initialize parsers (lxml/selectolax when installed, bs4 otherwise)
+        self.extractor = get_extractor(self.config['parser_backend'])
+        self.parse_pool = None
+
         # Initialize scraped URLs set
         self.scraped_urls = set()
+        # Block page kind of URLs whose last response was a block page, and the
+        # product URLs waiting for a deferred retry
+        self.blocked_urls = {}
+        self.deferred_urls = []
+        self.link_stats = {'links_seen': 0, 'duplicates_removed': 0}
+        # Whether pagination reached the last search page with no page failing;
+        # only then can products missing from the crawl count as removed
+        self.pagination_complete = False
+
+        # Crawl progress saved for resuming after a timeout or crash
+        self.checkpoint = open_checkpoint(
+            checkpoint, self.config['checkpoint_interval']
+        ) if checkpoint else None
+
+        # Initialize the cross-run crawl state used for incremental crawls
+        self.crawl_state = create_crawl_state(
+            self.config['crawl_state'], self.config['recrawl_after']
+        ) if self.config['crawl_state'] else None
+
+        # Snapshot of the previous run, compared against in delta mode
+        self.snapshot = open_snapshot(
+            self.config['delta']) if self.config['delta'] else None
+
+    async def fetch_page(self, url, use_cache=True, priority=PRODUCT_PRIORITY, stream_fields=None):
+        import aiohttp
+
+        cache_entry = None
+        if self.http_cache and use_cache:
+            cache_entry = self.http_cache.lookup(url)
+            if cache_entry and self.http_cache.is_fresh(cache_entry):
+                html = await self.http_cache.read(cache_entry)
+                if html is not None:
+                    self.http_cache.stats['hits'] += 1
+                    logging.info(f"Served page from cache: {url}")
+                    return html
+                cache_entry = None
 
-    async def fetch_page(self, url):
         headers = {
             "User-Agent": self.get_next_user_agent(),
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
             "Accept-Language": "en-US,en;q=0.9",
         }
+        if self.accept_encoding:
+            headers["Accept-Encoding"] = self.accept_encoding
+        if cache_entry:
+            headers.update(self.http_cache.conditional_headers(cache_entry))
 
         domain = urlparse(url).netloc
-        if domain in self.last_request_time:
-            elapsed = time.time() - self.last_request_time[domain]
-            if elapsed < 1.0:
-                await asyncio.sleep(1.0 - elapsed)
 
-        async with self.rate_limiter:
-            for attempt in range(self.config['max_retries']):
-                try:
-                    async with self.session.get(url, headers=headers) as response:
-                        if response.status == 403:
-                            return await self._handle_rate_limit(url)
+        for attempt in range(self.config['max_retries']):
+            if not self.retry_scheduler.take_attempt(url):
+                logging.error(f"Attempt budget used up for {url}")
+                break
+            if attempt:
+                # Wait in the retry heap, not in a slot, so other requests keep going
+                self.metrics.incr('retries')
+                await self.retry_scheduler.wait(attempt, priority)
+            await self.domain_limiter.acquire(domain, priority)
+            try:
+                # A slot is only held while the request is in flight
+                async with self.rate_limiter.slot(priority):
+                    request_started = time.perf_counter()
+                    with self.metrics.span('fetch', url=url, attempt=attempt):
+                        response = await self.session.get(
+                            url, headers=headers, trace_request_ctx=self.trace_context)
+                    async with response:
+                        self.metrics.count_status(response.status)
+                        if response.status in (403, 503):
+                            self._handle_rate_limit(url, domain)
+                            continue
                         elif response.status >= 500:
                             return await self._handle_server_error(url)
-
-                        try:
-                            html = await response.text()
-                        except aiohttp.ClientPayloadError:
-                            raw_html = await response.read()
-                            encoding = chardet.detect(
-                                raw_html).get('encoding', 'utf-8')
-                            html = raw_html.decode(encoding, errors="replace")
-
-                        self.last_request_time[domain] = time.time()
+                        elif response.status == 304 and cache_entry:
+                            html = await self.http_cache.read(cache_entry)
+                            if html is not None:
+                                await self.http_cache.refresh(cache_entry)
+                                self.http_cache.stats['revalidated'] += 1
+                                self.domain_limiter.on_success(domain)
+                                logging.info(f"Page not modified: {url}")
+                                return html
+                            # Cached body is gone, fetch it unconditionally
+                            cache_entry = None
+                            for header in ('If-None-Match', 'If-Modified-Since'):
+                                headers.pop(header, None)
+                            continue
+
+                        download_started = time.perf_counter()
+                        partial = False
+                        if stream_fields:
+                            body, partial = await self._read_sections(response, stream_fields)
+                        else:
+                            body = await response.read()
+
+                        block = classify_block(body)
+                        self.block_monitor.record(block)
+                        if block:
+                            # Retrying right away would only be blocked again
+                            return self._handle_block_page(url, block)
+                        self.blocked_urls.pop(url, None)
+
+                        html = bytes(body).decode(
+                            detect_encoding(response.headers.get('Content-Type'), body),
+                            errors="replace")
+                        finished = time.perf_counter()
+                        self.metrics.observe(
+                            'download', (finished - download_started) * 1000)
+                        self.metrics.observe(
+                            'request', (finished - request_started) * 1000)
+
+                        self.domain_limiter.on_success(domain)
+                        if self.http_cache and use_cache and response.status == 200 and not partial:
+                            self.http_cache.stats['misses'] += 1
+                            await self.http_cache.store(
+                                url, html,
+                                etag=response.headers.get('ETag'),
+                                last_modified=response.headers.get('Last-Modified')
+                            )
                         logging.info(f"Successfully fetched page: {url}")
                         return html
 
-                except (asyncio.TimeoutError, aiohttp.ClientError) as e:
-                    delay = (2 ** attempt) * self.config['retry_delay']
-                    logging.error(
-                        f"Error fetching {url}: {str(e)}. Retrying in {delay}s...")
-                    await asyncio.sleep(delay)
+            except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+                self.metrics.incr('fetch_errors')
+                logging.error(f"Error fetching {url}: {str(e)}. Scheduling a retry...")
 
-            logging.error(f"Max retries reached for {url}")
-            return None
+        logging.error(f"Max retries reached for {url}")
+        self.metrics.incr('fetch_failures')
+        return None
+
+    async def _read_sections(self, response, fields):
+        """Read a body in chunks until every wanted section has arrived
+
+        Returns the bytes read and whether the download was cut short.
+        """
+        scanner = SectionScanner(fields)
+        async for chunk in response.content.iter_chunked(self.config['stream_chunk_size']):
+            if scanner.feed(chunk):
+                # Dropping the rest of the body means the connection cannot be reused
+                response.close()
+                self.metrics.incr('partial_fetches')
+                return scanner.buffer, True
+        return scanner.buffer, False
 
     async def __aenter__(self):
         """Set up async context manager"""
-        timeout = aiohttp.ClientTimeout(total=self.config['session_timeout'])
-        self.session = aiohttp.ClientSession(
-            connector=self.connector,
-            timeout=timeout
-        )
+        if self.config['warm_session']:
+            self.session = await WARM_SESSION.acquire(
+                self._session_key(), self.config['warm_session_max_age'], self._open_session)
+        else:
+            self.session = self._open_session()
+
+        if self.http_cache:
+            await self.http_cache.open()
+        if self.crawl_state:
+            await self.crawl_state.open()
+
+        if self.config['parse_in_process_pool']:
+            pool_size = self.config['parse_pool_size'] or os.cpu_count() or 1
+            if pool_size > 1 and (os.cpu_count() or 1) > 1:
+                from concurrent.futures import ProcessPoolExecutor
+                self.parse_pool = ProcessPoolExecutor(max_workers=pool_size)
+                logging.info(f"Parsing pages in {pool_size} worker processes")
+            else:
+                logging.info("Single core host, parsing pages inline")
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Clean up async context manager"""
-        if hasattr(self, 'session'):
+        if self.session and self.config['warm_session']:
+            await WARM_SESSION.release(self.session, failed=exc_type is not None)
+        elif self.session:
             await self.session.close()
+        if self.crawl_state:
+            # A failed run's products may not have reached the output
+            await self.crawl_state.close(commit=exc_type is None)
+        if self.snapshot:
+            # Events of a failed run are reported again by its retry
+            self.snapshot.close(commit=exc_type is None)
+        if self.checkpoint and exc_type:
+            await self.checkpoint.save()
+        if self.parse_pool:
+            self.parse_pool.shutdown(wait=False, cancel_futures=True)
+            self.parse_pool = None
+
+    async def _parse(self, extract, html):
+        """Run an extraction function in the process pool, or inline without one"""
+        with self.metrics.span('parse', backend=self.extractor.backend.name):
+            if self.parse_pool:
+                loop = asyncio.get_running_loop()
+                data, timings = await loop.run_in_executor(
+                    self.parse_pool, extract, html, self.extractor.backend.name)
+            else:
+                data, timings = extract(html, self.extractor.backend.name)
+        for phase, value_ms in timings.items():
+            self.metrics.observe(phase, value_ms)
+        return data
+
+    def _get_accept_encoding(self):
+        """Build the Accept-Encoding header from the codecs aiohttp can decode"""
+        if not self.config['compression']:
+            return None
+        encodings = ['gzip', 'deflate']
+        # Only look the module up; aiohttp imports it when it decodes a response
+        if any(importlib.util.find_spec(module) for module in ('brotli', 'brotlicffi')):
+            encodings.append('br')
+        return ', '.join(encodings)
+
+    def _session_key(self):
+        """Connection settings a reused warm session must have been opened with"""
+        return tuple(self.config[key] for key in (
+            'connection_pooling', 'max_concurrent_requests', 'limit_per_host',
+            'dns_cache_ttl', 'keepalive_timeout', 'session_timeout'
+        ))
+
+    def _open_session(self):
+        """Open a client session with the configured connection pool"""
+        import aiohttp
+
+        if self.config['connection_pooling']:
+            connector = aiohttp.TCPConnector(
+                limit=self.config['max_concurrent_requests'],
+                limit_per_host=self.config['limit_per_host'],
+                ttl_dns_cache=self.config['dns_cache_ttl'],
+                keepalive_timeout=self.config['keepalive_timeout']
+            )
+        else:
+            connector = aiohttp.TCPConnector(
+                limit=self.config['max_concurrent_requests'],
+                force_close=True
+            )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.config['session_timeout']),
+            trace_configs=[self._build_trace_config()]
+        )
+
+    @staticmethod
+    def _build_trace_config():
+        """Count connection reuse and time the DNS, connect and TTFB phases
+
+        The stats and metrics come with each request's trace_request_ctx, so a
+        warm session reports to whichever scraper sent the request.
+        """
+        import aiohttp
+
+        def counter(key):
+            async def increment(session, trace_config_ctx, params):
+                if trace_config_ctx.trace_request_ctx:
+                    trace_config_ctx.trace_request_ctx['connection_stats'][key] += 1
+            return increment
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(counter('requests'))
+        trace_config.on_connection_create_end.append(
+            counter('new_connections'))
+        trace_config.on_connection_reuseconn.append(
+            counter('reused_connections'))
+        trace_config.on_dns_cache_hit.append(counter('dns_cache_hits'))
+        trace_config.on_dns_cache_miss.append(counter('dns_cache_misses'))
+
+        def mark(name):
+            async def set_mark(session, trace_config_ctx, params):
+                setattr(trace_config_ctx, name, time.perf_counter())
+            return set_mark
+
+        def elapsed(phase, since):
+            async def observe(session, trace_config_ctx, params):
+                started = getattr(trace_config_ctx, since, None)
+                if started is not None and trace_config_ctx.trace_request_ctx:
+                    trace_config_ctx.trace_request_ctx['metrics'].observe(
+                        phase, (time.perf_counter() - started) * 1000)
+            return observe
+
+        async def count_bytes(session, trace_config_ctx, params):
+            if trace_config_ctx.trace_request_ctx:
+                trace_config_ctx.trace_request_ctx['metrics'].incr(
+                    'bytes_downloaded', len(params.chunk))
+
+        trace_config.on_request_start.append(mark('request_start'))
+        trace_config.on_dns_resolvehost_start.append(mark('dns_start'))
+        trace_config.on_dns_resolvehost_end.append(elapsed('dns', 'dns_start'))
+        trace_config.on_connection_create_start.append(mark('connect_start'))
+        trace_config.on_connection_create_end.append(
+            elapsed('connect', 'connect_start'))
+        # on_request_end fires once the response headers have arrived
+        trace_config.on_request_end.append(elapsed('ttfb', 'request_start'))
+        trace_config.on_response_chunk_received.append(count_bytes)
+        return trace_config
+
+    def get_connection_stats(self):
+        """Return connection reuse statistics for the run result"""
+        stats = dict(self.connection_stats)
+        connections = stats['new_connections'] + stats['reused_connections']
+        stats['reuse_ratio'] = round(
+            stats['reused_connections'] / connections, 3) if connections else 0.0
+        return stats
+
+    def metrics_result(self):
+        """Run metrics to merge into an activity result"""
+        result = {"metrics": self.metrics.as_dict()}
+        if self.config['metrics_export'] == 'prometheus':
+            result["metrics_prometheus"] = self.metrics.to_prometheus()
+        return result
 
     def get_next_user_agent(self):
         """Get next user agent using round robin"""
@@ -119,12 +516,17 @@ class WebScraperImproved:
             self.current_user_agent_index + 1) % len(self.user_agents)
         return user_agent
 
-    async def _handle_rate_limit(self, url):
-        """Handle rate limiting with exponential backoff"""
-        delay = random.uniform(30, 60)
-        logging.warning(
-            f"Rate limit detected for {url}. Waiting {delay:.2f} seconds...")
-        await asyncio.sleep(delay)
+    def _handle_rate_limit(self, url, domain):
+        """Handle rate limiting by slowing down the whole domain"""
+        logging.warning(f"Rate limit detected for {url}.")
+        self.metrics.incr('throttled')
+        self.domain_limiter.on_throttled(domain)
+
+    def _handle_block_page(self, url, kind):
+        """Record a CAPTCHA or error page so the URL can be retried later"""
+        logging.warning(f"Block page ({kind}) served for {url}")
+        self.metrics.incr('blocked_pages')
+        self.blocked_urls[url] = kind
         return None
 
     async def _handle_server_error(self, url):
@@ -134,117 +536,50 @@ class WebScraperImproved:
 
     async def scrape_page_products(self, page_url, region):
         """Scrape all product URLs from a single page"""
-        html = await self.fetch_page(page_url)
+        product_links, next_page_url, _ = await self.scrape_listing_page(
+            page_url, region)
+        return product_links, next_page_url
+
+    async def scrape_listing_page(self, page_url, region):
+        """Scrape product URLs, the next page URL and the page count of a search page"""
+        # Search results change between runs, so they bypass the cache
+        html = await self.fetch_page(page_url, use_cache=False, priority=LISTING_PRIORITY)
         if not html:
-            return [], None
-
-        soup = BeautifulSoup(html, 'html.parser',
-                             parse_only=self.product_strainer)
-
-        base_urls = {
-            'eg': 'https://www.amazon.eg',
-            'sa': 'https://www.amazon.sa',
-            'us': 'https://www.amazon.com',
-            'jp': 'https://www.amazon.co.jp',
-            'de': 'https://www.amazon.de',
-            'ca': 'https://www.amazon.ca',
-            'uk': 'https://www.amazon.co.uk',
-            'au': 'https://www.amazon.com.au',
-            'ae': 'https://www.amazon.ae',
-            'in': 'https://www.amazon.in'
-        }
-
-        base_url = base_urls.get(region)
-        if not base_url:
-            raise ValueError(f"Unsupported region: {region}")
-
-        product_links = {
-            urljoin(base_url, link.get('href'))
-            for link in soup.find_all('a')
-            if link.get('href') and not link.get('href').startswith('#')
-        }
+            return [], None, None
 
-        # Get next page URL
-        soup = BeautifulSoup(html, 'html.parser')
-        next_button = soup.select_one("a.s-pagination-next")
-        next_page_url = urljoin(
-            base_url, next_button['href']
-        ) if next_button and next_button.get('href') else None
-
-        return list(product_links), next_page_url
-
-    def _extract_price(self, soup):
-        """Extract price from product page"""
-        price_selectors = [
-            "#corePriceDisplay_desktop_feature_div .a-price-whole",
-            "div.a-section.a-spacing-micro span.a-price.a-text-price.a-size-medium span.a-offscreen"
-        ]
+        hrefs, next_href, page_count = await self._parse(extract_listing_html, html)
 
-        for selector in price_selectors:
-            element = soup.select_one(selector)
-            if element:
-                return element.get_text(strip=True)
-        return None
+        base_url = self.config['base_urls'].get(region) or get_base_url(region)
 
-    def _extract_discount(self, soup):
-        """Extract discount information"""
-        discount_selectors = [
-            "span.a-color-price",
-            ".savingsPercentage"
-        ]
+        product_links, duplicates = canonicalize_product_links(hrefs, base_url)
+        self.link_stats['links_seen'] += len(hrefs)
+        self.link_stats['duplicates_removed'] += duplicates
 
-        for selector in discount_selectors:
-            elements = soup.select(selector)
-            for element in elements:
-                discount_text = element.get_text(strip=True)
-                match = re.search(r'(-?\d+%)', discount_text)
-                if match:
-                    return match.group(1)
-        return None
-
-    def _extract_image_url(self, soup):
-        """Extract product image URL"""
-        img_element = soup.select_one("#imgTagWrapperId img")
-        return img_element['src'] if img_element else None
-
-    def _extract_description(self, soup):
-        """Extract product description"""
-        description_element = soup.select_one("#feature-bullets")
-        return description_element.text.strip() if description_element else None
+        # Get next page URL
+        next_page_url = urljoin(base_url, next_href) if next_href else None
 
-    def _extract_reviews(self, soup):
-        """Extract product reviews"""
-        reviews = []
-        review_cards = soup.select("div[data-hook='review']")
+        return product_links, next_page_url, page_count
 
-        for review in review_cards[:5]:
+    async def _scrape_page_with_retries(self, page_url, region):
+        """Fetch a search page, retrying while it yields no products"""
+        for attempt in range(self.config['max_retries']):
             try:
-                reviewer_name = review.select_one(
-                    "span.a-profile-name").text.strip()
-                review_rating = review.select_one(
-                    "i.a-icon-star span.a-icon-alt"
-                ).text.strip().replace("out of 5 stars", "")
-                review_date = review.select_one(
-                    "span.review-date").text.strip()
-                review_text = review.select_one(
-                    "span[data-hook='review-body']"
-                ).text.strip()
-
-                reviews.append({
-                    "Reviewer": reviewer_name,
-                    "Rating": review_rating,
-                    "Date": review_date,
-                    "Review": review_text
-                })
+                products, _ = await self.scrape_page_products(page_url, region)
+                if products:
+                    return products
+                logging.warning(
+                    f"No products found on {page_url}. Retry {attempt + 1}/{self.config['max_retries']}")
             except Exception as e:
-                logging.error(f"Error extracting review: {str(e)}")
-                continue
+                logging.error(f"Error scraping page {page_url}: {str(e)}")
+            await asyncio.sleep(self.config['retry_delay'])
 
-        return reviews
+        logging.error(f"Max retries reached for page {page_url}")
+        return []
 
     def _validate_product_data(self, data):
         """Validate product data has required fields"""
         if not all(field in data for field in self.config['required_fields']):
+            self.metrics.incr('validation_failures')
             logging.warning(
                 f"Missing required fields for product: {data.get('product_url', 'Unknown URL')}")
             return None
@@ -252,78 +587,48 @@ class WebScraperImproved:
 
     def clean_text(self, text):
         """Clean text data"""
-        text = re.sub(r'[\u200f\u200e]', '', text)
-        text = re.sub(r'\s+', ' ', text)
-        return text.strip()
+        return clean_text(text)
 
     async def scrape_product_data(self, url, region):
         """Scrape data for a single product"""
+        if self.snapshot:
+            # Still listed, even if it is skipped below
+            self.snapshot.seen(url)
         if url in self.scraped_urls:
             logging.info(f"Skipping already scraped URL: {url}")
             return None
+        if self.checkpoint and url in self.checkpoint.completed_urls:
+            logging.info(f"Skipping URL completed before restart: {url}")
+            return None
+        if self.crawl_state and self.crawl_state.is_fresh(url):
+            logging.info(f"Skipping recently scraped URL: {url}")
+            return None
 
-        html = await self.fetch_page(url)
+        html = await self.fetch_page(url, stream_fields=self.stream_fields)
         if not html:
+            if url in self.blocked_urls:
+                self.deferred_urls.append(url)
             return None
 
-        soup = BeautifulSoup(html, 'html.parser')
-
         try:
             product_data = {
                 "date_column": datetime.today().strftime('%Y-%m-%d'),
                 "product_url": url,
                 "site": f"amazon_{region.lower()}",
                 "category": "mobile phones",
-                "Title": soup.select_one("#productTitle").text.strip() if soup.select_one("#productTitle") else None,
-                "Price": self._extract_price(soup),
-                "Discount": self._extract_discount(soup),
-                "Image URL": self._extract_image_url(soup),
-                "Description": self._extract_description(soup),
-                "Reviews": self._extract_reviews(soup)
+                **(await self._parse(extract_product_html, html))
             }
 
-            # Extract data from tables (first_table, tech_specs, right_table, new_table)
-            tables = {
-                'first_table': '.a-normal.a-spacing-micro',
-                'tech_specs': '#productDetails_techSpec_section_1',
-                'right_table': '#productDetails_detailBullets_sections1',
-                'new_table': 'ul.a-unordered-list.a-nostyle.a-vertical.a-spacing-none.detail-bullet-list',
-                'bestseller_rank': 'table.a-keyvalue.prodDetTable'
-            }
-
-            for table_name, selector in tables.items():
-                table = soup.select_one(selector)
-                if table:
-                    if table_name == 'new_table':
-                        items = table.find_all('li')
-                        for item in items:
-                            key_element = item.select_one('span.a-text-bold')
-                            value_element = item.find(
-                                'span', class_=lambda x: x != 'a-text-bold')
-                            if key_element and value_element:
-                                key = self.clean_text(
-                                    key_element.text.strip().replace(':', ''))
-                                value = self.clean_text(
-                                    value_element.text.strip())
-                                # value = remove_key_from_value(key, value)
-                                product_data[key] = value
-                    else:
-                        rows = table.find_all('tr')
-                        for row in rows:
-                            key_element = row.find(['th', 'td'])
-                            value_element = row.find_all(
-                                'td')[-1] if row.find_all('td') else None
-                            if key_element and value_element:
-                                key = self.clean_text(
-                                    key_element.get_text(strip=True))
-                                value = self.clean_text(
-                                    value_element.get_text(strip=True))
-                                product_data[key] = value
-
             product_data = self._validate_product_data(product_data)
 
             if product_data:
                 self.scraped_urls.add(url)
+                if self.crawl_state:
+                    self.crawl_state.record(url, product_data)
+                if self.checkpoint and self.checkpoint.keep_products:
+                    # Kept in the checkpoint itself; streamed products are done
+                    # once the sink has written them (output_written)
+                    self.checkpoint.product_done(url, product_data)
 
             return product_data
 
@@ -331,21 +636,100 @@ class WebScraperImproved:
             logging.error(f"Error scraping product {url}: {str(e)}")
             return None
 
-    async def scrape_all_products(self, start_page_url, region, max_pages=17):
-        """Scrape all products from multiple pages"""
+    def output_written(self, urls):
+        """Sink callback: the products (or change events) of these URLs are written"""
+        if self.snapshot:
+            self.snapshot.commit(urls)
+        if self.checkpoint:
+            for url in urls:
+                self.checkpoint.product_done(url)
+
+    async def iter_product_links(self, start_page_url, region, max_pages=17):
+        """Follow the search pagination and yield each new product URL"""
         all_product_links = set()
         current_page_url = start_page_url
         page_number = 1
         pages_scraped = 0
+        pages_failed = 0
         retry_count = 0  # Initialize retry counter
 
-        # Create semaphore for concurrent requests
-        sem = asyncio.Semaphore(self.config['max_concurrent_requests'])
-
-        async def fetch_product_with_semaphore(url):
-            """Fetch product data with semaphore control"""
-            async with sem:
-                return await self.scrape_product_data(url, region)
+        def take_new_links(products):
+            """Remember unseen links and count the rest as duplicates"""
+            new_links = [
+                link for link in products
+                if link not in all_product_links
+            ]
+            all_product_links.update(new_links)
+            self.link_stats['duplicates_removed'] += len(
+                products) - len(new_links)
+            if checkpoint:
+                checkpoint.add_links(new_links)
+            return new_links
+
+        checkpoint = self.checkpoint
+        if checkpoint and checkpoint.resumed:
+            # Links found before the restart go out first
+            all_product_links.update(checkpoint.links)
+            for link in checkpoint.pending_links():
+                yield link
+            if checkpoint.pagination_done:
+                return
+            if checkpoint.next_page_url and not self.config['parallel_pagination']:
+                current_page_url = checkpoint.next_page_url
+                page_number = checkpoint.page_number
+
+        if self.config['parallel_pagination']:
+            products, next_page, page_count = await self.scrape_listing_page(
+                start_page_url, region)
+            page_urls = predict_page_urls(next_page, page_count, max_pages)
+
+            if products and page_urls is not None:
+                if checkpoint:
+                    page_urls = [
+                        url for url in page_urls
+                        if url not in checkpoint.pages_done
+                    ]
+                logging.info(
+                    f"Found {page_count} pages, fetching {len(page_urls)} more concurrently")
+                for link in take_new_links(products):
+                    yield link
+
+                async def scrape_page(url):
+                    return url, await self._scrape_page_with_retries(url, region)
+
+                # Pages are fetched concurrently, bounded by fetch_page's limiters
+                tasks = [
+                    asyncio.ensure_future(scrape_page(url))
+                    for url in page_urls
+                ]
+                try:
+                    for task in asyncio.as_completed(tasks):
+                        page_url, page_products = await task
+                        for link in take_new_links(page_products):
+                            yield link
+                        if checkpoint and page_products:
+                            checkpoint.page_done(page_url)
+                        if not page_products:
+                            pages_failed += 1
+                finally:
+                    for task in tasks:
+                        task.cancel()
+
+                self.pagination_complete = not pages_failed and page_count <= max_pages
+
+                logging.info(
+                    f"Total unique product links found: {len(all_product_links)}")
+                if checkpoint:
+                    checkpoint.finish_pagination()
+                return
+
+            # Page URL pattern not found, follow the next links serially
+            logging.info("No page URL pattern found, paginating serially")
+            if products:
+                for link in take_new_links(products):
+                    yield link
+                current_page_url = next_page
+                page_number = 2
 
         while current_page_url and page_number <= max_pages:
             logging.info(f"Scraping page {page_number}: {current_page_url}")
@@ -356,13 +740,19 @@ class WebScraperImproved:
                 if products:
                     # Reset retry counter on successful scrape
                     retry_count = 0
-                    all_product_links.update(products)
+                    new_links = take_new_links(products)
                     logging.info(
                         f"Found {len(products)} product links on page {page_number}. "
                         f"Total unique products: {len(all_product_links)}"
                     )
 
+                    for link in new_links:
+                        yield link
+
                     pages_scraped += 1
+                    if checkpoint:
+                        checkpoint.page_done(
+                            current_page_url, next_page, page_number + 1)
                     current_page_url = next_page
                     page_number += 1
 
@@ -388,6 +778,7 @@ class WebScraperImproved:
                         logging.error(
                             f"Max retries ({self.config['max_retries']}) reached for page {page_number}. Moving to next page."
                         )
+                        pages_failed += 1
                         # Move to next page or break if no next page
                         if not next_page:
                             break
@@ -407,23 +798,211 @@ class WebScraperImproved:
                 if retry_count >= self.config['max_retries']:
                     logging.error(
                         f"Max retries reached for page {page_number}. Stopping.")
+                    pages_failed += 1
                     break
                 await asyncio.sleep(self.config['retry_delay'])
 
         logging.info(
             f"Total unique product links found: {len(all_product_links)}")
-
-        # Scrape individual products concurrently
+        # The loop also ends at max_pages, with pages left to crawl
+        self.pagination_complete = not current_page_url and not pages_failed
+        if checkpoint:
+            checkpoint.finish_pagination()
+
+    async def collect_product_links(self, start_page_url, region, max_pages=17):
+        """Follow the search pagination and collect all product URLs"""
+        async with aclosing(self.iter_product_links(
+                start_page_url, region, max_pages)) as links:
+            return [link async for link in links]
+
+    def _checkpointed_products(self):
+        """Products completed before a restart that have not been returned yet"""
+        if not self.checkpoint or not self.checkpoint.resumed:
+            return []
+        return list(self.checkpoint.products)
+
+    async def iter_products(self, product_urls, region):
+        """Yield validated product data as each product finishes scraping"""
+        for data in self._checkpointed_products():
+            yield data
+
+        # Concurrency and request rate are bounded inside fetch_page
         tasks = [
-            fetch_product_with_semaphore(url)
-            for url in all_product_links
-        ]
-        all_product_data = [
-            data for data in await asyncio.gather(*tasks)
-            if data is not None
+            asyncio.ensure_future(self.scrape_product_data(url, region))
+            for url in product_urls
         ]
+        try:
+            for task in asyncio.as_completed(tasks):
+                data = await task
+                if data is not None:
+                    yield data
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        async for data in self.iter_deferred_products(region):
+            yield data
+
+    async def iter_deferred_products(self, region):
+        """Retry product pages that were answered with a block page"""
+        for round_number in range(1, self.config['block_retry_rounds'] + 1):
+            urls, self.deferred_urls = self.deferred_urls, []
+            if not urls:
+                return
+            delay = random.uniform(*self.config['block_retry_delay'])
+            logging.info(
+                f"Retrying {len(urls)} blocked product pages in {delay:.1f}s "
+                f"(round {round_number}/{self.config['block_retry_rounds']})")
+            await asyncio.sleep(delay)
+
+            tasks = [
+                asyncio.ensure_future(self.scrape_product_data(url, region))
+                for url in urls
+            ]
+            try:
+                for task in asyncio.as_completed(tasks):
+                    data = await task
+                    if data is not None:
+                        yield data
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+    def _batch_products(self, product_urls, region, start_url=None):
+        """Products of a batch of URLs, or their change events in delta mode"""
+        products = self.iter_products(product_urls, region)
+        if self.snapshot:
+            # A batch only sees part of the links; the orchestrator runs the
+            # removal pass (AmazonRemovals) once all batches are done
+            scope = search_scope(start_url) if start_url else f"amazon_{region.lower()}"
+            products = self.iter_changes(products, scope, removals=False)
+        return products
+
+    async def scrape_products(self, product_urls, region, start_url=None):
+        """Scrape data for a list of product URLs concurrently"""
+        async with aclosing(self._batch_products(
+                product_urls, region, start_url)) as products:
+            return [data async for data in products]
+
+    async def scrape_products_to_sink(self, product_urls, region, sink, start_url=None):
+        """Stream product data into a sink and return the sink summary"""
+        # Closing the stream cancels its scrape tasks when the sink fails
+        async with aclosing(self._batch_products(
+                product_urls, region, start_url)) as products:
+            async for data in products:
+                await sink.write(data)
+        return await sink.close()
 
-        return all_product_data
+    async def scrape_all_products(self, start_page_url, region, max_pages=17):
+        """Scrape all products from multiple pages"""
+        async with aclosing(self.iter_all_products(
+                start_page_url, region, max_pages)) as products:
+            return [data async for data in products]
+
+    async def iter_pipelined_products(self, start_page_url, region, max_pages=17):
+        """Scrape products while pagination is still discovering links"""
+        # Bounded queues keep memory flat when one side outpaces the other
+        link_queue = asyncio.Queue(maxsize=self.config['queue_size'])
+        result_queue = asyncio.Queue(maxsize=self.config['queue_size'])
+        worker_count = self.config['max_concurrent_requests']
+        done = object()
+
+        async def produce_links():
+            """Push product URLs onto the queue as pages are crawled"""
+            try:
+                async with aclosing(self.iter_product_links(
+                        start_page_url, region, max_pages)) as links:
+                    async for link in links:
+                        await link_queue.put(link)
+            except Exception as e:
+                logging.error(f"Error collecting product links: {str(e)}")
+            # Not reached when cancelled: nobody drains the queue any more
+            for _ in range(worker_count):
+                await link_queue.put(done)
+
+        async def scrape_worker():
+            """Scrape queued product URLs until the producer is finished"""
+            while True:
+                url = await link_queue.get()
+                if url is done:
+                    break
+                try:
+                    data = await self.scrape_product_data(url, region)
+                except Exception as e:
+                    logging.error(
+                        f"Error scraping product {url}: {str(e)}")
+                    data = None
+                if data is not None:
+                    await result_queue.put(data)
+            # Not reached when cancelled: nobody drains the queue any more
+            await result_queue.put(done)
+
+        for data in self._checkpointed_products():
+            yield data
+
+        tasks = [asyncio.ensure_future(produce_links())] + [
+            asyncio.ensure_future(scrape_worker())
+            for _ in range(worker_count)
+        ]
+        finished_workers = 0
+        try:
+            while finished_workers < worker_count:
+                data = await result_queue.get()
+                if data is done:
+                    finished_workers += 1
+                    continue
+                yield data
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        async for data in self.iter_deferred_products(region):
+            yield data
+
+    async def iter_changes(self, products, default_scope, removals=True):
+        """Turn a product stream into new/changed events, then removed events
+
+        Removals are only meaningful when the stream covered the whole crawl,
+        so batch activities that see part of the links pass removals=False,
+        and none are reported when pagination did not complete.
+        """
+        self.snapshot.begin(default_scope)
+        if self.checkpoint and self.checkpoint.resumed:
+            # Links finished before the restart are not scraped again
+            for url in self.checkpoint.links:
+                self.snapshot.seen(url)
+
+        async with aclosing(products):
+            async for product in products:
+                event = self.snapshot.compare(product)
+                if event:
+                    yield event
+                elif self.checkpoint and not self.checkpoint.keep_products:
+                    # Nothing to write, so the product is done already
+                    self.checkpoint.product_done(product['product_url'])
+        if removals and self.pagination_complete:
+            for event in self.snapshot.removed():
+                yield event
+        elif removals:
+            logging.warning(
+                "Pagination did not complete, not reporting removed products")
+
+    async def iter_all_products(self, start_page_url, region, max_pages=17):
+        """Crawl all pages and yield product data as it is scraped"""
+        if self.config['pipeline']:
+            async with aclosing(self.iter_pipelined_products(
+                    start_page_url, region, max_pages)) as products:
+                async for data in products:
+                    yield data
+            return
+
+        product_links = await self.collect_product_links(
+            start_page_url, region, max_pages
+        )
+        async with aclosing(self.iter_products(product_links, region)) as products:
+            async for data in products:
+                yield data
 
 
 async def main(input: dict) -> dict:
@@ -444,11 +1023,37 @@ async def main(input: dict) -> dict:
             input['max_pages'], str
         ) else input['max_pages']
 
+        # Products already written to a sink need not be kept in the checkpoint
+        checkpoint = {
+            **input['checkpoint'], 'keep_products': not input.get('output')
+        } if input.get('checkpoint') else None
+
         # Initialize and run scraper
-        async with WebScraperImproved() as scraper:
-            product_data = await scraper.scrape_all_products(
-                start_url, region, max_pages
-            )
+        async with WebScraperImproved(activity_config(input.get('config')), checkpoint) as scraper:
+            resumed = bool(scraper.checkpoint and scraper.checkpoint.resumed)
+            if scraper.snapshot and (input.get('output') or {}).get('format', 'ndjson') != 'ndjson':
+                raise ValueError("Delta mode writes change events as NDJSON")
+            products = scraper.iter_all_products(start_url, region, max_pages)
+            if scraper.snapshot:
+                # Only new, changed and removed products leave the scraper
+                products = scraper.iter_changes(products, search_scope(start_url))
+
+            # Closing the stream cancels its scrape tasks if a write fails
+            async with aclosing(products):
+                if input.get('output'):
+                    # Stream products to the sink and only return a summary
+                    sink = create_sink(
+                        input['output'], append=resumed, on_flush=scraper.output_written)
+                    async for data in products:
+                        await sink.write(data)
+                    output = await sink.close()
+                    total_products = output['total_written']
+                else:
+                    product_data = [data async for data in products]
+                    total_products = len(product_data)
+                    if input.get('result_format') == 'columnar' and not scraper.snapshot:
+                        # Fixed columns plus spec/review side tables instead of one dict per product
+                        product_data = ProductTable(product_data).as_dict()
 
             end_time = time.time()
             execution_time = end_time - start_time
@@ -456,21 +1061,44 @@ async def main(input: dict) -> dict:
             result = {
                 "status": "success",
                 "region": region,
-                "total_products": len(product_data),
+                "total_products": total_products,
                 "execution_time": f"{execution_time:.2f} seconds",
-                "scraped_data": product_data
+                "connection_stats": scraper.get_connection_stats(),
+                "rate_limit_stats": scraper.domain_limiter.get_stats(),
+                "block_stats": scraper.block_monitor.get_stats(),
+                "retry_stats": scraper.retry_scheduler.get_stats(),
+                "link_stats": scraper.link_stats,
+                **scraper.metrics_result()
             }
+            if scraper.http_cache:
+                result["cache_stats"] = scraper.http_cache.get_stats()
+            if scraper.crawl_state:
+                result["crawl_state_stats"] = scraper.crawl_state.get_stats()
+            if scraper.snapshot:
+                result["delta_stats"] = scraper.snapshot.get_stats()
+            if input.get('output'):
+                result["output"] = output
+            else:
+                result["scraped_data"] = product_data
+            if scraper.checkpoint:
+                result["resumed"] = resumed
+                await scraper.checkpoint.clear()
 
             logging.info(
                 f"Scraping completed in {execution_time:.2f} seconds. "
-                f"Found {len(product_data)} products."
+                f"Found {total_products} products."
             )
 
             return result
-    except Exception as e:
+    except ValueError as e:
+        # Invalid input fails the same way on every attempt, so it is not retried
         logging.error(f"An error occurred in main execution: {str(e)}")
         return {
             "status": "error",
             "error": str(e),
             "execution_time": f"{time.time() - start_time:.2f} seconds"
         }
+    except Exception as e:
+        logging.error(f"An error occurred in main execution: {str(e)}")
+        # Raised so a durable retry resumes the crawl from its checkpoint
+        raise
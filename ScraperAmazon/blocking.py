@@ -0,0 +1,75 @@
+# ScraperAmazon bot-block detection
+from collections import deque
+import logging
+
+# Block pages are a few KB; real search and product pages are hundreds of KB,
+# so larger bodies are never scanned
+BLOCK_PAGE_MAX_BYTES = 64 * 1024
+
+# Byte signatures of the pages Amazon serves instead of content, with 200 OK
+BLOCK_SIGNATURES = (
+    (b'/errors/validateCaptcha', 'captcha'),
+    (b'Type the characters you see in this image', 'captcha'),
+    (b'api-services-support@amazon.com', 'robot_check'),
+    (b"Sorry, we just need to make sure you're not a robot", 'robot_check'),
+    (b'Meet the dogs of Amazon', 'error_page'),
+    (b'Sorry! Something went wrong', 'error_page')
+)
+
+
+def classify_block(body):
+    """Return the kind of block page a response body is, or None for real content"""
+    if len(body) > BLOCK_PAGE_MAX_BYTES:
+        return None
+    for signature, kind in BLOCK_SIGNATURES:
+        if signature in body:
+            return kind
+    return None
+
+
+class BlockMonitor:
+    """Track the block rate of recent responses and adapt request concurrency to it
+
+    When more than `threshold` of the last `window` responses were block pages,
+    the concurrency limit is halved; once the rate falls below half the threshold
+    it grows back by one. Each change waits for a full round of responses at the
+    current limit, so one burst of blocks only lowers it once.
+    """
+
+    def __init__(self, limiter, window=50, threshold=0.1):
+        self.limiter = limiter
+        self.threshold = threshold
+        self.recent = deque(maxlen=window)
+        self.since_change = 0
+        self.blocked = {}
+
+    @property
+    def block_rate(self):
+        return sum(self.recent) / len(self.recent) if self.recent else 0.0
+
+    def record(self, kind=None):
+        """Record one response, `kind` being the block page type or None"""
+        self.recent.append(kind is not None)
+        if kind:
+            self.blocked[kind] = self.blocked.get(kind, 0) + 1
+        self.since_change += 1
+        if self.since_change < self.limiter.limit:
+            return
+
+        rate = self.block_rate
+        if rate > self.threshold and self.limiter.limit > self.limiter.min_limit:
+            self.limiter.set_limit(self.limiter.limit // 2)
+            self.since_change = 0
+            logging.warning(
+                f"Block rate {rate:.0%}, concurrency lowered to {self.limiter.limit}")
+        elif rate < self.threshold / 2 and self.limiter.limit < self.limiter.max_limit:
+            self.limiter.set_limit(self.limiter.limit + 1)
+            self.since_change = 0
+
+    def get_stats(self):
+        """Return block counts, the current block rate and concurrency"""
+        return {
+            "blocked": dict(self.blocked),
+            "block_rate": round(self.block_rate, 3),
+            "concurrency": self.limiter.limit
+        }
@@ -0,0 +1,211 @@
+# ScraperAmazon checkpoints
+import asyncio
+import json
+import logging
+import os
+import time
+
+
+class FileCheckpointStore:
+    """Keep crawl checkpoints as JSON files in a local directory"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, checkpoint_id):
+        return os.path.join(self.directory, f"{checkpoint_id}.json")
+
+    def load(self, checkpoint_id):
+        try:
+            with open(self._path(checkpoint_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, checkpoint_id, state):
+        # Write to a temporary file first so a crash never leaves half a checkpoint
+        path = self._path(checkpoint_id)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(path + '.tmp', path)
+
+    def delete(self, checkpoint_id):
+        try:
+            os.remove(self._path(checkpoint_id))
+        except FileNotFoundError:
+            pass
+
+
+class BlobCheckpointStore:
+    """Keep crawl checkpoints as JSON blobs in an Azure storage container"""
+
+    def __init__(self, container, prefix='checkpoints/', connection_string=None):
+        try:
+            from azure.storage.blob import ContainerClient
+        except ImportError:
+            raise ImportError(
+                "azure-storage-blob is required for blob checkpoints")
+        from azure.core.exceptions import ResourceNotFoundError
+
+        self.not_found = ResourceNotFoundError
+        self.prefix = prefix
+        self.container_client = ContainerClient.from_connection_string(
+            connection_string or os.environ['AzureWebJobsStorage'],
+            container_name=container
+        )
+
+    def _blob(self, checkpoint_id):
+        return self.container_client.get_blob_client(f"{self.prefix}{checkpoint_id}.json")
+
+    def load(self, checkpoint_id):
+        try:
+            return json.loads(self._blob(checkpoint_id).download_blob().readall())
+        except self.not_found:
+            return None
+
+    def save(self, checkpoint_id, state):
+        self._blob(checkpoint_id).upload_blob(
+            json.dumps(state, ensure_ascii=False), overwrite=True)
+
+    def delete(self, checkpoint_id):
+        try:
+            self._blob(checkpoint_id).delete_blob()
+        except self.not_found:
+            pass
+
+
+def create_checkpoint_store(spec):
+    """Create a checkpoint store from a spec such as {"type": "file", "directory": ...}"""
+    store_type = spec.get('type', 'file')
+    if store_type == 'file':
+        return FileCheckpointStore(spec.get('directory') or os.path.join(
+            os.environ.get('TMPDIR', '/tmp'), 'scraper-checkpoints'))
+    elif store_type == 'blob':
+        return BlobCheckpointStore(
+            spec['container'],
+            spec.get('prefix', 'checkpoints/'),
+            spec.get('connection_string')
+        )
+    raise ValueError(f"Unsupported checkpoint type: {store_type}")
+
+
+class CrawlCheckpoint:
+    """Progress of one crawl, saved periodically so a retry can resume it"""
+
+    def __init__(self, store, checkpoint_id, interval=15, keep_products=True):
+        self.store = store
+        self.checkpoint_id = checkpoint_id
+        self.interval = interval
+        self.keep_products = keep_products
+        self.last_saved = time.monotonic()
+        # Background save in flight, and whether another one was asked for meanwhile
+        self.saving = None
+        self.save_again = False
+
+        state = store.load(checkpoint_id) or {}
+        self.resumed = bool(state)
+        self.links = state.get('links', [])
+        self.pages_done = set(state.get('pages_done', []))
+        self.next_page_url = state.get('next_page_url')
+        self.page_number = state.get('page_number', 1)
+        self.pagination_done = state.get('pagination_done', False)
+        self.completed_urls = set(state.get('completed_urls', []))
+        self.products = state.get('products', [])
+
+        self._known_links = set(self.links)
+        if self.resumed:
+            logging.info(
+                f"Resuming checkpoint {checkpoint_id}: {len(self.links)} links, "
+                f"{len(self.completed_urls)} products done, "
+                f"pagination {'finished' if self.pagination_done else 'in progress'}")
+
+    def add_links(self, links):
+        for link in links:
+            if link not in self._known_links:
+                self._known_links.add(link)
+                self.links.append(link)
+
+    def page_done(self, page_url, next_page_url=None, page_number=None):
+        """Record a finished search page and, for serial crawls, the cursor"""
+        self.pages_done.add(page_url)
+        if page_number is not None:
+            self.next_page_url = next_page_url
+            self.page_number = page_number
+        self.maybe_save()
+
+    def finish_pagination(self):
+        self.pagination_done = True
+        self.maybe_save(force=True)
+
+    def pending_links(self):
+        """Links discovered before the restart whose products are not done yet"""
+        return [link for link in self.links if link not in self.completed_urls]
+
+    def product_done(self, url, product=None):
+        self.completed_urls.add(url)
+        if product is not None and self.keep_products:
+            self.products.append(product)
+        self.maybe_save()
+
+    def maybe_save(self, force=False):
+        """Start a background save once the interval has passed (or when forced)"""
+        if not force and time.monotonic() - self.last_saved < self.interval:
+            return
+        self.last_saved = time.monotonic()
+        if self.saving and not self.saving.done():
+            self.save_again = force or self.save_again
+            return
+        self.saving = asyncio.ensure_future(self._save_in_background())
+
+    async def _save_in_background(self):
+        while True:
+            self.save_again = False
+            await self._write(self._state())
+            if not self.save_again:
+                return
+
+    async def save(self):
+        """Save the current state once any background save has finished"""
+        if self.saving:
+            await self.saving
+        self.last_saved = time.monotonic()
+        await self._write(self._state())
+
+    def _state(self):
+        # Copies, so the crawl goes on while a worker thread serializes them
+        return {
+            "links": list(self.links),
+            "pages_done": sorted(self.pages_done),
+            "next_page_url": self.next_page_url,
+            "page_number": self.page_number,
+            "pagination_done": self.pagination_done,
+            "completed_urls": sorted(self.completed_urls),
+            "products": list(self.products) if self.keep_products else []
+        }
+
+    async def _write(self, state):
+        """Serialize and store a state in the default executor, off the event loop"""
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.store.save, self.checkpoint_id, state)
+        except Exception as e:
+            logging.error(f"Error saving checkpoint {self.checkpoint_id}: {str(e)}")
+
+    async def clear(self):
+        """Drop the checkpoint once the crawl has completed"""
+        # A save finishing after the delete would bring the checkpoint back
+        if self.saving:
+            await self.saving
+        await asyncio.get_running_loop().run_in_executor(
+            None, self.store.delete, self.checkpoint_id)
+
+
+def open_checkpoint(spec, interval):
+    """Load (or start) the checkpoint named by spec['id']"""
+    return CrawlCheckpoint(
+        create_checkpoint_store(spec),
+        spec['id'],
+        interval,
+        keep_products=spec.get('keep_products', True)
+    )
@@ -0,0 +1,245 @@
+# ScraperAmazon crawl state
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+
+from .http_cache import normalize_url
+from .urls import extract_asin
+
+# Fields left out of the content hash because they change on every crawl
+VOLATILE_FIELDS = ('date_column', 'Reviews')
+
+CREATE_PRODUCTS_TABLE = (
+    "CREATE TABLE IF NOT EXISTS products ("
+    " key TEXT PRIMARY KEY,"
+    " url TEXT NOT NULL,"
+    " last_scraped REAL NOT NULL,"
+    " content_hash TEXT NOT NULL)"
+)
+
+
+def state_key(url):
+    """Identify a product by ASIN, falling back to its normalized URL"""
+    asin = extract_asin(url)
+    return f"asin:{asin}" if asin else normalize_url(url)
+
+
+def content_hash(product):
+    """Hash the stable fields of a product record"""
+    stable = {k: v for k, v in product.items() if k not in VOLATILE_FIELDS}
+    payload = json.dumps(stable, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SqliteCrawlState:
+    """Remember when each product was last scraped, across runs
+
+    Products scraped by a run are only written when the run succeeds, so
+    products of a failed run, which may not have reached the output, are
+    scraped again by its retry.
+    """
+
+    def __init__(self, path, recrawl_after):
+        self.path = path
+        self.recrawl_after = recrawl_after
+        self.db = None
+        # Rows of this run, written by close(commit=True)
+        self.pending = {}
+        self.stats = {'skipped': 0, 'new': 0, 'changed': 0, 'unchanged': 0}
+
+    async def open(self):
+        self._connect()
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute(CREATE_PRODUCTS_TABLE)
+        self.db.commit()
+
+    def is_fresh(self, url):
+        """Whether the product was scraped recently enough to skip"""
+        row = self.db.execute(
+            "SELECT last_scraped FROM products WHERE key = ?", (state_key(url),)
+        ).fetchone()
+        fresh = row is not None and time.time() - row[0] < self.recrawl_after
+        if fresh:
+            self.stats['skipped'] += 1
+        return fresh
+
+    def record(self, url, product):
+        """Stage the scrape time and content hash of a product"""
+        key = state_key(url)
+        new_hash = content_hash(product)
+        row = self.db.execute(
+            "SELECT content_hash FROM products WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.stats['new'] += 1
+        elif row[0] != new_hash:
+            self.stats['changed'] += 1
+        else:
+            self.stats['unchanged'] += 1
+        self.pending[key] = (key, url, time.time(), new_hash)
+
+    def _commit(self):
+        self.db.executemany(
+            "INSERT OR REPLACE INTO products (key, url, last_scraped, content_hash)"
+            " VALUES (?, ?, ?, ?)",
+            list(self.pending.values())
+        )
+        self.db.commit()
+        self.pending = {}
+
+    def get_stats(self):
+        return dict(self.stats)
+
+    async def close(self, commit=True):
+        """Write this run's records, or drop them when the run failed"""
+        if self.db:
+            if commit:
+                self._commit()
+            elif self.pending:
+                logging.info(
+                    f"Run failed, not recording {len(self.pending)} scraped products")
+                self.pending = {}
+            self.db.close()
+            self.db = None
+
+
+class BlobCrawlState(SqliteCrawlState):
+    """SQLite crawl state synchronised with an Azure blob between runs
+
+    Parallel activities (fan-out batches, regions) may share the blob. The
+    upload is conditional on the ETag that was downloaded; when another run
+    uploaded in the meantime, its database is downloaded again, this run's
+    records are merged in (the later scrape of a product wins) and the upload
+    is retried. Blob transfers run in the default executor.
+    """
+
+    # Download-merge-upload rounds before giving up on a contended blob
+    MAX_UPLOAD_ATTEMPTS = 5
+
+    def __init__(self, container, blob_name, recrawl_after, connection_string=None):
+        try:
+            from azure.storage.blob import BlobClient
+        except ImportError:
+            raise ImportError(
+                "azure-storage-blob is required for the blob crawl state")
+
+        self.blob_client = BlobClient.from_connection_string(
+            connection_string or os.environ['AzureWebJobsStorage'],
+            container_name=container,
+            blob_name=blob_name
+        )
+        fd, path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(fd)
+        # ETag of the downloaded version, None when the blob did not exist
+        self.etag = None
+        super().__init__(path, recrawl_after)
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._download, self.path)
+        self._connect()
+
+    def _download(self, path):
+        """Write the current blob to path and remember its ETag"""
+        from azure.core.exceptions import ResourceNotFoundError
+
+        with open(path, 'wb') as f:
+            try:
+                downloader = self.blob_client.download_blob()
+                f.write(downloader.readall())
+                self.etag = downloader.properties.etag
+            except ResourceNotFoundError:
+                logging.info(
+                    f"No crawl state at {self.blob_client.blob_name}, starting fresh")
+                self.etag = None
+
+    def _upload(self, path):
+        """Upload path unless the blob changed since it was downloaded
+
+        Returns False when another run got there first.
+        """
+        from azure.core import MatchConditions
+        from azure.core.exceptions import ResourceExistsError, ResourceModifiedError
+
+        with open(path, 'rb') as f:
+            try:
+                if self.etag is None:
+                    self.blob_client.upload_blob(f, overwrite=False)
+                else:
+                    self.blob_client.upload_blob(
+                        f, overwrite=True, etag=self.etag,
+                        match_condition=MatchConditions.IfNotModified)
+            except (ResourceExistsError, ResourceModifiedError):
+                return False
+        return True
+
+    def _merge_into(self, path):
+        """Copy this run's records into the database at path, newer scrapes winning"""
+        db = sqlite3.connect(path)
+        try:
+            db.execute(CREATE_PRODUCTS_TABLE)
+            db.execute("ATTACH DATABASE ? AS local", (self.path,))
+            db.execute(
+                "INSERT INTO products (key, url, last_scraped, content_hash)"
+                " SELECT key, url, last_scraped, content_hash FROM local.products WHERE true"
+                " ON CONFLICT(key) DO UPDATE SET"
+                " url = excluded.url, last_scraped = excluded.last_scraped,"
+                " content_hash = excluded.content_hash"
+                " WHERE excluded.last_scraped > products.last_scraped"
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _sync(self):
+        path = self.path
+        for attempt in range(self.MAX_UPLOAD_ATTEMPTS):
+            if self._upload(path):
+                return
+            logging.info(
+                f"Crawl state {self.blob_client.blob_name} changed during the run, merging")
+            merged = self.path + '.remote'
+            self._download(merged)
+            self._merge_into(merged)
+            path = merged
+        logging.error(
+            f"Could not upload crawl state {self.blob_client.blob_name}: "
+            f"still contended after {self.MAX_UPLOAD_ATTEMPTS} attempts")
+
+    async def close(self, commit=True):
+        """Upload the database back to the blob, unless the run failed"""
+        if self.db is None:
+            return
+        await super().close(commit)
+        try:
+            if commit:
+                await asyncio.get_running_loop().run_in_executor(None, self._sync)
+        finally:
+            for path in (self.path, self.path + '.remote'):
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+def create_crawl_state(spec, recrawl_after):
+    """Create a crawl state store from a spec such as {"type": "sqlite", "path": ...}"""
+    state_type = spec.get('type', 'sqlite')
+    if state_type == 'sqlite':
+        return SqliteCrawlState(spec['path'], recrawl_after)
+    elif state_type == 'blob':
+        return BlobCrawlState(
+            spec['container'],
+            spec.get('blob_name', 'crawl_state.sqlite'),
+            recrawl_after,
+            spec.get('connection_string')
+        )
+    raise ValueError(f"Unsupported crawl state type: {state_type}")
@@ -0,0 +1,148 @@
+# ScraperAmazon change detection
+import json
+import os
+import sqlite3
+import time
+
+from .crawl_state import content_hash, state_key
+
+# Fields whose old and new values are reported in change events
+DEFAULT_DELTA_FIELDS = ('Price', 'Discount', 'Title')
+
+
+class SnapshotIndex:
+    """SQLite index of the last seen state of every product, per scope
+
+    A scope is one recurring crawl, by default its search (host, path and
+    search parameters of the start URL). Products of the scope that were not
+    seen in a run whose pagination completed are reported as removed.
+
+    The row behind a new, changed or removed event is only written once the
+    event has been delivered (commit), or when the run succeeds (close), so a
+    failed run reports the same events again when it is retried.
+    """
+
+    def __init__(self, path, scope=None, fields=DEFAULT_DELTA_FIELDS):
+        self.path = path
+        self.scope = scope
+        self.fields = tuple(fields)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            " scope TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " url TEXT NOT NULL,"
+            " content_hash TEXT NOT NULL,"
+            " fields TEXT NOT NULL,"
+            " last_seen REAL NOT NULL,"
+            " PRIMARY KEY (scope, key))"
+        )
+        self.db.commit()
+        self.seen_keys = set()
+        # Snapshot rows and removals waiting for their event to be delivered
+        self.pending_rows = {}
+        self.pending_removals = set()
+        self.stats = {'new': 0, 'changed': 0, 'unchanged': 0, 'removed': 0}
+
+    def begin(self, default_scope):
+        """Start a run, using default_scope when the spec named none"""
+        self.scope = self.scope or default_scope
+
+    def seen(self, url):
+        """Mark a product as still listed, whether or not it gets scraped"""
+        self.seen_keys.add(state_key(url))
+
+    def compare(self, product):
+        """Return a new/changed event, or None after updating an unchanged product"""
+        url = product['product_url']
+        key = state_key(url)
+        self.seen_keys.add(key)
+        new_hash = content_hash(product)
+        tracked = {field: product.get(field) for field in self.fields}
+        row = self.db.execute(
+            "SELECT content_hash, fields FROM snapshots WHERE scope = ? AND key = ?",
+            (self.scope, key)
+        ).fetchone()
+        self.pending_rows[key] = (
+            self.scope, key, url, new_hash,
+            json.dumps(tracked, ensure_ascii=False), time.time()
+        )
+
+        if row is None:
+            self.stats['new'] += 1
+            return {"event": "new", "key": key, "product_url": url, "product": product}
+        if row[0] == new_hash:
+            self.stats['unchanged'] += 1
+            self._write([key])
+            return None
+
+        previous = json.loads(row[1])
+        changes = {
+            field: {"old": previous.get(field), "new": value}
+            for field, value in tracked.items()
+            if previous.get(field) != value
+        }
+        if not changes:
+            # Only untracked fields such as spec rows differ
+            self.stats['unchanged'] += 1
+            self._write([key])
+            return None
+        self.stats['changed'] += 1
+        return {
+            "event": "changed",
+            "key": key,
+            "product_url": url,
+            "date_column": product.get('date_column'),
+            "changes": changes
+        }
+
+    def removed(self):
+        """Return events for products of the scope not seen in this run"""
+        rows = self.db.execute(
+            "SELECT key, url FROM snapshots WHERE scope = ?", (self.scope,)
+        ).fetchall()
+        events = [
+            {"event": "removed", "key": key, "product_url": url}
+            for key, url in rows if key not in self.seen_keys
+        ]
+        self.pending_removals.update(event['key'] for event in events)
+        self.stats['removed'] += len(events)
+        return events
+
+    def commit(self, urls):
+        """Write the snapshot changes behind the delivered events of these URLs"""
+        self._write([state_key(url) for url in urls])
+
+    def _write(self, keys):
+        rows = [self.pending_rows.pop(key) for key in keys if key in self.pending_rows]
+        removals = [(self.scope, key) for key in keys if key in self.pending_removals]
+        self.pending_removals.difference_update(keys)
+        self.db.executemany(
+            "INSERT OR REPLACE INTO snapshots (scope, key, url, content_hash, fields, last_seen)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        self.db.executemany(
+            "DELETE FROM snapshots WHERE scope = ? AND key = ?", removals)
+        self.db.commit()
+
+    def get_stats(self):
+        return dict(self.stats)
+
+    def close(self, commit=True):
+        """Write the changes behind undelivered events, or drop them when the run failed"""
+        if commit:
+            self._write(list(self.pending_rows) + list(self.pending_removals))
+        self.db.close()
+
+
+def open_snapshot(spec):
+    """Open the snapshot index of a delta spec such as {"path": ..., "scope": ...}"""
+    return SnapshotIndex(
+        spec['path'],
+        spec.get('scope'),
+        spec.get('fields') or DEFAULT_DELTA_FIELDS
+    )
@@ -0,0 +1,239 @@
+# ScraperAmazon HTTP cache
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+
+
+def normalize_url(url):
+    """Lower-case scheme and host, sort the query and drop the fragment"""
+    parts = urlparse(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunparse((
+        parts.scheme.lower(), parts.netloc.lower(), parts.path or '/',
+        '', query, ''
+    ))
+
+
+# Entries written by other worker processes are counted against the size cap
+# after at most this many seconds
+RESCAN_INTERVAL = 60
+
+
+def scan_directory(directory):
+    """Read the metadata files of a cache directory into an index"""
+    entries = {}
+    for name in os.listdir(directory):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        entries[meta['key']] = meta
+    return entries
+
+
+class CacheIndex:
+    """Entries of one cache directory, shared by all scrapers of a worker process
+
+    Only changed on the event loop. The directory is rescanned every
+    RESCAN_INTERVAL seconds, so pages stored by other processes count too.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.entries = {}
+        self.total_bytes = 0
+        self.scanned = None
+
+    def due(self):
+        """Whether the directory should be (re)scanned"""
+        return self.scanned is None or time.monotonic() - self.scanned >= RESCAN_INTERVAL
+
+    def replace(self, entries):
+        self.entries = entries
+        self.total_bytes = sum(entry['size'] for entry in entries.values())
+        self.scanned = time.monotonic()
+
+    def add(self, entry):
+        self.discard(entry['key'])
+        self.entries[entry['key']] = entry
+        self.total_bytes += entry['size']
+
+    def discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry:
+            self.total_bytes -= entry['size']
+        return entry
+
+
+class SharedIndexes:
+    """Cache index of every directory, shared by all scrapers of a worker process
+
+    Concurrent activities on one worker that use the same cache directory then
+    keep it under one size cap together.
+    """
+
+    def __init__(self):
+        self.indexes = {}
+
+    def get(self, directory):
+        directory = os.path.realpath(directory)
+        if directory not in self.indexes:
+            self.indexes[directory] = CacheIndex(directory)
+        return self.indexes[directory]
+
+
+# One per worker process
+SHARED_CACHE_INDEXES = SharedIndexes()
+
+
+class HttpCache:
+    """On-disk cache of gzip-compressed page bodies with LRU eviction
+
+    Compression and file access run in the default executor, so the event loop
+    is not blocked by them.
+    """
+
+    def __init__(self, directory, max_bytes, ttl, shared=SHARED_CACHE_INDEXES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.index = shared.get(directory)
+        self.stats = {
+            'hits': 0,
+            'revalidated': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0
+        }
+
+    def _path(self, key, ext):
+        return os.path.join(self.directory, f"{key}.{ext}")
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def open(self):
+        """Load the index of the cache directory unless it is recent"""
+        os.makedirs(self.directory, exist_ok=True)
+        if self.index.due():
+            self.index.replace(await self._run(scan_directory, self.directory))
+        await self._evict()
+
+    def _key(self, url):
+        return hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()
+
+    def lookup(self, url):
+        """Return the cache entry for a URL, or None"""
+        return self.index.entries.get(self._key(url))
+
+    def is_fresh(self, entry):
+        """Whether an entry can be served without revalidation"""
+        return time.time() - entry['stored_at'] < self.ttl
+
+    def conditional_headers(self, entry):
+        """Headers that let the server answer 304 Not Modified"""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def _read_body(self, key):
+        with open(self._path(key, 'gz'), 'rb') as f:
+            return gzip.decompress(f.read()).decode('utf-8')
+
+    async def read(self, entry):
+        """Return the decompressed body of an entry and mark it recently used"""
+        try:
+            body = await self._run(self._read_body, entry['key'])
+        except (OSError, EOFError) as e:
+            logging.warning(f"Dropping unreadable cache entry {entry['url']}: {str(e)}")
+            await self._remove(entry['key'])
+            return None
+        entry['last_used'] = time.time()
+        await self._run(self._write_meta, dict(entry))
+        return body
+
+    async def refresh(self, entry):
+        """Restart an entry's freshness period after a 304 response"""
+        entry['stored_at'] = entry['last_used'] = time.time()
+        await self._run(self._write_meta, dict(entry))
+
+    def _write_entry(self, key, body):
+        data = gzip.compress(body.encode('utf-8'))
+        with open(self._path(key, 'gz'), 'wb') as f:
+            f.write(data)
+        return len(data)
+
+    async def store(self, url, body, etag=None, last_modified=None):
+        """Compress and store a response body, evicting old entries if needed"""
+        if not etag and not last_modified and self.ttl <= 0:
+            return
+        key = self._key(url)
+        # Dropped first so no reader sees the entry while its body is replaced
+        self.index.discard(key)
+        size = await self._run(self._write_entry, key, body)
+        now = time.time()
+        entry = {
+            'key': key,
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'stored_at': now,
+            'last_used': now,
+            'size': size
+        }
+        await self._run(self._write_meta, entry)
+        self.index.add(entry)
+        self.stats['stores'] += 1
+        if self.index.due():
+            self.index.replace(await self._run(scan_directory, self.directory))
+        await self._evict()
+
+    def _write_meta(self, entry):
+        with open(self._path(entry['key'], 'json'), 'w') as f:
+            json.dump(entry, f)
+
+    def _delete_files(self, keys):
+        for key in keys:
+            for ext in ('gz', 'json'):
+                try:
+                    os.remove(self._path(key, ext))
+                except OSError:
+                    pass
+
+    async def _remove(self, key):
+        self.index.discard(key)
+        await self._run(self._delete_files, [key])
+
+    async def _evict(self):
+        """Drop least recently used entries until the cache fits its size cap"""
+        if self.index.total_bytes <= self.max_bytes:
+            return
+        evicted = []
+        for entry in sorted(self.index.entries.values(), key=lambda e: e['last_used']):
+            if self.index.total_bytes <= self.max_bytes:
+                break
+            self.index.discard(entry['key'])
+            evicted.append(entry['key'])
+        self.stats['evictions'] += len(evicted)
+        await self._run(self._delete_files, evicted)
+
+    def get_stats(self):
+        """Return hit/miss counts and the cache size for the run result"""
+        stats = dict(self.stats)
+        lookups = stats['hits'] + stats['revalidated'] + stats['misses']
+        stats['hit_rate'] = round(
+            (stats['hits'] + stats['revalidated']) / lookups, 3) if lookups else 0.0
+        stats['entries'] = len(self.index.entries)
+        stats['size_bytes'] = self.index.total_bytes
+        return stats
@@ -0,0 +1,142 @@
+# ScraperAmazon metrics
+from collections import defaultdict
+from contextlib import contextmanager
+import bisect
+import logging
+import time
+
+try:
+    import resource
+except ImportError:  # Windows has no resource module
+    resource = None
+
+# Histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+PHASES = ('dns', 'connect', 'ttfb', 'download', 'request', 'parse', 'extract')
+
+
+class Histogram:
+    """Latency histogram with fixed buckets and exact percentiles"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.values = []
+
+    def observe(self, value_ms):
+        self.counts[bisect.bisect_left(self.buckets, value_ms)] += 1
+        bisect.insort(self.values, value_ms)
+
+    def percentile(self, q):
+        if not self.values:
+            return None
+        index = min(len(self.values) - 1, int(q * len(self.values)))
+        return round(self.values[index], 2)
+
+    def as_dict(self):
+        total = sum(self.values)
+        return {
+            "count": len(self.values),
+            "sum_ms": round(total, 2),
+            "mean_ms": round(total / len(self.values), 2) if self.values else None,
+            "p50_ms": self.percentile(0.50),
+            "p90_ms": self.percentile(0.90),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.values[-1], 2) if self.values else None,
+            "buckets": {
+                **{f"le_{bound}": count for bound, count in zip(self.buckets, self.counts)},
+                "le_inf": self.counts[-1]
+            }
+        }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process, or None where unsupported"""
+    if resource is None:
+        return None
+    # ru_maxrss is reported in KB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+class ScraperMetrics:
+    """Per-run phase timings and counters, exportable as a dict, Prometheus text or spans"""
+
+    def __init__(self, export=None):
+        self.started = time.monotonic()
+        self.phases = {phase: Histogram() for phase in PHASES}
+        self.counters = defaultdict(int)
+        self.status_counts = defaultdict(int)
+        self.tracer = None
+        if export == 'otel':
+            try:
+                from opentelemetry import trace
+                self.tracer = trace.get_tracer("ScraperAmazon")
+            except ImportError:
+                logging.warning(
+                    "opentelemetry-api is not installed, spans are disabled")
+
+    def observe(self, phase, value_ms):
+        self.phases[phase].observe(value_ms)
+
+    def incr(self, name, amount=1):
+        self.counters[name] += amount
+
+    def count_status(self, status):
+        self.status_counts[str(status)] += 1
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Wrap a phase in an OpenTelemetry span when tracing is enabled"""
+        if self.tracer is None:
+            yield
+            return
+        with self.tracer.start_as_current_span(name, attributes=attributes):
+            yield
+
+    def as_dict(self):
+        return {
+            "elapsed_seconds": round(time.monotonic() - self.started, 2),
+            "phases": {
+                phase: histogram.as_dict()
+                for phase, histogram in self.phases.items()
+                if histogram.values
+            },
+            "counters": dict(self.counters),
+            "status_counts": dict(self.status_counts),
+            "peak_rss_mb": peak_rss_mb()
+        }
+
+    def to_prometheus(self, prefix="scraper"):
+        """Render the metrics in the Prometheus text exposition format"""
+        lines = [
+            f"# TYPE {prefix}_phase_duration_ms histogram"
+        ]
+        for phase, histogram in self.phases.items():
+            if not histogram.values:
+                continue
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(
+                    f'{prefix}_phase_duration_ms_bucket{{phase="{phase}",le="{bound}"}} {cumulative}')
+            lines.append(
+                f'{prefix}_phase_duration_ms_bucket{{phase="{phase}",le="+Inf"}} {len(histogram.values)}')
+            lines.append(
+                f'{prefix}_phase_duration_ms_sum{{phase="{phase}"}} {round(sum(histogram.values), 3)}')
+            lines.append(
+                f'{prefix}_phase_duration_ms_count{{phase="{phase}"}} {len(histogram.values)}')
+
+        lines.append(f"# TYPE {prefix}_events_total counter")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f'{prefix}_events_total{{event="{name}"}} {value}')
+
+        lines.append(f"# TYPE {prefix}_http_responses_total counter")
+        for status, value in sorted(self.status_counts.items()):
+            lines.append(f'{prefix}_http_responses_total{{status="{status}"}} {value}')
+
+        rss = peak_rss_mb()
+        if rss is not None:
+            lines.append(f"# TYPE {prefix}_peak_rss_megabytes gauge")
+            lines.append(f"{prefix}_peak_rss_megabytes {rss}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,371 @@
+# ScraperAmazon parsing
+from functools import lru_cache
+import importlib.util
+import logging
+import re
+import time
+
+# Backends tried in order when no parser backend is configured
+BACKEND_PREFERENCE = ['selectolax', 'lxml', 'bs4']
+
+# Exact class attribute match, like the SoupStrainer it replaces
+LISTING_LINK_SELECTOR = (
+    'a[class="a-link-normal s-underline-text s-underline-link-text s-link-style a-text-normal"]'
+)
+NEXT_PAGE_SELECTOR = "a.s-pagination-next"
+PAGINATION_ITEM_SELECTOR = ".s-pagination-item"
+
+PRICE_SELECTORS = [
+    "#corePriceDisplay_desktop_feature_div .a-price-whole",
+    "div.a-section.a-spacing-micro span.a-price.a-text-price.a-size-medium span.a-offscreen"
+]
+DISCOUNT_SELECTORS = [
+    "span.a-color-price",
+    ".savingsPercentage"
+]
+
+# Spec tables merged into the product record (first_table, tech_specs, right_table, new_table)
+SPEC_TABLES = {
+    'first_table': '.a-normal.a-spacing-micro',
+    'tech_specs': '#productDetails_techSpec_section_1',
+    'right_table': '#productDetails_detailBullets_sections1',
+    'new_table': 'ul.a-unordered-list.a-nostyle.a-vertical.a-spacing-none.detail-bullet-list',
+    'bestseller_rank': 'table.a-keyvalue.prodDetTable'
+}
+
+DISCOUNT_PATTERN = re.compile(r'(-?\d+%)')
+DIRECTION_MARKS_PATTERN = re.compile(r'[\u200f\u200e]')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def clean_text(text):
+    """Clean text data"""
+    text = DIRECTION_MARKS_PATTERN.sub('', text)
+    text = WHITESPACE_PATTERN.sub(' ', text)
+    return text.strip()
+
+
+def record_timings(timings, started, parsed):
+    """Fill in parse and extract durations when the caller asked for them"""
+    if timings is not None:
+        timings['parse'] = (parsed - started) * 1000
+        timings['extract'] = (time.perf_counter() - parsed) * 1000
+
+
+class Bs4Backend:
+    """BeautifulSoup backend, always available"""
+    name = 'bs4'
+
+    def __init__(self):
+        from bs4 import BeautifulSoup
+        import soupsieve
+        self._beautiful_soup = BeautifulSoup
+        self._soupsieve = soupsieve
+
+    def compile(self, selector):
+        return self._soupsieve.compile(selector)
+
+    def parse(self, html):
+        return self._beautiful_soup(html, 'html.parser')
+
+    def select_one(self, node, selector):
+        return selector.select_one(node)
+
+    def select(self, node, selector):
+        return selector.select(node)
+
+    def text(self, node):
+        return node.get_text()
+
+    def stripped_text(self, node):
+        return node.get_text(strip=True)
+
+    def attr(self, node, name):
+        return node.get(name)
+
+    def classes(self, node):
+        return node.get('class') or []
+
+
+class LxmlBackend:
+    """lxml backend with selectors precompiled to XPath"""
+    name = 'lxml'
+
+    def __init__(self):
+        import lxml.html
+        from lxml.cssselect import CSSSelector
+        self._lxml_html = lxml.html
+        self._css_selector = CSSSelector
+
+    def compile(self, selector):
+        return self._css_selector(selector, translator='html')
+
+    def parse(self, html):
+        if not html or not html.strip():
+            html = '<html></html>'
+        try:
+            return self._lxml_html.document_fromstring(html)
+        except ValueError:
+            # lxml refuses str input that carries an XML encoding declaration
+            return self._lxml_html.document_fromstring(html.encode('utf-8'))
+
+    def select_one(self, node, selector):
+        matches = selector(node)
+        return matches[0] if matches else None
+
+    def select(self, node, selector):
+        return selector(node)
+
+    def text(self, node):
+        return node.text_content()
+
+    def stripped_text(self, node):
+        return ''.join(text.strip() for text in node.itertext())
+
+    def attr(self, node, name):
+        return node.get(name)
+
+    def classes(self, node):
+        return (node.get('class') or '').split()
+
+
+class SelectolaxBackend:
+    """selectolax (lexbor) backend"""
+    name = 'selectolax'
+
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+        self._parser = LexborHTMLParser
+
+    def compile(self, selector):
+        # selectolax caches compiled selectors internally
+        return selector
+
+    def parse(self, html):
+        return self._parser(html or '<html></html>')
+
+    def select_one(self, node, selector):
+        return node.css_first(selector)
+
+    def select(self, node, selector):
+        return node.css(selector)
+
+    def text(self, node):
+        return node.text(deep=True)
+
+    def stripped_text(self, node):
+        return node.text(deep=True, separator='', strip=True)
+
+    def attr(self, node, name):
+        return node.attributes.get(name)
+
+    def classes(self, node):
+        return (node.attributes.get('class') or '').split()
+
+
+BACKENDS = {
+    'bs4': (Bs4Backend, ['bs4']),
+    'lxml': (LxmlBackend, ['lxml', 'cssselect']),
+    'selectolax': (SelectolaxBackend, ['selectolax']),
+}
+
+
+def available_backends():
+    """Return the names of the parser backends that can be imported"""
+    available = []
+    for name in BACKEND_PREFERENCE:
+        modules = BACKENDS[name][1]
+        if all(importlib.util.find_spec(module) is not None for module in modules):
+            available.append(name)
+    return available
+
+
+def resolve_backend_name(name=None):
+    """Pick the configured backend, or the fastest installed one"""
+    if name:
+        if name not in BACKENDS:
+            raise ValueError(f"Unsupported parser backend: {name}")
+        return name
+    return available_backends()[0]
+
+
+class PageExtractor:
+    """Parse a page once and evaluate precompiled selectors against it"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        compile_selector = backend.compile
+
+        self.listing_link = compile_selector(LISTING_LINK_SELECTOR)
+        self.next_page = compile_selector(NEXT_PAGE_SELECTOR)
+        self.pagination_items = compile_selector(PAGINATION_ITEM_SELECTOR)
+
+        self.title = compile_selector("#productTitle")
+        self.prices = [compile_selector(s) for s in PRICE_SELECTORS]
+        self.discounts = [compile_selector(s) for s in DISCOUNT_SELECTORS]
+        self.image = compile_selector("#imgTagWrapperId img")
+        self.description = compile_selector("#feature-bullets")
+
+        self.review_cards = compile_selector("div[data-hook='review']")
+        self.reviewer_name = compile_selector("span.a-profile-name")
+        self.review_rating = compile_selector("i.a-icon-star span.a-icon-alt")
+        self.review_date = compile_selector("span.review-date")
+        self.review_body = compile_selector("span[data-hook='review-body']")
+
+        self.spec_tables = {
+            name: compile_selector(selector)
+            for name, selector in SPEC_TABLES.items()
+        }
+        self.list_items = compile_selector("li")
+        self.spans = compile_selector("span")
+        self.bold_span = compile_selector("span.a-text-bold")
+        self.rows = compile_selector("tr")
+        self.cells = compile_selector("td")
+        self.header_or_cell = compile_selector("th, td")
+
+    def extract_listing(self, html, timings=None):
+        """Return the product hrefs, next page href and page count of a search page"""
+        b = self.backend
+        started = time.perf_counter()
+        doc = b.parse(html)
+        parsed = time.perf_counter()
+
+        hrefs = []
+        for link in b.select(doc, self.listing_link):
+            href = b.attr(link, 'href')
+            if href and not href.startswith('#'):
+                hrefs.append(href)
+
+        next_button = b.select_one(doc, self.next_page)
+        next_href = b.attr(next_button, 'href') if next_button is not None else None
+
+        # The highest number in the pagination strip is the total page count
+        page_numbers = [
+            int(text) for text in (
+                b.stripped_text(item) for item in b.select(doc, self.pagination_items)
+            ) if text.isdigit()
+        ]
+        page_count = max(page_numbers) if page_numbers else None
+        record_timings(timings, started, parsed)
+        return hrefs, next_href, page_count
+
+    def extract_product(self, html, timings=None):
+        """Return the product fields and spec table values of a product page"""
+        b = self.backend
+        started = time.perf_counter()
+        doc = b.parse(html)
+        parsed = time.perf_counter()
+
+        title = b.select_one(doc, self.title)
+        image = b.select_one(doc, self.image)
+        description = b.select_one(doc, self.description)
+
+        product_data = {
+            "Title": b.text(title).strip() if title is not None else None,
+            "Price": self._extract_price(doc),
+            "Discount": self._extract_discount(doc),
+            "Image URL": b.attr(image, 'src') if image is not None else None,
+            "Description": b.text(description).strip() if description is not None else None,
+            "Reviews": self._extract_reviews(doc)
+        }
+        product_data.update(self._extract_specs(doc))
+        record_timings(timings, started, parsed)
+        return product_data
+
+    def _extract_price(self, doc):
+        """Extract price from product page"""
+        for selector in self.prices:
+            element = self.backend.select_one(doc, selector)
+            if element is not None:
+                return self.backend.stripped_text(element)
+        return None
+
+    def _extract_discount(self, doc):
+        """Extract discount information"""
+        for selector in self.discounts:
+            for element in self.backend.select(doc, selector):
+                match = DISCOUNT_PATTERN.search(
+                    self.backend.stripped_text(element))
+                if match:
+                    return match.group(1)
+        return None
+
+    def _extract_reviews(self, doc):
+        """Extract product reviews"""
+        b = self.backend
+        reviews = []
+
+        for review in b.select(doc, self.review_cards)[:5]:
+            try:
+                reviews.append({
+                    "Reviewer": b.text(b.select_one(review, self.reviewer_name)).strip(),
+                    "Rating": b.text(
+                        b.select_one(review, self.review_rating)
+                    ).strip().replace("out of 5 stars", ""),
+                    "Date": b.text(b.select_one(review, self.review_date)).strip(),
+                    "Review": b.text(b.select_one(review, self.review_body)).strip()
+                })
+            except Exception as e:
+                logging.error(f"Error extracting review: {str(e)}")
+                continue
+
+        return reviews
+
+    def _extract_specs(self, doc):
+        """Extract key/value pairs from the product detail tables"""
+        b = self.backend
+        specs = {}
+
+        for table_name, selector in self.spec_tables.items():
+            table = b.select_one(doc, selector)
+            if table is None:
+                continue
+
+            if table_name == 'new_table':
+                for item in b.select(table, self.list_items):
+                    key_element = b.select_one(item, self.bold_span)
+                    value_element = next(
+                        (span for span in b.select(item, self.spans)
+                         if 'a-text-bold' not in b.classes(span)),
+                        None
+                    )
+                    if key_element is not None and value_element is not None:
+                        key = clean_text(b.text(key_element).strip().replace(':', ''))
+                        specs[key] = clean_text(b.text(value_element).strip())
+            else:
+                for row in b.select(table, self.rows):
+                    key_element = b.select_one(row, self.header_or_cell)
+                    cells = b.select(row, self.cells)
+                    value_element = cells[-1] if cells else None
+                    if key_element is not None and value_element is not None:
+                        key = clean_text(b.stripped_text(key_element))
+                        specs[key] = clean_text(b.stripped_text(value_element))
+
+        return specs
+
+
+@lru_cache(maxsize=None)
+def get_extractor(backend_name=None):
+    """Return a cached extractor for the named (or best available) backend"""
+    name = resolve_backend_name(backend_name)
+    backend_class = BACKENDS[name][0]
+    logging.info(f"Using '{name}' HTML parser backend")
+    return PageExtractor(backend_class())
+
+
+def extract_listing_html(html, backend_name=None):
+    """Module-level listing extraction that can run in a worker process
+
+    Returns the listing data and the parse/extract timings in milliseconds.
+    """
+    timings = {}
+    return get_extractor(backend_name).extract_listing(html, timings), timings
+
+
+def extract_product_html(html, backend_name=None):
+    """Module-level product extraction that can run in a worker process
+
+    Returns the product data and the parse/extract timings in milliseconds.
+    """
+    timings = {}
+    return get_extractor(backend_name).extract_product(html, timings), timings
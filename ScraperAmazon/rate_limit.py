@@ -0,0 +1,227 @@
+# ScraperAmazon rate limiting
+from contextlib import asynccontextmanager
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+
+
+class PriorityLock:
+    """asyncio lock handed to waiters by priority (lowest first), FIFO within a priority"""
+
+    def __init__(self):
+        self.locked = False
+        self.waiters = []
+        self.sequence = itertools.count()
+
+    async def acquire(self, priority=0):
+        if not self.locked and not self.waiters:
+            self.locked = True
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self.sequence), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Ownership may have been handed over just before the cancellation
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        # Hand the lock straight to the next live waiter, if any
+        while self.waiters:
+            _, _, future = heapq.heappop(self.waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.locked = False
+
+    @asynccontextmanager
+    async def hold(self, priority=0):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, up to `burst` saved up"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        # Waiters queue on the lock, so tokens are handed out by priority,
+        # then in FIFO order
+        self.lock = PriorityLock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens +
+                          (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, priority=0):
+        """Wait until a token is available and take it"""
+        async with self.lock.hold(priority):
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        """Stop handing out tokens for a while and drop any saved burst"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+        # Tokens only build up again once the pause is over
+        self.updated = self.paused_until
+
+
+class SharedBuckets:
+    """Token bucket of every domain, shared by all scrapers of a worker process
+
+    Concurrent activities on one worker (fan-out batches, regions) then stay
+    within one domain's rate together instead of each getting the full rate.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.buckets = {}
+
+    def get(self, domain, rate, burst):
+        loop = asyncio.get_running_loop()
+        if loop is not self.loop:
+            # Buckets hold futures of the event loop they were used on
+            self.loop = loop
+            self.buckets = {}
+        if domain not in self.buckets:
+            self.buckets[domain] = TokenBucket(rate, burst)
+        return self.buckets[domain]
+
+
+# One per worker process
+SHARED_BUCKETS = SharedBuckets()
+
+
+class DomainRateLimiter:
+    """Per-domain token buckets with AIMD adaptation to 403/503 throttling"""
+
+    def __init__(self, rate, burst, min_rate, backoff_factor, recovery_step, cooldown,
+                 shared=SHARED_BUCKETS):
+        self.max_rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.backoff_factor = backoff_factor
+        self.recovery_step = recovery_step
+        self.cooldown = cooldown
+        self.shared = shared
+        # Buckets this limiter used, and its own throttle counts
+        self.buckets = {}
+        self.throttle_events = {}
+
+    def _bucket(self, domain):
+        bucket = self.shared.get(domain, self.max_rate, self.burst)
+        if self.buckets.get(domain) is not bucket:
+            self.buckets[domain] = bucket
+            self.throttle_events.setdefault(domain, 0)
+        return bucket
+
+    async def acquire(self, domain, priority=0):
+        """Wait for the domain's next request slot"""
+        await self._bucket(domain).acquire(priority)
+
+    def on_success(self, domain):
+        """Additively raise the domain's rate back towards the configured maximum"""
+        bucket = self._bucket(domain)
+        bucket.rate = min(self.max_rate, bucket.rate + self.recovery_step)
+
+    def on_throttled(self, domain):
+        """Multiplicatively cut the domain's rate and pause it briefly"""
+        bucket = self._bucket(domain)
+        bucket.rate = max(self.min_rate, bucket.rate * self.backoff_factor)
+        pause = random.uniform(*self.cooldown)
+        bucket.pause(pause)
+        self.throttle_events[domain] += 1
+        logging.warning(
+            f"Throttled by {domain}. Rate lowered to {bucket.rate:.2f} req/s, "
+            f"pausing {pause:.2f} seconds.")
+
+    def get_stats(self):
+        """Return the current rate and throttle count of every domain"""
+        return {
+            domain: {
+                "rate": round(bucket.rate, 3),
+                "throttle_events": self.throttle_events[domain]
+            }
+            for domain, bucket in self.buckets.items()
+        }
+
+
+class AdaptiveConcurrencyLimiter:
+    """Semaphore-like limit on in-flight requests that can be raised or lowered at runtime
+
+    Free slots go to waiters by priority (lowest first), FIFO within a priority.
+    """
+
+    def __init__(self, limit, min_limit=1):
+        self.max_limit = limit
+        self.min_limit = min(min_limit, limit)
+        self.limit = limit
+        self.active = 0
+        self.waiters = []
+        self.sequence = itertools.count()
+
+    def set_limit(self, limit):
+        """Change the limit; requests already in flight finish normally"""
+        self.limit = max(self.min_limit, min(self.max_limit, limit))
+        self._wake()
+
+    def _wake(self):
+        while self.waiters and self.active < self.limit:
+            _, _, future = heapq.heappop(self.waiters)
+            if not future.done():
+                self.active += 1
+                future.set_result(None)
+
+    async def acquire(self, priority=0):
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self.sequence), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        self.active -= 1
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self, priority=0):
+        """Hold one slot for the duration of the block"""
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.release()
@@ -0,0 +1,206 @@
+# ScraperAmazon normalized product records
+from dataclasses import astuple, dataclass
+from typing import Optional
+import re
+
+from .urls import extract_asin
+
+# Keys of a scraped product dict that map onto the core schema; every other
+# key is a spec-table row
+CORE_KEYS = ('date_column', 'product_url', 'site', 'category', 'Title', 'Price',
+             'Discount', 'Image URL', 'Description', 'Reviews')
+
+# Arabic-Indic digits and separators used on the eg/sa/ae marketplaces
+DIGIT_TRANSLATION = str.maketrans('\u0660\u0661\u0662\u0663\u0664\u0665\u0666\u0667\u0668\u0669\u066b\u066c', '0123456789.,')
+NUMBER_PATTERN = re.compile(r"\d[\d.,'\s\u00a0\u202f]*")
+GROUPING_PATTERN = re.compile(r"['\s\u00a0\u202f]")
+# Star ratings read "4.2 out of 5 stars" on most marketplaces, but jp puts the
+# scale first ("5つ星のうち4.2"), so the rating follows this marker there
+RATING_SCALE_PREFIX = 'のうち'
+
+
+@dataclass
+class ProductRecord:
+    """Fixed core columns of one scraped product"""
+    __slots__ = ('scraped_on', 'asin', 'product_url', 'site', 'category', 'title',
+                 'price', 'currency', 'discount_percent', 'image_url', 'description',
+                 'review_count')
+    scraped_on: str
+    asin: Optional[str]
+    product_url: str
+    site: str
+    category: str
+    title: Optional[str]
+    price: Optional[float]
+    currency: Optional[str]
+    discount_percent: Optional[float]
+    image_url: Optional[str]
+    description: Optional[str]
+    review_count: int
+
+
+@dataclass
+class SpecRow:
+    """One spec-table entry of a product"""
+    __slots__ = ('asin', 'name', 'value')
+    asin: Optional[str]
+    name: str
+    value: Optional[str]
+
+
+@dataclass
+class ReviewRow:
+    """One review shown on a product page"""
+    __slots__ = ('asin', 'reviewer', 'rating', 'date', 'text')
+    asin: Optional[str]
+    reviewer: Optional[str]
+    rating: Optional[float]
+    date: Optional[str]
+    text: Optional[str]
+
+
+PRODUCT_COLUMNS = ProductRecord.__slots__
+SPEC_COLUMNS = SpecRow.__slots__
+REVIEW_COLUMNS = ReviewRow.__slots__
+
+
+def parse_number(text):
+    """Parse a localized number such as 1,299.99, 1.299,99 or 1 299 to a float"""
+    if not text:
+        return None
+    match = NUMBER_PATTERN.search(text.translate(DIGIT_TRANSLATION))
+    if not match:
+        return None
+    number = GROUPING_PATTERN.sub('', match.group()).rstrip('.,')
+
+    # The last separator is the decimal point when both kinds appear, or when
+    # a single one is followed by one or two digits (1,234 is a thousand)
+    decimal = max(number.rfind('.'), number.rfind(','))
+    if decimal != -1:
+        both = '.' in number and ',' in number
+        single = number.count(number[decimal]) == 1 and len(number) - decimal - 1 in (1, 2)
+        if both or single:
+            whole, fraction = number[:decimal], number[decimal + 1:]
+            return float(re.sub(r'[.,]', '', whole) + '.' + fraction)
+    return float(re.sub(r'[.,]', '', number))
+
+
+def parse_price(text):
+    """Split a price string into its amount and the currency text around it"""
+    if not text:
+        return None, None
+    amount = parse_number(text)
+    currency = NUMBER_PATTERN.sub('', text.translate(DIGIT_TRANSLATION)).strip(' .,') or None
+    return amount, currency
+
+
+def parse_percent(text):
+    """Return the size of a discount such as -18% as 18.0"""
+    value = parse_number(text)
+    return abs(value) if value is not None else None
+
+
+def parse_rating(text):
+    """Return the star rating of texts like 4.2 out of 5 stars or 5つ星のうち4.2"""
+    if text and RATING_SCALE_PREFIX in text:
+        text = text.split(RATING_SCALE_PREFIX, 1)[1]
+    return parse_number(text)
+
+
+def normalize_product(product):
+    """Split a scraped product dict into its core record, spec rows and review rows"""
+    url = product.get('product_url')
+    asin = extract_asin(url) if url else None
+    asin = asin or product.get('ASIN')
+    price, currency = parse_price(product.get('Price'))
+    reviews = product.get('Reviews') or []
+
+    record = ProductRecord(
+        scraped_on=product.get('date_column'),
+        asin=asin,
+        product_url=url,
+        site=product.get('site'),
+        category=product.get('category'),
+        title=product.get('Title'),
+        price=price,
+        currency=currency,
+        discount_percent=parse_percent(product.get('Discount')),
+        image_url=product.get('Image URL'),
+        description=product.get('Description'),
+        review_count=len(reviews)
+    )
+    specs = [
+        SpecRow(asin, name, value)
+        for name, value in product.items()
+        if name not in CORE_KEYS
+    ]
+    review_rows = [
+        ReviewRow(asin, review.get('Reviewer'), parse_rating(review.get('Rating')),
+                  review.get('Date'), review.get('Review'))
+        for review in reviews
+    ]
+    return record, specs, review_rows
+
+
+class ProductTable:
+    """Column-oriented batch of normalized products with spec and review side tables"""
+
+    def __init__(self, products=()):
+        self.tables = {
+            'products': {column: [] for column in PRODUCT_COLUMNS},
+            'specs': {column: [] for column in SPEC_COLUMNS},
+            'reviews': {column: [] for column in REVIEW_COLUMNS}
+        }
+        for product in products:
+            self.add(product)
+
+    def __len__(self):
+        return len(self.tables['products']['asin'])
+
+    def add(self, product):
+        record, specs, reviews = normalize_product(product)
+        self._append('products', [record])
+        self._append('specs', specs)
+        self._append('reviews', reviews)
+
+    def _append(self, name, rows):
+        columns = list(self.tables[name].values())
+        for row in rows:
+            for column, value in zip(columns, astuple(row)):
+                column.append(value)
+
+    def as_dict(self):
+        """Return the tables as {table: {column: [values]}} for JSON results"""
+        return self.tables
+
+    def to_arrow(self):
+        """Return the tables as pyarrow Tables with a fixed schema"""
+        schemas = arrow_schemas()
+        import pyarrow as pa
+        return {
+            name: pa.Table.from_pydict(columns, schema=schemas[name])
+            for name, columns in self.tables.items()
+        }
+
+
+def arrow_schemas():
+    """Arrow schemas of the products, specs and reviews tables"""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError("pyarrow is required for Parquet and Arrow output")
+
+    string, number = pa.string(), pa.float64()
+    return {
+        'products': pa.schema([
+            ('scraped_on', string), ('asin', string), ('product_url', string),
+            ('site', string), ('category', string), ('title', string),
+            ('price', number), ('currency', string), ('discount_percent', number),
+            ('image_url', string), ('description', string), ('review_count', pa.int32())
+        ]),
+        'specs': pa.schema([('asin', string), ('name', string), ('value', string)]),
+        'reviews': pa.schema([
+            ('asin', string), ('reviewer', string), ('rating', number),
+            ('date', string), ('text', string)
+        ])
+    }
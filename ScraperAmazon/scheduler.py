@@ -0,0 +1,74 @@
+# ScraperAmazon retry scheduling
+from collections import defaultdict
+import asyncio
+import heapq
+import itertools
+import random
+
+# Request priorities; lower values get tokens and connection slots first, so
+# search pages that feed the crawl go ahead of product pages
+LISTING_PRIORITY = 0
+PRODUCT_PRIORITY = 1
+
+
+class RetryScheduler:
+    """Delayed-retry heap that failed requests wait in, outside any concurrency slot
+
+    Retry `n` of a URL becomes ready after `base_delay * 2 ** (n - 1)` seconds
+    (capped at `max_delay`), scaled by a random factor of 1 ± `jitter`. One
+    event-loop timer releases due retries in priority order. Every URL has a
+    budget of `max_attempts` requests over the whole run, shared by fetch
+    retries, page retries and deferred block-page retries.
+    """
+
+    def __init__(self, base_delay, max_delay, jitter, max_attempts):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.max_attempts = max_attempts
+        self.heap = []
+        self.sequence = itertools.count()
+        self.timer = None
+        self.attempts = defaultdict(int)
+        self.stats = {'scheduled': 0, 'budget_exhausted': 0}
+
+    def take_attempt(self, url):
+        """Count one request for a URL, or return False once its budget is spent"""
+        if self.attempts[url] >= self.max_attempts:
+            self.stats['budget_exhausted'] += 1
+            return False
+        self.attempts[url] += 1
+        return True
+
+    def delay(self, retry):
+        delay = min(self.max_delay, self.base_delay * 2 ** (retry - 1))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    async def wait(self, retry, priority=PRODUCT_PRIORITY):
+        """Wait in the heap until retry number `retry` of a request is due"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self.heap, (
+            loop.time() + self.delay(retry), priority, next(self.sequence), future))
+        self.stats['scheduled'] += 1
+        self._schedule_timer(loop)
+        await future
+
+    def _schedule_timer(self, loop):
+        if self.timer:
+            self.timer.cancel()
+        self.timer = loop.call_at(self.heap[0][0], self._release_due, loop) if self.heap else None
+
+    def _release_due(self, loop):
+        now = loop.time()
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            due.append(heapq.heappop(self.heap))
+        for _, _, _, future in sorted(due, key=lambda entry: entry[1:3]):
+            if not future.done():
+                future.set_result(None)
+        self._schedule_timer(loop)
+
+    def get_stats(self):
+        """Return how many retries were scheduled, are pending or ran out of budget"""
+        return {**self.stats, "pending": len(self.heap)}
@@ -0,0 +1,345 @@
+# ScraperAmazon sinks
+from datetime import datetime
+import asyncio
+import gzip
+import json
+import os
+import tempfile
+
+from .records import ProductTable, arrow_schemas
+
+# Output formats written by ColumnarSink and their file extensions
+COLUMNAR_FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+# Extensions kept at the end of an output name when a suffix is added to it
+OUTPUT_SUFFIXES = ('.ndjson.gz', '.ndjson', '.jsonl.gz', '.jsonl', '.gz', '.parquet', '.arrow')
+
+
+class ProductSink:
+    """Buffer products and flush them in batches as NDJSON
+
+    `on_flush`, when set, is called with the product URLs of every batch once
+    it has been written.
+    """
+
+    def __init__(self, batch_size=50, compress=False):
+        self.batch_size = batch_size
+        self.compress = compress
+        self.buffer = []
+        self.total_written = 0
+        self.bytes_written = 0
+        self.on_flush = None
+
+    async def write(self, product):
+        """Add a product to the buffer and flush when the batch is full"""
+        self.buffer.append(product)
+        if len(self.buffer) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        """Encode the buffered products and hand them to the backend"""
+        if not self.buffer:
+            return
+        payload = "".join(
+            json.dumps(product, ensure_ascii=False) + "\n"
+            for product in self.buffer
+        ).encode("utf-8")
+        if self.compress:
+            # Each batch becomes its own gzip member; concatenated members
+            # are still a valid gzip stream
+            payload = gzip.compress(payload)
+        await asyncio.get_running_loop().run_in_executor(
+            None, self._write_bytes, payload)
+        self.total_written += len(self.buffer)
+        self.bytes_written += len(payload)
+        flushed, self.buffer = self.buffer, []
+        if self.on_flush:
+            self.on_flush([record['product_url'] for record in flushed])
+
+    def _write_bytes(self, payload):
+        raise NotImplementedError
+
+    def describe(self):
+        """Return where the products were written"""
+        raise NotImplementedError
+
+    async def close(self):
+        """Flush remaining products and return a summary record"""
+        await self.flush()
+        return {
+            **self.describe(),
+            "total_written": self.total_written,
+            "bytes_written": self.bytes_written,
+            "compressed": self.compress
+        }
+
+
+class FileSink(ProductSink):
+    """Write NDJSON (optionally gzip) batches to a local file"""
+
+    def __init__(self, path, batch_size=50, compress=None, append=False):
+        super().__init__(batch_size, path.endswith('.gz')
+                         if compress is None else compress)
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if not append:
+            # Truncate any output left from a previous run
+            open(self.path, 'wb').close()
+
+    def _write_bytes(self, payload):
+        with open(self.path, 'ab') as f:
+            f.write(payload)
+
+    def describe(self):
+        return {"type": "file", "path": self.path}
+
+
+class BlobSink(ProductSink):
+    """Write NDJSON (optionally gzip) batches to an Azure append blob"""
+
+    def __init__(self, container, blob_name, connection_string=None,
+                 batch_size=50, compress=None, append=False):
+        try:
+            from azure.storage.blob import BlobClient
+        except ImportError:
+            raise ImportError(
+                "azure-storage-blob is required for the blob output sink")
+
+        super().__init__(batch_size, blob_name.endswith('.gz')
+                         if compress is None else compress)
+        self.container = container
+        self.blob_name = blob_name
+        self.blob_client = BlobClient.from_connection_string(
+            connection_string or os.environ['AzureWebJobsStorage'],
+            container_name=container,
+            blob_name=blob_name
+        )
+        if not append or not self.blob_client.exists():
+            self.blob_client.create_append_blob()
+
+    def _write_bytes(self, payload):
+        self.blob_client.append_block(payload)
+
+    def describe(self):
+        return {"type": "blob", "container": self.container, "blob_name": self.blob_name}
+
+
+class ColumnarSink:
+    """Write normalized products, specs and reviews as Parquet or Arrow IPC tables
+
+    Each table goes to its own file (``name.parquet``, ``name.specs.parquet``,
+    ``name.reviews.parquet``) and every flushed batch becomes one row group or
+    record batch. Blob output is staged in a temporary directory and uploaded
+    when the sink is closed. Files are only complete once closed, so `on_flush`
+    is called with every product URL at that point.
+    """
+
+    def __init__(self, name, file_format='parquet', batch_size=500, append=False,
+                 container=None, connection_string=None):
+        if container:
+            try:
+                import azure.storage.blob  # noqa: F401
+            except ImportError:
+                raise ImportError(
+                    "azure-storage-blob is required for the blob output sink")
+        self.schemas = arrow_schemas()
+        self.file_format = file_format
+        self.batch_size = batch_size
+        self.container = container
+        self.connection_string = connection_string
+        self.buffer = []
+        self.total_written = 0
+        self.bytes_written = 0
+        self.on_flush = None
+        self.written_urls = []
+
+        stem = name[:-len(COLUMNAR_FORMATS[file_format])] if name.endswith(
+            COLUMNAR_FORMATS[file_format]) else name
+        if append:
+            # Parquet and Arrow files cannot be appended to, so a resumed run
+            # writes a second set of files next to the first
+            stem = f"{stem}-resumed-{datetime.today().strftime('%Y%m%d%H%M%S')}"
+        ext = COLUMNAR_FORMATS[file_format]
+        self.names = {
+            'products': f"{stem}{ext}",
+            'specs': f"{stem}.specs{ext}",
+            'reviews': f"{stem}.reviews{ext}"
+        }
+
+        if container:
+            self.staging = tempfile.mkdtemp(prefix='scraper-output-')
+            self.paths = {
+                table: os.path.join(self.staging, os.path.basename(name))
+                for table, name in self.names.items()
+            }
+        else:
+            self.paths = dict(self.names)
+            directory = os.path.dirname(self.paths['products'])
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self.writers = {
+            table: self._open_writer(path, self.schemas[table])
+            for table, path in self.paths.items()
+        }
+
+    def _open_writer(self, path, schema):
+        if self.file_format == 'parquet':
+            import pyarrow.parquet as pq
+            return pq.ParquetWriter(path, schema, compression='zstd')
+        import pyarrow as pa
+        return pa.ipc.new_file(
+            path, schema, options=pa.ipc.IpcWriteOptions(compression='zstd'))
+
+    async def write(self, product):
+        """Add a product to the buffer and flush when the batch is full"""
+        self.buffer.append(product)
+        if len(self.buffer) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        """Normalize the buffered products and write them as one batch per table"""
+        if not self.buffer:
+            return
+        batch = ProductTable(self.buffer)
+        await asyncio.get_running_loop().run_in_executor(
+            None, self._write_tables, batch)
+        self.total_written += len(self.buffer)
+        self.written_urls.extend(product['product_url'] for product in self.buffer)
+        self.buffer = []
+
+    def _write_tables(self, batch):
+        for table, data in batch.to_arrow().items():
+            self.writers[table].write_table(data)
+
+    def _upload(self):
+        from azure.storage.blob import ContainerClient
+        container_client = ContainerClient.from_connection_string(
+            self.connection_string or os.environ['AzureWebJobsStorage'],
+            container_name=self.container
+        )
+        for table, path in self.paths.items():
+            with open(path, 'rb') as f:
+                container_client.upload_blob(self.names[table], f, overwrite=True)
+            os.remove(path)
+        os.rmdir(self.staging)
+
+    def describe(self):
+        if self.container:
+            return {"type": "blob", "container": self.container,
+                    "blob_name": self.names['products'], "tables": self.names}
+        return {"type": "file", "path": self.names['products'], "tables": self.names}
+
+    async def close(self):
+        """Flush remaining products, finish the files and return a summary record"""
+        await self.flush()
+        for writer in self.writers.values():
+            writer.close()
+        self.bytes_written = sum(os.path.getsize(path) for path in self.paths.values())
+        if self.container:
+            await asyncio.get_running_loop().run_in_executor(None, self._upload)
+        if self.on_flush:
+            self.on_flush(self.written_urls)
+        return {
+            **self.describe(),
+            "format": self.file_format,
+            "total_written": self.total_written,
+            "bytes_written": self.bytes_written,
+            "compressed": True
+        }
+
+
+def output_name_key(output):
+    """Key of an output spec that holds its target name"""
+    return 'blob_name' if output.get('type') == 'blob' else 'path'
+
+
+def with_name_suffix(output, suffix):
+    """Return a copy of an output spec whose target name has suffix before its extension"""
+    output = dict(output)
+    key = output_name_key(output)
+    name = output.get(key) or default_output_name(output)
+    stem, ext = name, ''
+    for known in OUTPUT_SUFFIXES:
+        if name.endswith(known):
+            stem, ext = name[:-len(known)], known
+            break
+    output[key] = f"{stem}{suffix}{ext}"
+    return output
+
+
+def with_part_suffix(output, part):
+    """Return a copy of an output spec whose target name carries a part number"""
+    return with_name_suffix(output, f"-part{part:04d}")
+
+
+def with_default_name(output, stem):
+    """Return a copy of an output spec named stem plus its extension, unless it has a name"""
+    output = dict(output)
+    key = output_name_key(output)
+    if not output.get(key):
+        output[key] = f"{stem}{output_extension(output)}"
+    return output
+
+
+def default_output_name(output):
+    """Build a dated output name when the request does not give one"""
+    ext = output_extension(output)
+    return f"amazon-{datetime.today().strftime('%Y-%m-%d-%H%M%S')}{ext}"
+
+
+def output_extension(output):
+    """File extension of an output spec's format"""
+    if output.get('format') in COLUMNAR_FORMATS:
+        return COLUMNAR_FORMATS[output['format']]
+    return '.ndjson.gz' if output.get('compress', True) else '.ndjson'
+
+
+def create_sink(output, append=False, on_flush=None):
+    """Create a sink from an output spec such as {"type": "file", "path": ...}
+
+    With append, products are added to existing output (used when resuming).
+    on_flush is called with the product URLs of each batch once it is written.
+    """
+    sink = _create_sink(output, append)
+    sink.on_flush = on_flush
+    return sink
+
+
+def _create_sink(output, append):
+    sink_type = output.get('type', 'file')
+    file_format = output.get('format', 'ndjson')
+    compress = output.get('compress')
+
+    if file_format in COLUMNAR_FORMATS:
+        batch_size = int(output.get('batch_size', 500))
+        if sink_type == 'file':
+            return ColumnarSink(
+                output.get('path') or os.path.join(
+                    os.environ.get('TMPDIR', '/tmp'), default_output_name(output)),
+                file_format, batch_size, append)
+        elif sink_type == 'blob':
+            return ColumnarSink(
+                output.get('blob_name') or default_output_name(output),
+                file_format, batch_size, append,
+                output['container'], output.get('connection_string'))
+        raise ValueError(f"Unsupported output type: {sink_type}")
+    elif file_format != 'ndjson':
+        raise ValueError(f"Unsupported output format: {file_format}")
+
+    batch_size = int(output.get('batch_size', 50))
+
+    if sink_type == 'file':
+        path = output.get('path') or os.path.join(
+            os.environ.get('TMPDIR', '/tmp'), default_output_name(output))
+        return FileSink(path, batch_size, compress, append)
+    elif sink_type == 'blob':
+        return BlobSink(
+            output['container'],
+            output.get('blob_name') or default_output_name(output),
+            output.get('connection_string'),
+            batch_size,
+            compress,
+            append
+        )
+    raise ValueError(f"Unsupported output type: {sink_type}")
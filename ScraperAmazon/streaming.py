@@ -0,0 +1,85 @@
+# ScraperAmazon streaming product fetches
+import codecs
+import re
+
+# Byte markers that must appear in this order once a section of a product page
+# has been fully received; a field lists alternative marker sequences
+SECTION_MARKERS = {
+    'Title': [(b'id="productTitle"', b'</span>')],
+    'Price': [
+        (b'id="corePriceDisplay_desktop_feature_div"', b'a-price-whole', b'</span>'),
+        (b'a-price a-text-price a-size-medium', b'a-offscreen', b'</span>')
+    ],
+    'Discount': [(b'savingsPercentage', b'</span>')],
+    'Image URL': [(b'id="imgTagWrapperId"', b'<img', b'>')],
+    'Description': [(b'id="feature-bullets"', b'</ul>')],
+    # The detail bullets close the spec tables on current product pages
+    'specs': [
+        (b'id="detailBullets_feature_div"', b'</ul>'),
+        (b'id="productDetails_detailBullets_sections1"', b'</table>')
+    ]
+}
+
+HEADER_CHARSET_PATTERN = re.compile(r'charset=["\']?([\w.:-]+)', re.I)
+META_CHARSET_PATTERN = re.compile(rb'<meta[^>]+charset=["\']?([\w.:-]+)', re.I)
+# Only the start of the document is searched for a meta charset
+META_SEARCH_BYTES = 4096
+
+
+class SectionScanner:
+    """Scan a page as it streams in and tell when every wanted section is complete
+
+    Fields without markers (such as Reviews) can only be seen in the full page,
+    so asking for one disables early termination.
+    """
+
+    def __init__(self, fields):
+        self.streamable = all(field in SECTION_MARKERS for field in fields)
+        # Per alternative: [markers, index of the next marker, search offset]
+        self.pending = {
+            field: [[markers, 0, 0] for markers in SECTION_MARKERS[field]]
+            for field in fields
+        } if self.streamable else {}
+        self.buffer = bytearray()
+
+    def feed(self, chunk):
+        """Add a chunk and return True once all wanted sections have been seen"""
+        self.buffer += chunk
+        if not self.streamable:
+            return False
+        for field in list(self.pending):
+            if any(self._advance(state) for state in self.pending[field]):
+                del self.pending[field]
+        return not self.pending
+
+    def _advance(self, state):
+        markers, index, offset = state
+        while index < len(markers):
+            position = self.buffer.find(markers[index], offset)
+            if position == -1:
+                # Keep enough overlap to find a marker split across chunks
+                state[1], state[2] = index, max(offset, len(self.buffer) - len(markers[index]) + 1)
+                return False
+            offset = position + len(markers[index])
+            index += 1
+        state[1], state[2] = index, offset
+        return True
+
+
+def detect_encoding(content_type, body):
+    """Pick the charset from the Content-Type header, then a meta tag, then detection"""
+    candidates = []
+    match = HEADER_CHARSET_PATTERN.search(content_type or '')
+    if match:
+        candidates.append(match.group(1))
+    match = META_CHARSET_PATTERN.search(body[:META_SEARCH_BYTES])
+    if match:
+        candidates.append(match.group(1).decode('ascii', errors='ignore'))
+    for candidate in candidates:
+        try:
+            return codecs.lookup(candidate).name
+        except LookupError:
+            continue
+    # Last resort: statistical detection over the whole body
+    import chardet
+    return chardet.detect(bytes(body)).get('encoding') or 'utf-8'
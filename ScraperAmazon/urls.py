@@ -0,0 +1,104 @@
+# ScraperAmazon URL helpers
+from urllib.parse import parse_qs, parse_qsl, unquote, urlencode, urljoin, urlparse
+import re
+
+REGION_BASE_URLS = {
+    'eg': 'https://www.amazon.eg',
+    'sa': 'https://www.amazon.sa',
+    'us': 'https://www.amazon.com',
+    'jp': 'https://www.amazon.co.jp',
+    'de': 'https://www.amazon.de',
+    'ca': 'https://www.amazon.ca',
+    'uk': 'https://www.amazon.co.uk',
+    'au': 'https://www.amazon.com.au',
+    'ae': 'https://www.amazon.ae',
+    'in': 'https://www.amazon.in'
+}
+
+ASIN_PATTERN = re.compile(r'/(?:dp|gp/product|gp/aw/d)/([A-Z0-9]{10})(?:[/?]|$)')
+
+# Sponsored results link through a click tracker that carries the real
+# product path in a query parameter
+REDIRECT_PATHS = ('/sspa/click', '/gp/slredirect/')
+REDIRECT_PARAMS = ('url', 'redirectUrl')
+
+# Search URL parameters that vary with the page or the visit, not the search
+SEARCH_VOLATILE_PARAMS = ('page', 'ref', 'qid', 'crid', 'sprefix', 'sr', 'ds', 'xpid')
+
+
+def get_base_url(region):
+    """Return the marketplace root URL of a region"""
+    base_url = REGION_BASE_URLS.get(region)
+    if not base_url:
+        raise ValueError(f"Unsupported region: {region}")
+    return base_url
+
+
+def search_scope(url):
+    """Identify a search by host, path and the query parameters that define it"""
+    parts = urlparse(url)
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key not in SEARCH_VOLATILE_PARAMS
+    )
+    return f"{parts.netloc.lower()}{parts.path}?{urlencode(query)}"
+
+
+def extract_asin(url):
+    """Return the ASIN of a product URL, or None when it has none"""
+    match = ASIN_PATTERN.search(url)
+    if match:
+        return match.group(1)
+
+    parts = urlparse(url)
+    if parts.path.startswith(REDIRECT_PATHS):
+        query = parse_qs(parts.query)
+        for param in REDIRECT_PARAMS:
+            for target in query.get(param, []):
+                match = ASIN_PATTERN.search(unquote(target))
+                if match:
+                    return match.group(1)
+    return None
+
+
+def canonicalize_product_url(href, base_url):
+    """Rewrite a product link to https://<host>/dp/<ASIN> when it has an ASIN"""
+    url = urljoin(base_url, href)
+    asin = extract_asin(url)
+    return f"{base_url}/dp/{asin}" if asin else url
+
+
+def canonicalize_product_links(hrefs, base_url):
+    """Canonicalize links and drop duplicates, keeping the first occurrence
+
+    Returns the unique links and the number of duplicates removed.
+    """
+    links = list(dict.fromkeys(
+        canonicalize_product_url(href, base_url) for href in hrefs
+    ))
+    return links, len(hrefs) - len(links)
+
+
+def predict_page_urls(next_page_url, page_count, max_pages):
+    """Build the URLs of pages 2..N from the page-2 link and the page count
+
+    Returns None when the link has no page= parameter to vary.
+    """
+    if not next_page_url or not page_count:
+        return None
+    parts = urlparse(next_page_url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if not any(key == 'page' for key, _ in query):
+        return None
+
+    page_urls = []
+    for page in range(2, min(page_count, max_pages) + 1):
+        page_query = []
+        for key, value in query:
+            if key == 'page':
+                value = str(page)
+            elif key == 'ref' and value.startswith('sr_pg_'):
+                value = f"sr_pg_{page - 1}"
+            page_query.append((key, value))
+        page_urls.append(parts._replace(query=urlencode(page_query)).geturl())
+    return page_urls
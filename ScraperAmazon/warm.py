@@ -0,0 +1,80 @@
+# ScraperAmazon warm worker reuse
+import asyncio
+import logging
+import time
+
+
+class WarmSession:
+    """Client session shared by the invocations that run on one warm worker
+
+    Azure runs the async invocations of a worker process on one event loop, so
+    a session opened by one invocation (with its pooled connections and DNS
+    cache) can serve the next. It is re-created when it was closed, belongs to
+    another event loop, is older than `max_age` seconds or was opened with other
+    connection settings, and after an invocation using it failed.
+    """
+
+    def __init__(self):
+        self.session = None
+        self.key = None
+        self.loop = None
+        self.created = 0.0
+        # Invocations still using each open session, current or retired
+        self.users = {}
+        self.stats = {'created': 0, 'reused': 0, 'retired': 0}
+
+    def healthy(self, key, max_age):
+        """Whether the current session can serve an invocation with these settings"""
+        return (
+            self.session is not None
+            and not self.session.closed
+            and self.loop is asyncio.get_running_loop()
+            and self.key == key
+            and time.monotonic() - self.created < max_age
+        )
+
+    async def acquire(self, key, max_age, factory):
+        """Return the warm session, opening a new one with factory() if needed"""
+        if self.healthy(key, max_age):
+            self.stats['reused'] += 1
+        else:
+            await self.retire()
+            self.session = factory()
+            self.key = key
+            self.loop = asyncio.get_running_loop()
+            self.created = time.monotonic()
+            self.stats['created'] += 1
+        self.users[self.session] = self.users.get(self.session, 0) + 1
+        return self.session
+
+    async def release(self, session, failed=False):
+        """Hand a session back; after a failed invocation it is not reused"""
+        self.users[session] -= 1
+        if failed and session is self.session:
+            logging.warning("Invocation failed, re-creating the warm session")
+            await self.retire()
+        elif session is not self.session and not self.users[session]:
+            # A retired session is closed once its last invocation is done
+            del self.users[session]
+            await session.close()
+
+    async def retire(self):
+        """Stop handing out the current session and close it once unused"""
+        session, self.session = self.session, None
+        if session is None:
+            return
+        self.stats['retired'] += 1
+        if self.loop is not asyncio.get_running_loop():
+            # Its event loop has ended, taking the connections with it
+            self.users.pop(session, None)
+        elif not self.users.get(session):
+            self.users.pop(session, None)
+            await session.close()
+
+    def get_stats(self):
+        """Return how often the session was created, reused and retired"""
+        return dict(self.stats)
+
+
+# One per worker process
+WARM_SESSION = WarmSession()
@@ -0,0 +1,206 @@
+"""End-to-end crawl benchmark against the local mock Amazon server.
+
+Usage:
+    python benchmarks/crawl_benchmark.py [--pages N] [--latency-ms MS] [--jitter-ms MS]
+                                         [--error-rate P] [--block-rate P] [--captcha-rate P]
+                                         [--config JSON] [--output FILE] [--baseline FILE]
+
+The mock server runs in a separate process so CPU time and peak memory only
+cover the scraper. ``scrape_all_products`` crawls it with a benchmark config
+(no politeness delays, high request rate) that ``--config`` can override, and
+the throughput, latency, CPU and memory figures are written as JSON. Passing
+an earlier result as ``--baseline`` prints the change of every headline figure.
+"""
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ScraperAmazon import WebScraperImproved  # noqa: E402
+from ScraperAmazon.metrics import peak_rss_mb  # noqa: E402
+
+MOCK_SERVER = Path(__file__).parent / 'mock_amazon.py'
+
+BENCHMARK_CONFIG = {
+    'pause_duration': (0, 0),
+    'request_delay': (0, 0),
+    'retry_delay': 0.1,
+    'requests_per_second': 200.0,
+    'burst': 20,
+    'throttle_cooldown': (0.5, 1),
+    'max_concurrent_requests': 20,
+    'limit_per_host': 20,
+    'block_retry_delay': (1, 2)
+}
+
+# Figures compared against --baseline; True where higher is better
+HEADLINE = {
+    'pages_per_second': True,
+    'products_per_second': True,
+    'latency_p50_ms': False,
+    'latency_p99_ms': False,
+    'cpu_seconds': False,
+    'peak_rss_mb': False
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def wait_for_server(base_url, timeout=10):
+    """Poll the mock server until it answers"""
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while True:
+            try:
+                async with session.get(f"{base_url}/stats") as response:
+                    return await response.json()
+            except aiohttp.ClientError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Mock server at {base_url} did not start")
+                await asyncio.sleep(0.1)
+
+
+async def server_stats(base_url):
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{base_url}/stats") as response:
+            return await response.json()
+
+
+async def crawl(base_url, pages, config):
+    """Run one crawl and return the scraper's own figures"""
+    config = {**BENCHMARK_CONFIG, **config, 'base_urls': {'us': base_url}}
+    start_url = f"{base_url}/s?k=phone"
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    async with WebScraperImproved(config) as scraper:
+        products = await scraper.scrape_all_products(start_url, 'us', pages)
+        metrics = scraper.metrics.as_dict()
+        connection_stats = {
+            **scraper.get_connection_stats(),
+            'block_stats': scraper.block_monitor.get_stats()
+        }
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    return products, metrics, connection_stats, wall, cpu
+
+
+def summarize(products, metrics, connection_stats, wall, cpu, served):
+    request = metrics['phases'].get('request', {})
+    return {
+        'wall_seconds': round(wall, 3),
+        'cpu_seconds': round(cpu, 3),
+        'pages': served['listing'],
+        'products': len(products),
+        'pages_per_second': round(served['listing'] / wall, 2),
+        'products_per_second': round(len(products) / wall, 2),
+        'latency_p50_ms': request.get('p50_ms'),
+        'latency_p99_ms': request.get('p99_ms'),
+        'peak_rss_mb': peak_rss_mb(),
+        'connection_reuse_ratio': connection_stats['reuse_ratio'],
+        'block_stats': connection_stats['block_stats'],
+        'server': served,
+        'metrics': metrics
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(result, baseline):
+    """Print the relative change of the headline figures against an earlier run"""
+    print(f"\n{'figure':<22} {'baseline':>10} {'current':>10} {'change':>9}")
+    for name, higher_is_better in HEADLINE.items():
+        old, new = baseline.get(name), result.get(name)
+        if not old or new is None:
+            continue
+        change = (new - old) / old * 100
+        better = change >= 0 if higher_is_better else change <= 0
+        print(f"{name:<22} {old:>10} {new:>10} {change:>+8.1f}% {'' if better else '(worse)'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=10, help='search result pages to crawl')
+    parser.add_argument('--latency-ms', type=float, default=50, help='mock response latency')
+    parser.add_argument('--jitter-ms', type=float, default=20, help='random extra latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of 500 responses')
+    parser.add_argument('--block-rate', type=float, default=0.0, help='share of 403 responses')
+    parser.add_argument('--captcha-rate', type=float, default=0.0,
+                        help='share of CAPTCHA pages served with 200')
+    parser.add_argument('--seed', type=int, default=1, help='seed for the injected faults')
+    parser.add_argument('--config', default='{}',
+                        help='JSON scraper config overriding the benchmark defaults')
+    parser.add_argument('--output', default='crawl-benchmark.json',
+                        help='file the JSON result is written to')
+    parser.add_argument('--baseline', help='earlier result file to compare against')
+    args = parser.parse_args()
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen([
+        sys.executable, str(MOCK_SERVER), '--port', str(port),
+        '--pages', str(args.pages),
+        '--latency-ms', str(args.latency_ms), '--jitter-ms', str(args.jitter_ms),
+        '--error-rate', str(args.error_rate), '--block-rate', str(args.block_rate),
+        '--captcha-rate', str(args.captcha_rate),
+        '--seed', str(args.seed)
+    ])
+    try:
+        asyncio.run(wait_for_server(base_url))
+        products, metrics, connection_stats, wall, cpu = asyncio.run(
+            crawl(base_url, args.pages, json.loads(args.config)))
+        served = asyncio.run(server_stats(base_url))
+    finally:
+        server.terminate()
+        server.wait()
+
+    result = {
+        'revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'options': {
+            'pages': args.pages,
+            'latency_ms': args.latency_ms,
+            'jitter_ms': args.jitter_ms,
+            'error_rate': args.error_rate,
+            'block_rate': args.block_rate,
+            'captcha_rate': args.captcha_rate,
+            'seed': args.seed,
+            'config': json.loads(args.config)
+        },
+        **summarize(products, metrics, connection_stats, wall, cpu, served)
+    }
+    with open(args.output, 'w') as f:
+        json.dump(result, f, indent=2)
+
+    for name in ('wall_seconds', 'pages', 'products', *HEADLINE):
+        print(f"{name:<22} {result[name]}")
+    print(f"\nWrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(result, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
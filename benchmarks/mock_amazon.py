@@ -0,0 +1,125 @@
+"""Local mock of the Amazon search and product pages for offline benchmarks.
+
+Usage:
+    python benchmarks/mock_amazon.py [--port N] [--pages N] [--latency-ms MS]
+                                     [--jitter-ms MS] [--error-rate P] [--block-rate P]
+                                     [--captcha-rate P]
+
+Search pages are generated from ``fixtures/listing.html`` with page-specific
+ASINs, so every page yields new products; product pages are served from
+``fixtures/product.html`` with the ASIN in the title. ``--error-rate`` answers
+that share of requests with 500, ``--block-rate`` with 403 and
+``--captcha-rate`` with a Robot Check CAPTCHA page served as 200 OK.
+"""
+from pathlib import Path
+import argparse
+import asyncio
+import random
+import re
+
+from aiohttp import web
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+
+ASIN_PATTERN = re.compile(r'B0TEST(\d{4})')
+NEXT_LINK_PATTERN = re.compile(r'<a class="s-pagination-item s-pagination-next[^>]*>Next</a>')
+PAGE_COUNT_PATTERN = re.compile(r'(s-pagination-disabled">)\d+(<)')
+
+CAPTCHA_HTML = """<!doctype html><html><head><title dir="ltr">Amazon.com</title></head>
+<body><!--
+        To discuss automated access to Amazon data please contact api-services-support@amazon.com.
+--><div class="a-container"><h4>Type the characters you see in this image:</h4>
+<form method="get" action="/errors/validateCaptcha" name="">
+<input type=text id="captchacharacters" name="field-keywords"></form></div></body></html>
+"""
+
+
+class MockAmazon:
+    """aiohttp application serving fixture pages with injected latency and failures"""
+
+    def __init__(self, pages=10, latency_ms=50, jitter_ms=0, error_rate=0.0,
+                 block_rate=0.0, captcha_rate=0.0, seed=None):
+        self.pages = pages
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.block_rate = block_rate
+        self.captcha_rate = captcha_rate
+        self.random = random.Random(seed)
+        self.listing_html = (FIXTURES_DIR / 'listing.html').read_text(encoding='utf-8')
+        self.product_html = (FIXTURES_DIR / 'product.html').read_text(encoding='utf-8')
+        self.stats = {'listing': 0, 'product': 0, 'errors': 0, 'blocked': 0, 'captchas': 0}
+
+    def app(self):
+        app = web.Application(middlewares=[self.inject_faults])
+        app.router.add_get('/s', self.listing)
+        app.router.add_get(r'/{slug}/dp/{asin}', self.product)
+        app.router.add_get(r'/dp/{asin}', self.product)
+        app.router.add_get('/stats', self.get_stats)
+        return app
+
+    @web.middleware
+    async def inject_faults(self, request, handler):
+        if request.path == '/stats':
+            return await handler(request)
+        delay = self.latency_ms + self.random.uniform(0, self.jitter_ms)
+        await asyncio.sleep(delay / 1000)
+        roll = self.random.random()
+        if roll < self.block_rate:
+            self.stats['blocked'] += 1
+            return web.Response(status=403, text='Request blocked')
+        if roll < self.block_rate + self.error_rate:
+            self.stats['errors'] += 1
+            return web.Response(status=500, text='Internal error')
+        if roll < self.block_rate + self.error_rate + self.captcha_rate:
+            self.stats['captchas'] += 1
+            return web.Response(text=CAPTCHA_HTML, content_type='text/html')
+        return await handler(request)
+
+    def render_listing(self, page):
+        html = ASIN_PATTERN.sub(lambda m: f"B0P{page:03d}{m.group(1)}", self.listing_html)
+        html = PAGE_COUNT_PATTERN.sub(rf'\g<1>{self.pages}\g<2>', html)
+        html = html.replace('page=2&', f'page={page + 1}&').replace(
+            'ref=sr_pg_1', f'ref=sr_pg_{page}')
+        if page >= self.pages:
+            html = NEXT_LINK_PATTERN.sub('', html)
+        return html
+
+    async def listing(self, request):
+        page = int(request.query.get('page', 1))
+        if page > self.pages:
+            raise web.HTTPNotFound()
+        self.stats['listing'] += 1
+        return web.Response(text=self.render_listing(page), content_type='text/html')
+
+    async def product(self, request):
+        asin = request.match_info['asin']
+        self.stats['product'] += 1
+        html = self.product_html.replace('Samsung Galaxy S24 5G', f'Mock Phone {asin}')
+        return web.Response(text=html, content_type='text/html')
+
+    async def get_stats(self, request):
+        return web.json_response(self.stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--pages', type=int, default=10, help='search result pages')
+    parser.add_argument('--latency-ms', type=float, default=50, help='base response latency')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='random extra latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of 500 responses')
+    parser.add_argument('--block-rate', type=float, default=0.0, help='share of 403 responses')
+    parser.add_argument('--captcha-rate', type=float, default=0.0,
+                        help='share of CAPTCHA pages served with 200')
+    parser.add_argument('--seed', type=int, help='seed for reproducible fault injection')
+    args = parser.parse_args()
+
+    mock = MockAmazon(args.pages, args.latency_ms, args.jitter_ms,
+                      args.error_rate, args.block_rate, args.captcha_rate, args.seed)
+    web.run_app(mock.app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""Micro-benchmark of the HTML parser backends over saved Amazon pages.
+
+Usage:
+    python benchmarks/parser_benchmark.py [--html-dir DIR] [--repeat N] [--json FILE]
+
+Every ``*.html`` file in the directory is parsed with the legacy
+BeautifulSoup/html.parser code (two passes over search pages, one full soup
+with repeated ``select_one`` calls over product pages, as the scraper did
+before the parser backends) and with every installed backend. Files
+whose name contains ``listing`` are treated as search result pages, all
+others as product pages.
+"""
+from pathlib import Path
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup, SoupStrainer  # noqa: E402
+
+from ScraperAmazon.parsing import (  # noqa: E402
+    available_backends, get_extractor, NEXT_PAGE_SELECTOR
+)
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+
+
+def legacy_listing(html):
+    """Parse a search page the way scrape_page_products used to: twice"""
+    strainer = SoupStrainer(
+        ['a'], class_='a-link-normal s-underline-text s-underline-link-text s-link-style a-text-normal'
+    )
+    soup = BeautifulSoup(html, 'html.parser', parse_only=strainer)
+    hrefs = [a.get('href') for a in soup.find_all('a') if a.get('href')]
+    soup = BeautifulSoup(html, 'html.parser')
+    soup.select_one(NEXT_PAGE_SELECTOR)
+    return hrefs
+
+
+def legacy_clean_text(text):
+    text = re.sub(r'[\u200f\u200e]', '', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+
+def legacy_price(soup):
+    for selector in (
+        "#corePriceDisplay_desktop_feature_div .a-price-whole",
+        "div.a-section.a-spacing-micro span.a-price.a-text-price.a-size-medium span.a-offscreen"
+    ):
+        element = soup.select_one(selector)
+        if element:
+            return element.get_text(strip=True)
+    return None
+
+
+def legacy_discount(soup):
+    for selector in ("span.a-color-price", ".savingsPercentage"):
+        for element in soup.select(selector):
+            match = re.search(r'(-?\d+%)', element.get_text(strip=True))
+            if match:
+                return match.group(1)
+    return None
+
+
+def legacy_reviews(soup):
+    reviews = []
+    for review in soup.select("div[data-hook='review']")[:5]:
+        try:
+            reviews.append({
+                "Reviewer": review.select_one("span.a-profile-name").text.strip(),
+                "Rating": review.select_one(
+                    "i.a-icon-star span.a-icon-alt").text.strip().replace("out of 5 stars", ""),
+                "Date": review.select_one("span.review-date").text.strip(),
+                "Review": review.select_one("span[data-hook='review-body']").text.strip()
+            })
+        except Exception:
+            continue
+    return reviews
+
+
+def legacy_product(html):
+    """Parse a product page the way scrape_product_data used to: one full soup
+    queried selector by selector, some selectors twice"""
+    soup = BeautifulSoup(html, 'html.parser')
+    image = soup.select_one("#imgTagWrapperId img")
+    description = soup.select_one("#feature-bullets")
+    product_data = {
+        "Title": soup.select_one("#productTitle").text.strip() if soup.select_one("#productTitle") else None,
+        "Price": legacy_price(soup),
+        "Discount": legacy_discount(soup),
+        "Image URL": image['src'] if image else None,
+        "Description": description.text.strip() if description else None,
+        "Reviews": legacy_reviews(soup)
+    }
+
+    tables = {
+        'first_table': '.a-normal.a-spacing-micro',
+        'tech_specs': '#productDetails_techSpec_section_1',
+        'right_table': '#productDetails_detailBullets_sections1',
+        'new_table': 'ul.a-unordered-list.a-nostyle.a-vertical.a-spacing-none.detail-bullet-list',
+        'bestseller_rank': 'table.a-keyvalue.prodDetTable'
+    }
+    for table_name, selector in tables.items():
+        table = soup.select_one(selector)
+        if not table:
+            continue
+        if table_name == 'new_table':
+            for item in table.find_all('li'):
+                key_element = item.select_one('span.a-text-bold')
+                value_element = item.find('span', class_=lambda x: x != 'a-text-bold')
+                if key_element and value_element:
+                    key = legacy_clean_text(key_element.text.strip().replace(':', ''))
+                    product_data[key] = legacy_clean_text(value_element.text.strip())
+        else:
+            for row in table.find_all('tr'):
+                key_element = row.find(['th', 'td'])
+                value_element = row.find_all('td')[-1] if row.find_all('td') else None
+                if key_element and value_element:
+                    key = legacy_clean_text(key_element.get_text(strip=True))
+                    product_data[key] = legacy_clean_text(value_element.get_text(strip=True))
+    return product_data
+
+
+def time_call(func, html, repeat):
+    """Return per-call timings in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(html)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def run(html_dir, repeat):
+    results = []
+    for path in sorted(Path(html_dir).glob('*.html')):
+        html = path.read_text(encoding='utf-8', errors='replace')
+        is_listing = 'listing' in path.name
+
+        candidates = [('legacy-bs4', legacy_listing if is_listing else legacy_product)]
+        for name in available_backends():
+            extractor = get_extractor(name)
+            candidates.append(
+                (name, extractor.extract_listing if is_listing else extractor.extract_product))
+
+        baseline = None
+        for name, func in candidates:
+            func(html)  # warm up selector caches
+            median_ms = statistics.median(time_call(func, html, repeat))
+            baseline = baseline or median_ms
+            results.append({
+                "file": path.name,
+                "page_type": "listing" if is_listing else "product",
+                "backend": name,
+                "size_kb": round(len(html) / 1024, 1),
+                "median_ms": round(median_ms, 3),
+                "speedup": round(baseline / median_ms, 2)
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--html-dir', default=str(FIXTURES_DIR),
+                        help='directory of saved Amazon pages (default: bundled fixtures)')
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='parses per file and backend')
+    parser.add_argument('--json', help='also write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = run(args.html_dir, args.repeat)
+
+    print(f"{'file':<20} {'backend':<12} {'size KB':>8} {'median ms':>10} {'speedup':>8}")
+    for row in results:
+        print(f"{row['file']:<20} {row['backend']:<12} {row['size_kb']:>8} "
+              f"{row['median_ms']:>10} {row['speedup']:>7}x")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
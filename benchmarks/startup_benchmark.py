@@ -0,0 +1,210 @@
+"""Cold-start benchmark of the function modules against the local mock Amazon server.
+
+Usage:
+    python benchmarks/startup_benchmark.py [--invocations N] [--latency-ms MS]
+                                           [--repeat N] [--output FILE]
+
+Every measurement runs in a fresh interpreter, the way a new worker starts.
+Each function folder is imported as part of an ``__app__`` package, like the
+Functions host does, and its import time and the heavy modules it loaded are
+recorded. Then ``AmazonProducts`` is invoked ``--invocations`` times on one
+event loop, with and without the warm session: the first invocation gives the
+time from process start to the first request and response, the later ones the
+warm invocation time and connection reuse.
+"""
+from pathlib import Path
+import argparse
+import asyncio
+import importlib
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+PROCESS_START = time.perf_counter()
+
+ROOT = Path(__file__).resolve().parent.parent
+MOCK_SERVER = Path(__file__).parent / 'mock_amazon.py'
+
+FUNCTION_MODULES = ('ScraperAmazon', 'AmazonLinks', 'AmazonProducts', 'AmazonRemovals', 'Orchest',
+                    'HttpStarter')
+# Modules whose import cost the lazy import path is meant to defer
+HEAVY_MODULES = ('aiohttp', 'chardet', 'bs4', 'lxml', 'selectolax', 'pyarrow',
+                 'multiprocessing', 'azure.durable_functions')
+
+STARTUP_CONFIG = {
+    'pause_duration': (0, 0),
+    'request_delay': (0, 0),
+    'requests_per_second': 200.0,
+    'burst': 20
+}
+
+
+def load_app_package():
+    """Register the repository as the __app__ package the function folders import from"""
+    package = types.ModuleType('__app__')
+    package.__path__ = [str(ROOT)]
+    sys.modules['__app__'] = package
+
+
+def child_import(module_name):
+    """Import one function module and report its cost"""
+    load_app_package()
+    started = time.perf_counter()
+    try:
+        importlib.import_module(f'__app__.{module_name}')
+    except ImportError as e:
+        return {'error': str(e)}
+    return {
+        'import_ms': round((time.perf_counter() - started) * 1000, 1),
+        'heavy_modules': [name for name in HEAVY_MODULES if name in sys.modules]
+    }
+
+
+async def invoke_products(base_url, invocations, warm_session):
+    load_app_package()
+    import_started = time.perf_counter()
+    products = importlib.import_module('__app__.AmazonProducts')
+    import_ms = (time.perf_counter() - import_started) * 1000
+
+    runs = []
+    for number in range(invocations):
+        # A new product on every invocation so no run is answered from memory
+        asin = f"B0S{number:07d}"
+        started = time.perf_counter()
+        result = await products.main({
+            'product_urls': [f"{base_url}/dp/{asin}"],
+            'region': 'us',
+            'config': {
+                **STARTUP_CONFIG,
+                'base_urls': {'us': base_url},
+                'warm_session': warm_session
+            }
+        })
+        finished = time.perf_counter()
+        if result['status'] != 'success':
+            raise RuntimeError(result.get('error'))
+        runs.append({
+            'invocation_ms': (finished - started) * 1000,
+            'since_process_start_ms': (finished - PROCESS_START) * 1000,
+            'connection_stats': result['connection_stats']
+        })
+
+    warm_runs = runs[1:]
+    return {
+        'import_ms': round(import_ms, 1),
+        'first_response_ms': round(runs[0]['since_process_start_ms'], 1),
+        'first_invocation_ms': round(runs[0]['invocation_ms'], 1),
+        'warm_invocation_ms': round(statistics.median(
+            run['invocation_ms'] for run in warm_runs), 1) if warm_runs else None,
+        'new_connections': sum(run['connection_stats']['new_connections'] for run in runs),
+        'reused_connections': sum(
+            run['connection_stats']['reused_connections'] for run in runs)
+    }
+
+
+def run_child(*args):
+    """Run this script in child mode in a fresh interpreter and return its JSON output"""
+    completed = subprocess.run(
+        [sys.executable, __file__, '--child', *map(str, args)],
+        capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.splitlines()[-1])
+
+
+def median_of(results, key):
+    values = [result[key] for result in results if result.get(key) is not None]
+    return round(statistics.median(values), 1) if values else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--invocations', type=int, default=5,
+                        help='AmazonProducts invocations per worker process')
+    parser.add_argument('--latency-ms', type=float, default=20, help='mock response latency')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='fresh processes per measurement; medians are reported')
+    parser.add_argument('--output',
+                        default=str(Path(tempfile.gettempdir()) / 'startup-benchmark.json'),
+                        help='file the JSON result is written to (default: in the temp directory)')
+    parser.add_argument('--child', nargs='+', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        if args.child[0] == 'import':
+            result = child_import(args.child[1])
+        else:
+            base_url, invocations, warm_session = args.child[1:]
+            result = asyncio.run(
+                invoke_products(base_url, int(invocations), warm_session == 'warm'))
+        print(json.dumps(result))
+        return
+
+    # Imported here so the child processes do not pay for it
+    from crawl_benchmark import free_port, wait_for_server
+
+    imports = {}
+    for module_name in FUNCTION_MODULES:
+        runs = [run_child('import', module_name) for _ in range(args.repeat)]
+        if 'error' in runs[0]:
+            imports[module_name] = runs[0]
+            continue
+        imports[module_name] = {
+            'import_ms': median_of(runs, 'import_ms'),
+            'heavy_modules': runs[0]['heavy_modules']
+        }
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen([
+        sys.executable, str(MOCK_SERVER), '--port', str(port),
+        '--latency-ms', str(args.latency_ms)
+    ])
+    invocations = {}
+    try:
+        asyncio.run(wait_for_server(base_url))
+        for mode in ('cold', 'warm'):
+            runs = [run_child('invoke', base_url, args.invocations, mode)
+                    for _ in range(args.repeat)]
+            invocations[f"{mode}_session"] = {
+                **{key: median_of(runs, key) for key in (
+                    'import_ms', 'first_response_ms', 'first_invocation_ms',
+                    'warm_invocation_ms')},
+                'new_connections': runs[0]['new_connections'],
+                'reused_connections': runs[0]['reused_connections']
+            }
+    finally:
+        server.terminate()
+        server.wait()
+
+    result = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'options': {
+            'invocations': args.invocations,
+            'latency_ms': args.latency_ms,
+            'repeat': args.repeat
+        },
+        'imports': imports,
+        'invocations': invocations
+    }
+    with open(args.output, 'w') as f:
+        json.dump(result, f, indent=2)
+
+    for module_name, figures in imports.items():
+        if 'error' in figures:
+            print(f"{module_name:<16} not importable: {figures['error']}")
+        else:
+            print(f"{module_name:<16} {figures['import_ms']:>7} ms  "
+                  f"{', '.join(figures['heavy_modules']) or '-'}")
+    for mode, figures in invocations.items():
+        print(f"\n{mode}")
+        for name, value in figures.items():
+            print(f"  {name:<22} {value}")
+    print(f"\nWrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# Shared fixtures for the ScraperAmazon tests
+from contextlib import asynccontextmanager
+from pathlib import Path
+import importlib
+import sys
+import types
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURES = ROOT / 'benchmarks' / 'fixtures'
+
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+
+# Fast settings for crawls against the mock server
+TEST_CONFIG = {
+    'pause_duration': (0, 0),
+    'request_delay': (0, 0),
+    'retry_delay': 0.05,
+    'max_retries': 1,
+    'requests_per_second': 500.0,
+    'burst': 50,
+    'queue_size': 5,
+    'warm_session': False
+}
+
+
+def load_function(name):
+    """Import a function folder as part of the __app__ package, like the Functions host"""
+    if '__app__' not in sys.modules:
+        package = types.ModuleType('__app__')
+        package.__path__ = [str(ROOT)]
+        sys.modules['__app__'] = package
+    return importlib.import_module(f'__app__.{name}')
+
+
+@pytest.fixture(scope='session')
+def listing_html():
+    return (FIXTURES / 'listing.html').read_text(encoding='utf-8')
+
+
+@pytest.fixture(scope='session')
+def product_html():
+    return (FIXTURES / 'product.html').read_text(encoding='utf-8')
+
+
+@asynccontextmanager
+async def mock_amazon(**options):
+    """Serve the benchmark mock Amazon on a free local port and yield its base URL"""
+    from aiohttp import web
+    from mock_amazon import MockAmazon
+
+    runner = web.AppRunner(MockAmazon(**{'latency_ms': 1, **options}).app())
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        await runner.cleanup()
+
+
+def crawl_input(base_url, pages=2, **fields):
+    """ScraperAmazon activity input crawling the mock server"""
+    config = fields.pop('config', {})
+    return {
+        'start_url': f"{base_url}/s?k=phone",
+        'region': 'us',
+        'max_pages': pages,
+        'config': {**TEST_CONFIG, 'base_urls': {'us': base_url}, **config},
+        **fields
+    }
@@ -0,0 +1,48 @@
+# Block page detection and the concurrency it drives
+import pytest
+
+from ScraperAmazon.blocking import BLOCK_PAGE_MAX_BYTES, BlockMonitor, classify_block
+from ScraperAmazon.rate_limit import AdaptiveConcurrencyLimiter
+
+
+@pytest.mark.parametrize('body, kind', [
+    (b'<form action="/errors/validateCaptcha">', 'captcha'),
+    (b"<p>Sorry, we just need to make sure you're not a robot</p>", 'robot_check'),
+    (b'<title>Sorry! Something went wrong!</title>', 'error_page'),
+    (b'<span id="productTitle">Phone</span>', None),
+])
+def test_classify_block(body, kind):
+    assert classify_block(body) == kind
+
+
+def test_large_pages_are_not_scanned():
+    body = b'/errors/validateCaptcha' + b'x' * BLOCK_PAGE_MAX_BYTES
+    assert classify_block(body) is None
+
+
+def test_real_pages_are_content(listing_html, product_html):
+    assert classify_block(listing_html.encode('utf-8')) is None
+    assert classify_block(product_html.encode('utf-8')) is None
+
+
+def test_blocks_lower_concurrency_once_per_round():
+    limiter = AdaptiveConcurrencyLimiter(8)
+    monitor = BlockMonitor(limiter, window=10, threshold=0.1)
+    for _ in range(8):
+        monitor.record('captcha')
+    assert limiter.limit == 4
+    for _ in range(3):
+        monitor.record('captcha')
+    assert limiter.limit == 4
+    monitor.record('captcha')
+    assert limiter.limit == 2
+    assert monitor.get_stats()['blocked'] == {'captcha': 12}
+
+
+def test_concurrency_recovers_without_blocks():
+    limiter = AdaptiveConcurrencyLimiter(4)
+    limiter.set_limit(2)
+    monitor = BlockMonitor(limiter, window=10, threshold=0.1)
+    for _ in range(20):
+        monitor.record()
+    assert limiter.limit == 4
@@ -0,0 +1,104 @@
+# Checkpointed crawls resumed after a failure
+import asyncio
+import json
+
+import pytest
+
+from conftest import crawl_input, mock_amazon
+import ScraperAmazon
+from ScraperAmazon import sinks
+from ScraperAmazon.checkpoint import FileCheckpointStore, open_checkpoint
+
+
+def fail_on_write(monkeypatch, number, sinks_module=sinks):
+    """Make the number-th FileSink write of the test raise"""
+    writes = []
+    original = sinks_module.FileSink._write_bytes
+
+    def write_bytes(self, payload):
+        writes.append(len(payload))
+        if len(writes) == number:
+            raise OSError('disk full')
+        original(self, payload)
+
+    monkeypatch.setattr(sinks_module.FileSink, '_write_bytes', write_bytes)
+
+
+def test_state_round_trip(tmp_path):
+    async def scenario():
+        spec = {'type': 'file', 'directory': str(tmp_path), 'id': 'crawl'}
+        checkpoint = open_checkpoint(spec, 15)
+        checkpoint.add_links(['https://www.amazon.com/dp/B0TEST0001'] * 2)
+        checkpoint.page_done('https://www.amazon.com/s?k=phone', 'next', 2)
+        checkpoint.product_done('https://www.amazon.com/dp/B0TEST0001', {'Title': 'Phone'})
+        await checkpoint.save()
+        return open_checkpoint(spec, 15)
+
+    resumed = asyncio.run(scenario())
+    assert resumed.resumed
+    assert resumed.links == ['https://www.amazon.com/dp/B0TEST0001']
+    assert (resumed.next_page_url, resumed.page_number) == ('next', 2)
+    assert resumed.products == [{'Title': 'Phone'}]
+    assert resumed.pending_links() == []
+
+
+def test_clear_waits_for_background_save(tmp_path):
+    async def scenario():
+        checkpoint = open_checkpoint({'directory': str(tmp_path), 'id': 'crawl'}, 0)
+        checkpoint.product_done('https://www.amazon.com/dp/B0TEST0001')
+        await checkpoint.clear()
+
+    asyncio.run(scenario())
+    assert FileCheckpointStore(str(tmp_path)).load('crawl') is None
+
+
+@pytest.mark.parametrize('failing_write', [1, 2])
+def test_resume_after_failing_sink_writes_every_product(tmp_path, monkeypatch, failing_write):
+    path = tmp_path / 'phones.ndjson'
+    fail_on_write(monkeypatch, failing_write)
+
+    async def scenario():
+        async with mock_amazon() as base_url:
+            request = crawl_input(
+                base_url, 2, output={'type': 'file', 'path': str(path), 'batch_size': 20},
+                checkpoint={'type': 'file', 'directory': str(tmp_path / 'checkpoints'),
+                            'id': 'crawl'})
+            with pytest.raises(OSError):
+                await ScraperAmazon.main(request)
+            return await ScraperAmazon.main(request)
+
+    result = asyncio.run(scenario())
+    urls = [json.loads(line)['product_url'] for line in path.read_text().splitlines()]
+    assert result['status'] == 'success'
+    assert result['resumed']
+    # Two mock search pages of 48 products each, none lost and none repeated
+    assert len(urls) == len(set(urls)) == 96
+
+
+def test_batch_resume_after_failing_sink(tmp_path, monkeypatch):
+    from conftest import load_function
+
+    products = load_function('AmazonProducts')
+    # The function folder imports the package as __app__.ScraperAmazon
+    fail_on_write(monkeypatch, 1, load_function('ScraperAmazon.sinks'))
+    urls = [f"/dp/B0TEST{number:04d}" for number in range(30)]
+
+    async def scenario():
+        async with mock_amazon() as base_url:
+            request = {
+                **crawl_input(base_url),
+                'product_urls': [base_url + url for url in urls],
+                'output': {'type': 'file', 'path': str(tmp_path / 'phones.ndjson'),
+                           'batch_size': 10},
+                'checkpoint': {'type': 'file', 'directory': str(tmp_path / 'checkpoints'),
+                               'id': 'batch'},
+                'part': 0
+            }
+            with pytest.raises(OSError):
+                await products.main(request)
+            return await products.main(request)
+
+    result = asyncio.run(scenario())
+    lines = (tmp_path / 'phones-part0000.ndjson').read_text().splitlines()
+    assert result['status'] == 'success'
+    assert len({json.loads(line)['product_url'] for line in lines}) == len(lines) == 30
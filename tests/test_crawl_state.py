@@ -0,0 +1,155 @@
+# Incremental crawl state: records are kept only for runs that succeeded
+import asyncio
+import json
+
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+import pytest
+
+from conftest import crawl_input, mock_amazon
+import ScraperAmazon
+from ScraperAmazon import sinks
+from ScraperAmazon.crawl_state import BlobCrawlState, SqliteCrawlState, content_hash, state_key
+
+CONNECTION_STRING = (
+    'DefaultEndpointsProtocol=https;AccountName=test;AccountKey=dGVzdA==;'
+    'EndpointSuffix=core.windows.net')
+URL = 'https://www.amazon.com/Phone/dp/B0TEST0001/ref=sr_1_1'
+
+
+class FakeBlob:
+    """In-memory blob with ETags, standing in for a BlobClient"""
+
+    def __init__(self, store, blob_name='state.sqlite'):
+        self.store = store
+        self.blob_name = blob_name
+
+    def download_blob(self):
+        if self.blob_name not in self.store:
+            raise ResourceNotFoundError('not found')
+        data, etag = self.store[self.blob_name]
+
+        class Downloader:
+            properties = type('Properties', (), {'etag': etag})
+
+            def readall(self):
+                return data
+        return Downloader()
+
+    def upload_blob(self, data, overwrite=False, etag=None, match_condition=None):
+        current = self.store.get(self.blob_name)
+        if current and not overwrite:
+            raise ResourceExistsError('exists')
+        if current and etag and current[1] != etag:
+            raise ResourceModifiedError('modified')
+        self.store[self.blob_name] = (data.read(), (current[1] + 1) if current else 1)
+
+
+def blob_state(store):
+    state = BlobCrawlState('state', 'state.sqlite', 3600, CONNECTION_STRING)
+    state.blob_client = FakeBlob(store)
+    return state
+
+
+def test_state_key_prefers_asin():
+    assert state_key(URL) == 'asin:B0TEST0001'
+    assert state_key('https://WWW.example.com/item?b=2&a=1') == 'https://www.example.com/item?a=1&b=2'
+
+
+def test_content_hash_ignores_volatile_fields():
+    product = {'Title': 'Phone', 'Price': '699.', 'date_column': '2024-03-01', 'Reviews': []}
+    assert content_hash(product) == content_hash(
+        {**product, 'date_column': '2024-03-02', 'Reviews': [{'Rating': '5.0'}]})
+    assert content_hash(product) != content_hash({**product, 'Price': '649.'})
+
+
+def test_records_written_only_when_committed(tmp_path):
+    path = str(tmp_path / 'state.sqlite')
+
+    async def scenario():
+        state = SqliteCrawlState(path, 3600)
+        await state.open()
+        state.record(URL, {'Title': 'Phone'})
+        await state.close(commit=False)
+
+        state = SqliteCrawlState(path, 3600)
+        await state.open()
+        dropped = state.is_fresh(URL)
+        state.record(URL, {'Title': 'Phone'})
+        await state.close()
+
+        state = SqliteCrawlState(path, 3600)
+        await state.open()
+        kept = state.is_fresh('https://www.amazon.com/dp/B0TEST0001')
+        await state.close()
+        return dropped, kept
+
+    assert asyncio.run(scenario()) == (False, True)
+
+
+def test_blob_uploads_merge_concurrent_runs(tmp_path):
+    store = {}
+
+    async def scenario():
+        first, second = blob_state(store), blob_state(store)
+        await first.open()
+        await second.open()
+        first.record('https://www.amazon.com/dp/B0TEST0001', {'Title': 'One'})
+        second.record('https://www.amazon.com/dp/B0TEST0002', {'Title': 'Two'})
+        await first.close()
+        await second.close()
+
+        merged = blob_state(store)
+        await merged.open()
+        keys = [row[0] for row in merged.db.execute("SELECT key FROM products ORDER BY key")]
+        await merged.close(commit=False)
+        return keys
+
+    assert asyncio.run(scenario()) == ['asin:B0TEST0001', 'asin:B0TEST0002']
+    assert store['state.sqlite'][1] == 2
+
+
+def test_failed_blob_run_uploads_nothing():
+    store = {}
+
+    async def scenario():
+        state = blob_state(store)
+        await state.open()
+        state.record(URL, {'Title': 'Phone'})
+        await state.close(commit=False)
+
+    asyncio.run(scenario())
+    assert store == {}
+
+
+def test_retry_after_failing_sink_scrapes_every_product(tmp_path, monkeypatch):
+    path = tmp_path / 'phones.ndjson'
+    original = sinks.FileSink._write_bytes
+    writes = []
+
+    def write_bytes(self, payload):
+        writes.append(len(payload))
+        if len(writes) == 2:
+            raise OSError('disk full')
+        original(self, payload)
+
+    monkeypatch.setattr(sinks.FileSink, '_write_bytes', write_bytes)
+
+    async def scenario():
+        async with mock_amazon() as base_url:
+            request = crawl_input(
+                base_url, 2, output={'type': 'file', 'path': str(path), 'batch_size': 20},
+                config={'crawl_state': {'type': 'sqlite', 'path': str(tmp_path / 'state.sqlite')}})
+            with pytest.raises(OSError):
+                await ScraperAmazon.main(request)
+            retried = await ScraperAmazon.main(request)
+            lines = path.read_text().splitlines()
+            again = await ScraperAmazon.main(request)
+        return retried, lines, again
+
+    retried, lines, again = asyncio.run(scenario())
+    urls = [json.loads(line)['product_url'] for line in lines]
+    assert retried['status'] == 'success'
+    assert len(urls) == len(set(urls)) == 96
+    # The successful run was recorded, so the next one skips every product
+    assert again['total_products'] == 0
+    assert again['crawl_state_stats']['skipped'] == 96
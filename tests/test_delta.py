@@ -0,0 +1,209 @@
+# Delta mode: snapshot rows follow delivered events, removals after a full crawl
+import asyncio
+import json
+
+import pytest
+
+from conftest import crawl_input, load_function, mock_amazon
+import ScraperAmazon
+from ScraperAmazon import sinks
+from ScraperAmazon.delta import SnapshotIndex
+
+SCOPE = 'www.amazon.com/s?k=phone'
+
+
+def product(asin, price='699.'):
+    return {'product_url': f'https://www.amazon.com/dp/{asin}', 'Title': 'Phone',
+            'Price': price, 'Discount': '-18%', 'date_column': '2024-03-01'}
+
+
+def snapshot_at(path):
+    snapshot = SnapshotIndex(str(path))
+    snapshot.begin(SCOPE)
+    return snapshot
+
+
+def events_of(snapshot, products):
+    return [event['event'] for event in map(snapshot.compare, products) if event]
+
+
+def test_new_changed_unchanged_and_removed(tmp_path):
+    path = tmp_path / 'snapshots.sqlite'
+    snapshot = snapshot_at(path)
+    assert events_of(snapshot, [product('B0TEST0001'), product('B0TEST0002')]) == ['new', 'new']
+    snapshot.close()
+
+    snapshot = snapshot_at(path)
+    changed = snapshot.compare(product('B0TEST0001', '649.'))
+    assert changed['changes'] == {'Price': {'old': '699.', 'new': '649.'}}
+    removed = snapshot.removed()
+    assert [event['product_url'] for event in removed] == ['https://www.amazon.com/dp/B0TEST0002']
+    snapshot.close()
+
+    snapshot = snapshot_at(path)
+    assert events_of(snapshot, [product('B0TEST0001', '649.')]) == []
+    assert snapshot.removed() == []
+    assert snapshot.get_stats()['unchanged'] == 1
+    snapshot.close()
+
+
+def test_undelivered_events_are_reported_again(tmp_path):
+    path = tmp_path / 'snapshots.sqlite'
+    snapshot = snapshot_at(path)
+    events_of(snapshot, [product('B0TEST0001'), product('B0TEST0002')])
+    snapshot.commit(['https://www.amazon.com/dp/B0TEST0001'])
+    snapshot.close(commit=False)
+
+    snapshot = snapshot_at(path)
+    assert events_of(snapshot, [product('B0TEST0001'), product('B0TEST0002')]) == ['new']
+    snapshot.close()
+
+
+def test_undelivered_removals_are_reported_again(tmp_path):
+    path = tmp_path / 'snapshots.sqlite'
+    snapshot = snapshot_at(path)
+    events_of(snapshot, [product('B0TEST0001')])
+    snapshot.close()
+
+    for _ in range(2):
+        snapshot = snapshot_at(path)
+        assert len(snapshot.removed()) == 1
+        snapshot.close(commit=False)
+    snapshot = snapshot_at(path)
+    snapshot.removed()
+    snapshot.close()
+    assert snapshot_at(path).removed() == []
+
+
+def test_resume_after_failing_sink_delivers_every_event(tmp_path, monkeypatch):
+    path = tmp_path / 'changes.ndjson'
+    original = sinks.FileSink._write_bytes
+    writes = []
+
+    def write_bytes(self, payload):
+        writes.append(len(payload))
+        if len(writes) == 2:
+            raise OSError('disk full')
+        original(self, payload)
+
+    monkeypatch.setattr(sinks.FileSink, '_write_bytes', write_bytes)
+
+    async def scenario():
+        async with mock_amazon() as base_url:
+            request = crawl_input(
+                base_url, 2, output={'type': 'file', 'path': str(path), 'batch_size': 20},
+                checkpoint={'type': 'file', 'directory': str(tmp_path / 'checkpoints'),
+                            'id': 'crawl'},
+                config={'delta': {'path': str(tmp_path / 'snapshots.sqlite')}})
+            with pytest.raises(OSError):
+                await ScraperAmazon.main(request)
+            resumed = await ScraperAmazon.main(request)
+            lines = path.read_text().splitlines()
+            again = await ScraperAmazon.main(request)
+        return resumed, lines, again
+
+    resumed, lines, again = asyncio.run(scenario())
+    events = [json.loads(line) for line in lines]
+    assert resumed['status'] == 'success'
+    assert {event['event'] for event in events} == {'new'}
+    assert len({event['product_url'] for event in events}) == len(events) == 96
+    assert again['delta_stats']['unchanged'] == 96
+    assert again['total_products'] == 0
+
+
+def test_removal_pass(tmp_path):
+    removals = load_function('AmazonRemovals')
+    delta = {'path': str(tmp_path / 'snapshots.sqlite')}
+    snapshot = snapshot_at(delta['path'])
+    events_of(snapshot, [product('B0TEST0001'), product('B0TEST0002'), product('B0TEST0003')])
+    snapshot.close()
+
+    request = {
+        'start_url': 'https://www.amazon.com/s?k=phone&page=2&qid=1',
+        'region': 'us',
+        'product_links': ['https://www.amazon.com/dp/B0TEST0001',
+                          'https://www.amazon.com/Phone/dp/B0TEST0003/ref=sr_1_3'],
+        'config': {'delta': delta},
+        'output': {'type': 'file', 'path': str(tmp_path / 'changes.ndjson')}
+    }
+    result = asyncio.run(removals.main(request))
+    assert result['status'] == 'success'
+    assert result['output']['path'] == str(tmp_path / 'changes-removed.ndjson')
+    events = [json.loads(line) for line in open(result['output']['path'])]
+    assert [event['product_url'] for event in events] == ['https://www.amazon.com/dp/B0TEST0002']
+    assert asyncio.run(removals.main(request))['total_products'] == 0
+
+
+def test_removal_pass_needs_delta():
+    removals = load_function('AmazonRemovals')
+    result = asyncio.run(removals.main(
+        {'start_url': 'https://www.amazon.com/s?k=phone', 'region': 'us', 'product_links': []}))
+    assert result['status'] == 'error'
+
+
+class FakeTask:
+    def __init__(self, name, activity_input, result):
+        self.name, self.input, self.result = name, activity_input, result
+
+
+class FakeContext:
+    """Runs a fan-out with canned activity results, recording every call"""
+    is_replaying = False
+    instance_id = 'fake'
+
+    def __init__(self, results):
+        self.results = results
+        self.calls = []
+
+    def call_activity(self, name, activity_input):
+        task = FakeTask(name, activity_input, self.results[name](activity_input))
+        self.calls.append(task)
+        return task
+
+    def task_any(self, tasks):
+        # The orchestrator is sent the task that finished first
+        return FakeTask('task_any', tasks, tasks[0])
+
+
+def run_fan_out(context, job):
+    orchest = load_function('Orchest')
+    job = {'start_url': 'https://www.amazon.com/s?k=phone', 'region': 'us', 'max_pages': 2,
+           'batch_size': 2, 'output': None, 'checkpoint': None, 'checkpoint_id': 'fake',
+           'retry': None, 'result_format': None, **job}
+    steps = orchest.fan_out_products(context, job)
+    sent = None
+    try:
+        while True:
+            sent = steps.send(sent)
+            if isinstance(sent, FakeTask):
+                sent = sent.result
+    except StopIteration as stop:
+        return stop.value
+
+
+@pytest.mark.parametrize('delta,pagination_complete,removal_pass', [
+    ({'path': 'snapshots.sqlite'}, True, True),
+    ({'path': 'snapshots.sqlite'}, False, False),
+    (None, True, False),
+])
+def test_fan_out_removal_pass(delta, pagination_complete, removal_pass):
+    links = [f'https://www.amazon.com/dp/B0TEST000{i}' for i in range(3)]
+    context = FakeContext({
+        'AmazonLinks': lambda _: {'status': 'success', 'product_links': links,
+                                  'pagination_complete': pagination_complete},
+        'AmazonProducts': lambda batch: {'status': 'success',
+                                         'total_products': len(batch['product_urls']),
+                                         'scraped_data': []},
+        'AmazonRemovals': lambda _: {'status': 'success', 'total_products': 1,
+                                     'scraped_data': [{'event': 'removed'}]},
+    })
+    result = run_fan_out(context, {'config': {'delta': delta} if delta else {}})
+
+    removals = [call for call in context.calls if call.name == 'AmazonRemovals']
+    if removal_pass:
+        assert [call.input['product_links'] for call in removals] == [links]
+        assert result['scraped_data'] == [{'event': 'removed'}]
+        assert result['total_products'] == 4
+    else:
+        assert removals == []
+        assert result['total_products'] == 3
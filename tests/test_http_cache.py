@@ -0,0 +1,144 @@
+# On-disk HTTP cache: storage off the loop and one size cap per directory
+import asyncio
+import gzip
+import json
+import os
+
+from ScraperAmazon import http_cache
+from ScraperAmazon.http_cache import HttpCache, SharedIndexes, normalize_url
+
+PAGE = '<html>' + 'x' * 4000 + '</html>'
+
+
+def open_cache(directory, max_bytes=10 ** 6, ttl=3600, shared=None):
+    async def opened():
+        cache = HttpCache(str(directory), max_bytes, ttl, shared or SharedIndexes())
+        await cache.open()
+        return cache
+    return opened
+
+
+def test_normalize_url():
+    assert normalize_url('HTTPS://WWW.Amazon.com/dp/B0TEST0001?th=1&a=2#reviews') == \
+        'https://www.amazon.com/dp/B0TEST0001?a=2&th=1'
+
+
+def test_store_and_read(tmp_path):
+    async def scenario():
+        cache = await open_cache(tmp_path)()
+        await cache.store('https://www.amazon.com/dp/B0TEST0001', PAGE, etag='"v1"')
+        entry = cache.lookup('https://WWW.amazon.com/dp/B0TEST0001')
+        return cache, entry, await cache.read(entry)
+
+    cache, entry, body = asyncio.run(scenario())
+    assert body == PAGE
+    assert cache.is_fresh(entry)
+    assert cache.conditional_headers(entry) == {'If-None-Match': '"v1"'}
+    assert cache.get_stats()['entries'] == 1
+
+
+def test_index_reloaded_from_disk(tmp_path):
+    async def scenario():
+        first = await open_cache(tmp_path)()
+        await first.store('https://www.amazon.com/dp/B0TEST0001', PAGE, etag='"v1"')
+        second = await open_cache(tmp_path)()
+        return await second.read(second.lookup('https://www.amazon.com/dp/B0TEST0001'))
+
+    assert asyncio.run(scenario()) == PAGE
+
+
+def test_unreadable_entry_dropped(tmp_path):
+    async def scenario():
+        cache = await open_cache(tmp_path)()
+        await cache.store('https://www.amazon.com/dp/B0TEST0001', PAGE, etag='"v1"')
+        entry = cache.lookup('https://www.amazon.com/dp/B0TEST0001')
+        with open(tmp_path / f"{entry['key']}.gz", 'wb') as f:
+            f.write(b'not gzip')
+        return cache, await cache.read(entry)
+
+    cache, body = asyncio.run(scenario())
+    assert body is None
+    assert cache.lookup('https://www.amazon.com/dp/B0TEST0001') is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_scrapers_of_one_process_share_the_size_cap(tmp_path):
+    shared = SharedIndexes()
+    entry_size = len(gzip.compress(PAGE.encode('utf-8')))
+
+    async def scenario():
+        first = await open_cache(tmp_path, 3 * entry_size, shared=shared)()
+        second = await open_cache(tmp_path, 3 * entry_size, shared=shared)()
+        for number in range(3):
+            await first.store(f'https://www.amazon.com/dp/B0TEST000{number}', PAGE, etag='"v"')
+            await second.store(f'https://www.amazon.com/dp/B0TEST100{number}', PAGE, etag='"v"')
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first.index is second.index
+    assert second.get_stats()['size_bytes'] == 3 * entry_size
+    assert len([name for name in os.listdir(tmp_path) if name.endswith('.gz')]) == 3
+    assert first.stats['evictions'] + second.stats['evictions'] == 3
+    # The oldest pages went first
+    assert first.lookup('https://www.amazon.com/dp/B0TEST0000') is None
+    assert second.lookup('https://www.amazon.com/dp/B0TEST1002') is not None
+
+
+def test_rescan_counts_pages_of_other_processes(tmp_path, monkeypatch):
+    monkeypatch.setattr(http_cache, 'RESCAN_INTERVAL', 0)
+
+    async def scenario():
+        other = await open_cache(tmp_path)()
+        cache = await open_cache(tmp_path, 10 ** 6)()
+        await other.store('https://www.amazon.com/dp/B0TEST0001', PAGE, etag='"v"')
+        await cache.store('https://www.amazon.com/dp/B0TEST0002', PAGE, etag='"v"')
+        return other, cache
+
+    other, cache = asyncio.run(scenario())
+    assert other.index is not cache.index
+    assert cache.get_stats()['entries'] == 2
+
+
+def test_metadata_written_off_the_loop(tmp_path, monkeypatch):
+    calls = []
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        original = loop.run_in_executor
+
+        def recording(executor, func, *args):
+            calls.append(getattr(func, '__name__', func))
+            return original(executor, func, *args)
+
+        monkeypatch.setattr(loop, 'run_in_executor', recording)
+        cache = await open_cache(tmp_path)()
+        await cache.store('https://www.amazon.com/dp/B0TEST0001', PAGE, etag='"v"')
+        entry = cache.lookup('https://www.amazon.com/dp/B0TEST0001')
+        await cache.read(entry)
+        await cache.refresh(entry)
+
+    asyncio.run(scenario())
+    assert {'scan_directory', '_write_entry', '_read_body', '_write_meta'} <= set(calls)
+    meta = [name for name in os.listdir(tmp_path) if name.endswith('.json')]
+    with open(tmp_path / meta[0]) as f:
+        assert json.load(f)['url'] == 'https://www.amazon.com/dp/B0TEST0001'
+
+
+def test_second_crawl_served_from_cache(tmp_path):
+    from conftest import crawl_input, mock_amazon
+    import ScraperAmazon
+
+    async def scenario():
+        async with mock_amazon() as base_url:
+            config = {'http_cache_dir': str(tmp_path)}
+            first = await ScraperAmazon.main(crawl_input(base_url, config=config))
+            second = await ScraperAmazon.main(crawl_input(base_url, config=config))
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first['cache_stats']['misses'] == first['total_products'] > 0
+    assert second['cache_stats']['hits'] == second['total_products']
+    def by_url(result):
+        return sorted(result['scraped_data'], key=lambda product: product['product_url'])
+
+    assert by_url(second) == by_url(first)
@@ -0,0 +1,95 @@
+# Orchestrator helpers that build activity inputs and merge their results
+from types import SimpleNamespace
+
+from conftest import load_function
+
+orchest = load_function('Orchest')
+
+
+def test_with_checkpoint_id():
+    checkpoint = {'type': 'file', 'directory': 'checkpoints'}
+    assert orchest.with_checkpoint_id(checkpoint, 'crawl-part0001') == {
+        'type': 'file', 'directory': 'checkpoints', 'id': 'crawl-part0001'}
+    assert 'id' not in checkpoint
+    assert orchest.with_checkpoint_id(None, 'crawl-part0001') is None
+
+
+def test_activity_error():
+    assert orchest.activity_error(SimpleNamespace(result=RuntimeError('blocked'))) == {
+        'status': 'error', 'error': 'blocked'}
+    assert orchest.activity_error(SimpleNamespace(result={'status': 'success'})) is None
+
+
+def test_merge_product_lists():
+    merged = orchest.merge_scraped_data([], [{'product_url': 'a'}])
+    merged = orchest.merge_scraped_data(merged, [])
+    merged = orchest.merge_scraped_data(merged, [{'product_url': 'b'}])
+    assert merged == [{'product_url': 'a'}, {'product_url': 'b'}]
+
+
+def test_merge_columnar_tables():
+    first = {'products': {'asin': ['A1'], 'price': [1.0]}, 'specs': {'asin': ['A1'], 'key': ['Color']}}
+    second = {'products': {'asin': ['A2'], 'price': [2.0]}, 'specs': {'asin': [], 'key': []}}
+    merged = orchest.merge_scraped_data([], first)
+    merged = orchest.merge_scraped_data(merged, second)
+    assert merged == {'products': {'asin': ['A1', 'A2'], 'price': [1.0, 2.0]},
+                      'specs': {'asin': ['A1'], 'key': ['Color']}}
+
+
+def test_region_output():
+    output = {'type': 'blob', 'container': 'scraped', 'format': 'parquet'}
+    assert orchest.region_output(output, 'jp', 'abc')['blob_name'] == 'amazon-jp-abc.parquet'
+    named = {'type': 'file', 'path': '/tmp/phones.ndjson.gz'}
+    assert orchest.region_output(named, 'de', 'abc')['path'] == '/tmp/phones-de.ndjson.gz'
+
+
+class RegionContext:
+    """Sub-orchestrations that finish in call order, tracking how many run at once"""
+    instance_id = 'crawl'
+    is_replaying = False
+
+    def __init__(self, results):
+        self.results = results
+        self.inputs = {}
+        self.running = 0
+        self.max_running = 0
+
+    def call_sub_orchestrator(self, name, region_input, instance_id):
+        self.inputs[region_input['region']] = region_input
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        return SimpleNamespace(result=self.results[region_input['region']])
+
+    def task_any(self, tasks):
+        self.running -= 1
+        return tasks[0]
+
+
+def test_crawl_regions():
+    context = RegionContext({
+        'us': {'AmazonData': {'scraped_data': {'status': 'success', 'total_products': 3}}},
+        'jp': RuntimeError('blocked'),
+        'de': {'AmazonData': {'scraped_data': {'status': 'success', 'total_products': 2}}},
+    })
+    steps = orchest.crawl_regions(context, {
+        'jobs': [{'region': 'us', 'config': {'requests_per_second': 1.0}},
+                 {'region': 'jp'}, {'region': 'de'}],
+        'max_concurrent_regions': 2,
+        'config': {'requests_per_second': 2.0, 'burst': 4},
+        'output': {'type': 'file', 'path': '/tmp/phones.ndjson.gz'},
+        'checkpoint': {'type': 'file', 'id': 'crawl'},
+    })
+    finished = None
+    try:
+        while True:
+            finished = steps.send(finished)
+    except StopIteration as stop:
+        result = stop.value
+
+    assert context.max_running == 2
+    assert context.inputs['us']['config'] == {'requests_per_second': 1.0, 'burst': 4}
+    assert context.inputs['de']['output']['path'] == '/tmp/phones-de.ndjson.gz'
+    assert context.inputs['jp']['checkpoint']['id'] == 'crawl-jp'
+    assert result['status'] == 'partial'
+    assert result['total_products'] == 5
+    assert result['regions']['jp'] == {'status': 'error', 'error': 'blocked'}
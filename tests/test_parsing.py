@@ -0,0 +1,38 @@
+# Parser backends against each other and against the original extraction
+import pytest
+
+from ScraperAmazon.parsing import available_backends, get_extractor, resolve_backend_name
+from parser_benchmark import legacy_listing, legacy_product
+
+BACKENDS = available_backends()
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_listing_matches_original(backend, listing_html):
+    hrefs, next_page, page_count = get_extractor(backend).extract_listing(listing_html)
+    assert hrefs == legacy_listing(listing_html)
+    assert next_page == '/s?k=phone&page=2&qid=1712345678&ref=sr_pg_1'
+    assert page_count == 17
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_product_matches_original(backend, product_html):
+    assert get_extractor(backend).extract_product(product_html) == legacy_product(product_html)
+
+
+def test_backends_agree(listing_html, product_html):
+    listings = [get_extractor(name).extract_listing(listing_html) for name in BACKENDS]
+    products = [get_extractor(name).extract_product(product_html) for name in BACKENDS]
+    assert all(listing == listings[0] for listing in listings)
+    assert all(product == products[0] for product in products)
+
+
+def test_timings_recorded(product_html):
+    timings = {}
+    get_extractor(BACKENDS[0]).extract_product(product_html, timings)
+    assert set(timings) == {'parse', 'extract'}
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        resolve_backend_name('html5lib')
@@ -0,0 +1,71 @@
+# Pipelined crawl: shutdown when the consumer stops early, and main's result shapes
+import asyncio
+import json
+
+from conftest import TEST_CONFIG, crawl_input, mock_amazon
+import ScraperAmazon
+from ScraperAmazon import WebScraperImproved
+
+
+def other_tasks():
+    return [task for task in asyncio.all_tasks()
+            if task is not asyncio.current_task() and not task.done()]
+
+
+def test_consumer_breaking_early_stops_every_task():
+    async def scenario():
+        async with mock_amazon(pages=3) as base_url:
+            config = {**TEST_CONFIG, 'base_urls': {'us': base_url}}
+            async with WebScraperImproved(config) as scraper:
+                products = scraper.iter_all_products(f"{base_url}/s?k=phone", 'us', 3)
+                async for _ in products:
+                    break
+                await asyncio.wait_for(products.aclose(), 10)
+        return other_tasks()
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_failing_sink_stops_every_task(monkeypatch):
+    class FailingSink:
+        async def write(self, product):
+            raise RuntimeError('disk full')
+
+    monkeypatch.setattr(ScraperAmazon, 'create_sink', lambda *args, **kwargs: FailingSink())
+
+    async def scenario():
+        async with mock_amazon(pages=3) as base_url:
+            try:
+                await ScraperAmazon.main(crawl_input(base_url, 3, output={'path': 'unused'}))
+            except RuntimeError:
+                pass
+        await asyncio.sleep(0.1)
+        return other_tasks()
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_columnar_result(tmp_path):
+    async def scenario():
+        async with mock_amazon() as base_url:
+            return await ScraperAmazon.main(crawl_input(base_url, result_format='columnar'))
+
+    result = asyncio.run(scenario())
+    assert result['status'] == 'success'
+    assert len(result['scraped_data']['products']['asin']) == result['total_products'] > 0
+
+
+def test_columnar_result_format_ignored_with_output(tmp_path):
+    path = tmp_path / 'phones.ndjson'
+
+    async def scenario():
+        async with mock_amazon() as base_url:
+            return await ScraperAmazon.main(crawl_input(
+                base_url, output={'type': 'file', 'path': str(path)}, result_format='columnar'))
+
+    result = asyncio.run(scenario())
+    assert result['status'] == 'success'
+    assert 'scraped_data' not in result
+    lines = path.read_text().splitlines()
+    assert len(lines) == result['total_products'] > 0
+    assert json.loads(lines[0])['Title'].startswith('Mock Phone')
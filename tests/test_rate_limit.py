@@ -0,0 +1,85 @@
+# Token buckets and the per-domain AIMD rate limiter
+import asyncio
+import time
+
+import pytest
+
+from ScraperAmazon.rate_limit import DomainRateLimiter, SharedBuckets, TokenBucket
+
+DOMAIN = 'www.amazon.com'
+
+
+def limiter(**options):
+    settings = {'rate': 10.0, 'burst': 5, 'min_rate': 0.5, 'backoff_factor': 0.5,
+                'recovery_step': 1.0, 'cooldown': (0, 0), 'shared': SharedBuckets()}
+    return DomainRateLimiter(**{**settings, **options})
+
+
+def test_bucket_spends_burst_then_waits_for_rate():
+    async def take(bucket, count):
+        start = time.monotonic()
+        for _ in range(count):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    async def scenario():
+        bucket = TokenBucket(rate=50, burst=3)
+        return await take(bucket, 3), await take(bucket, 5)
+
+    burst, refilled = asyncio.run(scenario())
+    assert burst < 0.05
+    assert refilled >= 0.09
+
+
+def test_bucket_pause_drops_saved_tokens():
+    async def scenario():
+        bucket = TokenBucket(rate=1000, burst=10)
+        bucket.pause(0.05)
+        start = time.monotonic()
+        await bucket.acquire()
+        return time.monotonic() - start, bucket.tokens
+
+    waited, tokens = asyncio.run(scenario())
+    assert waited >= 0.045
+    assert tokens < 1
+
+
+def test_throttling_cuts_rate_and_success_restores_it():
+    async def scenario():
+        domains = limiter()
+        await domains.acquire(DOMAIN)
+        for _ in range(6):
+            domains.on_throttled(DOMAIN)
+        lowest = domains.get_stats()[DOMAIN]
+        for _ in range(4):
+            domains.on_success(DOMAIN)
+        recovering = domains.get_stats()[DOMAIN]['rate']
+        for _ in range(20):
+            domains.on_success(DOMAIN)
+        return lowest, recovering, domains.get_stats()[DOMAIN]['rate']
+
+    lowest, recovering, recovered = asyncio.run(scenario())
+    assert lowest == {'rate': 0.5, 'throttle_events': 6}
+    assert recovering == pytest.approx(4.5)
+    assert recovered == 10.0
+
+
+def test_limiters_of_one_process_share_domain_buckets():
+    shared = SharedBuckets()
+
+    async def scenario():
+        first, second = limiter(shared=shared), limiter(shared=shared)
+        await first.acquire(DOMAIN)
+        await second.acquire(DOMAIN)
+        await second.acquire('www.amazon.de')
+        first.on_throttled(DOMAIN)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert second.buckets[DOMAIN] is first.buckets[DOMAIN]
+    assert second.get_stats()[DOMAIN] == {'rate': 5.0, 'throttle_events': 0}
+    assert set(second.get_stats()) == {DOMAIN, 'www.amazon.de'}
+
+    # A new event loop gets fresh buckets
+    third = asyncio.run(scenario())[0]
+    assert third.buckets[DOMAIN] is not first.buckets[DOMAIN]
@@ -0,0 +1,71 @@
+# Localized number parsing and product normalization
+import pytest
+
+from ScraperAmazon.records import (
+    normalize_product, parse_number, parse_percent, parse_price, parse_rating
+)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('1,299.99', 1299.99),
+    ('1.299,99', 1299.99),
+    ('1 299', 1299.0),
+    ('1 299,50', 1299.5),
+    ("1'299.00", 1299.0),
+    ('1,234', 1234.0),
+    ('12,5', 12.5),
+    ('699.', 699.0),
+    ('١٢٣٫٤٥', 123.45),
+    ('EGP 2,499', 2499.0),
+])
+def test_parse_number(text, expected):
+    assert parse_number(text) == expected
+
+
+@pytest.mark.parametrize('text', [None, '', 'Currently unavailable'])
+def test_parse_number_without_number(text):
+    assert parse_number(text) is None
+
+
+def test_parse_price():
+    assert parse_price('$1,299.99') == (1299.99, '$')
+    assert parse_price('1.299,99 €') == (1299.99, '€')
+    assert parse_price(None) == (None, None)
+
+
+def test_parse_percent():
+    assert parse_percent('-18%') == 18.0
+    assert parse_percent(None) is None
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('4.2 out of 5 stars', 4.2),
+    ('4,2 von 5 Sternen', 4.2),
+    ('5つ星のうち4.2', 4.2),
+    ('5つ星のうち5.0', 5.0),
+    ('5.0 ', 5.0),
+    (None, None),
+])
+def test_parse_rating(text, expected):
+    assert parse_rating(text) == expected
+
+
+def test_normalize_product(product_html):
+    from ScraperAmazon.parsing import get_extractor
+
+    product = get_extractor('bs4').extract_product(product_html)
+    product.update({
+        'date_column': '2024-03-01',
+        'product_url': 'https://www.amazon.com/dp/B0CMDRCZBJ',
+        'site': 'amazon_us',
+        'category': 'phone'
+    })
+    record, specs, reviews = normalize_product(product)
+    assert record.asin == 'B0CMDRCZBJ'
+    assert record.price == 699.0
+    assert record.discount_percent == 18.0
+    assert record.review_count == len(product['Reviews'])
+    assert {spec.name for spec in specs} == set(product) - {
+        'date_column', 'product_url', 'site', 'category', 'Title', 'Price',
+        'Discount', 'Image URL', 'Description', 'Reviews'}
+    assert reviews[0].rating == 5.0
@@ -0,0 +1,85 @@
+# Retry scheduling and priority hand-out of tokens and connection slots
+import asyncio
+import time
+
+from ScraperAmazon.rate_limit import AdaptiveConcurrencyLimiter, PriorityLock
+from ScraperAmazon.scheduler import LISTING_PRIORITY, PRODUCT_PRIORITY, RetryScheduler
+
+
+def test_retry_delay_grows_exponentially_up_to_the_cap():
+    scheduler = RetryScheduler(base_delay=1, max_delay=5, jitter=0, max_attempts=3)
+    assert [scheduler.delay(retry) for retry in range(1, 5)] == [1, 2, 4, 5]
+    jittered = RetryScheduler(base_delay=1, max_delay=5, jitter=0.5, max_attempts=3)
+    assert all(2 <= jittered.delay(3) <= 6 for _ in range(50))
+
+
+def test_attempt_budget_is_per_url():
+    scheduler = RetryScheduler(base_delay=1, max_delay=5, jitter=0, max_attempts=2)
+    assert [scheduler.take_attempt('a') for _ in range(3)] == [True, True, False]
+    assert scheduler.take_attempt('b')
+    assert scheduler.get_stats() == {'scheduled': 0, 'budget_exhausted': 1, 'pending': 0}
+
+
+def test_due_retries_are_released_in_priority_order():
+    scheduler = RetryScheduler(base_delay=0.02, max_delay=1, jitter=0, max_attempts=3)
+    released = []
+
+    async def retry(name, number, priority):
+        await scheduler.wait(number, priority)
+        released.append(name)
+
+    async def scenario():
+        waits = [
+            asyncio.create_task(retry('late product', 3, PRODUCT_PRIORITY)),
+            asyncio.create_task(retry('product', 1, PRODUCT_PRIORITY)),
+            asyncio.create_task(retry('listing', 1, LISTING_PRIORITY)),
+        ]
+        await asyncio.sleep(0)
+        # Block the loop so both first retries are due when the timer fires
+        time.sleep(0.05)
+        await asyncio.gather(*waits)
+        return scheduler.get_stats()
+
+    stats = asyncio.run(scenario())
+    assert released == ['listing', 'product', 'late product']
+    assert stats == {'scheduled': 3, 'budget_exhausted': 0, 'pending': 0}
+
+
+def test_waiters_are_served_by_priority():
+    async def scenario(hold):
+        order = []
+
+        async def waiter(name, priority):
+            async with hold(priority):
+                order.append(name)
+
+        async with hold(PRODUCT_PRIORITY):
+            waiters = [
+                asyncio.create_task(waiter('product 1', PRODUCT_PRIORITY)),
+                asyncio.create_task(waiter('product 2', PRODUCT_PRIORITY)),
+                asyncio.create_task(waiter('listing', LISTING_PRIORITY)),
+            ]
+            await asyncio.sleep(0)
+        await asyncio.gather(*waiters)
+        return order
+
+    lock = PriorityLock()
+    limiter = AdaptiveConcurrencyLimiter(1)
+    expected = ['listing', 'product 1', 'product 2']
+    assert asyncio.run(scenario(lock.hold)) == expected
+    assert asyncio.run(scenario(limiter.slot)) == expected
+
+
+def test_cancelled_waiter_gives_up_its_turn():
+    async def scenario():
+        limiter = AdaptiveConcurrencyLimiter(1)
+        await limiter.acquire()
+        cancelled = asyncio.create_task(limiter.acquire(LISTING_PRIORITY))
+        waiting = asyncio.create_task(limiter.acquire(PRODUCT_PRIORITY))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        limiter.release()
+        await waiting
+        return limiter.active, limiter.waiters
+
+    assert asyncio.run(scenario()) == (1, [])
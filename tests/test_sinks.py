@@ -0,0 +1,30 @@
+# Output naming helpers shared by the activities and the orchestrator
+from ScraperAmazon.sinks import (
+    output_extension, with_default_name, with_name_suffix, with_part_suffix
+)
+
+
+def test_output_extension():
+    assert output_extension({}) == '.ndjson.gz'
+    assert output_extension({'compress': False}) == '.ndjson'
+    assert output_extension({'format': 'parquet'}) == '.parquet'
+
+
+def test_suffix_goes_before_the_extension():
+    output = {'type': 'file', 'path': '/tmp/phones.ndjson.gz'}
+    assert with_name_suffix(output, '-us')['path'] == '/tmp/phones-us.ndjson.gz'
+    assert with_part_suffix(output, 3)['path'] == '/tmp/phones-part0003.ndjson.gz'
+    assert output['path'] == '/tmp/phones.ndjson.gz'
+
+
+def test_suffix_on_blob_names():
+    output = {'type': 'blob', 'container': 'scraped', 'blob_name': 'phones.parquet'}
+    assert with_name_suffix(output, '-jp')['blob_name'] == 'phones-jp.parquet'
+    assert with_name_suffix({**output, 'blob_name': 'phones'}, '-jp')['blob_name'] == 'phones-jp'
+
+
+def test_default_name_only_when_unnamed():
+    assert with_default_name({'type': 'blob'}, 'amazon-us-abc') == {
+        'type': 'blob', 'blob_name': 'amazon-us-abc.ndjson.gz'}
+    named = {'path': '/tmp/phones.ndjson'}
+    assert with_default_name(named, 'amazon-us-abc') == named
@@ -0,0 +1,58 @@
+# Early termination of streamed product pages
+from ScraperAmazon.streaming import SECTION_MARKERS, SectionScanner, detect_encoding
+
+
+def feed_all(scanner, body, chunk_size):
+    """Feed body in chunks and return the offset at which the scanner was done"""
+    for start in range(0, len(body), chunk_size):
+        if scanner.feed(body[start:start + chunk_size]):
+            return start + chunk_size
+    return None
+
+
+def test_done_once_sections_complete():
+    body = b'<span id="productTitle">Phone</span><div>' + b'x' * 1000 + b'</div>'
+    assert feed_all(SectionScanner(['Title']), body, 8) < len(body)
+
+
+def test_marker_split_across_chunks():
+    scanner = SectionScanner(['Title'])
+    assert not scanner.feed(b'<span id="produc')
+    assert not scanner.feed(b'tTitle">Phone</sp')
+    assert scanner.feed(b'an>')
+
+
+def test_markers_must_appear_in_order():
+    scanner = SectionScanner(['Title'])
+    assert not scanner.feed(b'</span><span id="productTitle">Phone')
+    assert scanner.feed(b'</span>')
+
+
+def test_any_alternative_completes_a_field():
+    price_markers = SECTION_MARKERS['Price'][1]
+    scanner = SectionScanner(['Price'])
+    assert scanner.feed(b' '.join(price_markers))
+
+
+def test_waits_for_every_field(product_html):
+    body = product_html.encode('utf-8')
+    fields = ['Title', 'Price', 'Discount', 'Image URL', 'Description', 'specs']
+    offset = feed_all(SectionScanner(fields), body, 1024)
+    assert offset is not None
+    for field in fields:
+        assert any(markers[-2] in body[:offset] for markers in SECTION_MARKERS[field])
+
+
+def test_fields_without_markers_read_whole_page(product_html):
+    scanner = SectionScanner(['Title', 'Reviews'])
+    body = product_html.encode('utf-8')
+    assert not scanner.streamable
+    assert feed_all(scanner, body, 1024) is None
+    assert bytes(scanner.buffer) == body
+
+
+def test_detect_encoding():
+    assert detect_encoding('text/html; charset=Shift_JIS', b'') == 'shift_jis'
+    assert detect_encoding('text/html', b'<meta charset="windows-1256">') == 'cp1256'
+    # An unknown header charset falls through to the meta tag
+    assert detect_encoding('text/html; charset=bogus', b'<meta charset="utf-8">') == 'utf-8'
@@ -0,0 +1,72 @@
+# URL helpers
+import pytest
+
+from ScraperAmazon.urls import (
+    canonicalize_product_links, canonicalize_product_url, extract_asin, get_base_url,
+    predict_page_urls, search_scope
+)
+
+BASE_URL = 'https://www.amazon.com'
+
+
+@pytest.mark.parametrize('url, asin', [
+    ('https://www.amazon.com/Phone-Model-1/dp/B0TEST0001/ref=sr_1_1?qid=1', 'B0TEST0001'),
+    ('https://www.amazon.com/dp/B0TEST0001', 'B0TEST0001'),
+    ('https://www.amazon.com/gp/product/B0TEST0002?th=1', 'B0TEST0002'),
+    ('https://www.amazon.com/gp/aw/d/B0TEST0003/', 'B0TEST0003'),
+    ('https://www.amazon.com/sspa/click?ie=UTF8&url=%2FPhone%2Fdp%2FB0TEST0004%2Fref%3Dsr', 'B0TEST0004'),
+    ('https://www.amazon.com/gp/slredirect/picassoRedirect.html?url=%2Fdp%2FB0TEST0005', 'B0TEST0005'),
+    ('https://www.amazon.com/s?k=phone', None),
+    ('https://www.amazon.com/dp/B0TEST00', None),
+])
+def test_extract_asin(url, asin):
+    assert extract_asin(url) == asin
+
+
+def test_canonicalize_product_links():
+    hrefs = [
+        '/Phone-Model-1/dp/B0TEST0001/ref=sr_1_1?qid=1',
+        '/sspa/click?url=%2FPhone-Model-1%2Fdp%2FB0TEST0001%2F',
+        '/Phone-Model-2/dp/B0TEST0002/ref=sr_1_2',
+        '/stores/page/ABC',
+    ]
+    links, duplicates = canonicalize_product_links(hrefs, BASE_URL)
+    assert links == [
+        f'{BASE_URL}/dp/B0TEST0001',
+        f'{BASE_URL}/dp/B0TEST0002',
+        f'{BASE_URL}/stores/page/ABC',
+    ]
+    assert duplicates == 1
+    assert canonicalize_product_url('/stores/page/ABC', BASE_URL) == f'{BASE_URL}/stores/page/ABC'
+
+
+def test_predict_page_urls():
+    next_page = f'{BASE_URL}/s?k=phone&page=2&qid=1712345678&ref=sr_pg_1'
+    assert predict_page_urls(next_page, 4, 20) == [
+        f'{BASE_URL}/s?k=phone&page=2&qid=1712345678&ref=sr_pg_1',
+        f'{BASE_URL}/s?k=phone&page=3&qid=1712345678&ref=sr_pg_2',
+        f'{BASE_URL}/s?k=phone&page=4&qid=1712345678&ref=sr_pg_3',
+    ]
+    assert len(predict_page_urls(next_page, 17, 5)) == 4
+
+
+@pytest.mark.parametrize('next_page, page_count', [
+    (None, 5),
+    (f'{BASE_URL}/s?k=phone&page=2', None),
+    (f'{BASE_URL}/s?k=phone&ref=sr_pg_1', 5),
+])
+def test_predict_page_urls_not_predictable(next_page, page_count):
+    assert predict_page_urls(next_page, page_count, 20) is None
+
+
+def test_search_scope():
+    first = search_scope(f'{BASE_URL}/s?k=phone&i=electronics&page=3&qid=1&ref=sr_pg_2')
+    again = search_scope('https://WWW.amazon.com/s?i=electronics&k=phone&qid=2')
+    assert first == again == 'www.amazon.com/s?i=electronics&k=phone'
+    assert search_scope(f'{BASE_URL}/s?k=laptop') != search_scope(f'{BASE_URL}/s?k=phone')
+
+
+def test_get_base_url():
+    assert get_base_url('jp') == 'https://www.amazon.co.jp'
+    with pytest.raises(ValueError):
+        get_base_url('xx')
@@ -0,0 +1,86 @@
+# Client session reuse across the invocations of a warm worker
+import asyncio
+
+from conftest import crawl_input, mock_amazon
+import ScraperAmazon
+from ScraperAmazon.warm import WARM_SESSION, WarmSession
+
+
+class FakeSession:
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+def test_session_is_reused_until_settings_change():
+    async def scenario():
+        warm = WarmSession()
+        first = await warm.acquire('a', 60, FakeSession)
+        await warm.release(first)
+        again = await warm.acquire('a', 60, FakeSession)
+        await warm.release(again)
+        other = await warm.acquire('b', 60, FakeSession)
+        await warm.release(other)
+        return warm, first, again, other
+
+    warm, first, again, other = asyncio.run(scenario())
+    assert again is first and other is not first
+    assert first.closed and not other.closed
+    assert warm.get_stats() == {'created': 2, 'reused': 1, 'retired': 1}
+
+
+def test_expired_session_is_replaced():
+    async def scenario():
+        warm = WarmSession()
+        first = await warm.acquire('a', 0, FakeSession)
+        await warm.release(first)
+        return first, await warm.acquire('a', 0, FakeSession)
+
+    first, second = asyncio.run(scenario())
+    assert second is not first and first.closed
+
+
+def test_failed_invocation_retires_session_once_unused():
+    async def scenario():
+        warm = WarmSession()
+        failed = await warm.acquire('a', 60, FakeSession)
+        running = await warm.acquire('a', 60, FakeSession)
+        await warm.release(failed, failed=True)
+        still_open = not running.closed
+        replacement = await warm.acquire('a', 60, FakeSession)
+        await warm.release(running)
+        return still_open, running, replacement
+
+    still_open, running, replacement = asyncio.run(scenario())
+    assert still_open and running.closed
+    assert replacement is not running and not replacement.closed
+
+
+def test_session_of_an_ended_loop_is_not_reused():
+    warm = WarmSession()
+
+    async def invocation():
+        session = await warm.acquire('a', 60, FakeSession)
+        await warm.release(session)
+        return session
+
+    assert asyncio.run(invocation()) is not asyncio.run(invocation())
+    assert warm.users.keys() == {warm.session}
+
+
+def test_crawls_share_the_warm_session():
+    async def scenario():
+        async with mock_amazon() as base_url:
+            request = crawl_input(base_url, 1, config={'warm_session': True})
+            before = WARM_SESSION.get_stats()
+            results = [await ScraperAmazon.main(request) for _ in range(2)]
+            after = WARM_SESSION.get_stats()
+            await WARM_SESSION.retire()
+        return results, before, after
+
+    results, before, after = asyncio.run(scenario())
+    assert [result['status'] for result in results] == ['success', 'success']
+    assert after['created'] - before['created'] == 1
+    assert after['reused'] - before['reused'] == 1